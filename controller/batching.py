@@ -0,0 +1,141 @@
+"""
+Resolución por lotes de entidades de TYA (canciones, álbumes, merchandising y artistas).
+
+Cada petición de la web crea su propio EntityLoader. Los IDs que pide el handler se
+acumulan, se eliminan duplicados y se resuelven con una sola llamada
+/{tipo}/list?ids=... por tipo de entidad, troceada si la lista no cabe en una URL.
+"""
+import asyncio
+import controller.msvc_servers as servers
+from controller.upstream import upstream, UpstreamError
+
+# Clave de identificador de cada tipo de entidad en las respuestas de TYA
+ENTITY_KEYS = {"song": "songId", "album": "albumId", "merch": "merchId", "artist": "artistId"}
+
+# Longitud máxima del parámetro ids por petición (margen holgado frente a los ~2 KB
+# que admiten proxies y servidores en la línea de petición)
+MAX_IDS_QUERY_LENGTH = 1500
+
+
+def to_int_id(value):
+    """Convierte un ID a int, o devuelve None si no es válido"""
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def chunk_ids(ids: list, max_length: int = MAX_IDS_QUERY_LENGTH) -> list:
+    """Divide una lista de IDs en trozos cuyo 'ids=1,2,3' no supere max_length caracteres"""
+    chunks, current, length = [], [], 0
+    for entity_id in ids:
+        size = len(str(entity_id)) + (1 if current else 0)
+        if current and length + size > max_length:
+            chunks.append(current)
+            current, length = [], 0
+            size = len(str(entity_id))
+        current.append(entity_id)
+        length += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class EntityLoader():
+    """
+    Cargador por petición al estilo DataLoader.
+    Las llamadas a load()/load_many() hechas en el mismo ciclo del event loop se agrupan
+    en una única consulta por tipo; los resultados quedan memorizados durante la petición.
+    Las entidades que TYA no devuelve (o si la llamada falla) se resuelven como None; con
+    strict=True, load_many()/load_list() lanzan UpstreamError si alguna quedó sin resolver
+    por un fallo de TYA (para no dar por completa una lista truncada).
+    """
+
+    def __init__(self, timeout: float = 5):
+        self._timeout = timeout
+        self._futures = {kind: {} for kind in ENTITY_KEYS}
+        self._queue = {kind: [] for kind in ENTITY_KEYS}
+        self._dispatch_scheduled = False
+        # Referencias a los lotes en curso (el event loop solo guarda referencias débiles a las tareas)
+        self._dispatches = set()
+        # IDs cuyo lote falló (error de red o respuesta no 2xx), por tipo
+        self._failed = {kind: set() for kind in ENTITY_KEYS}
+
+    def _schedule(self, kind: str, entity_id: int) -> asyncio.Future:
+        future = self._futures[kind].get(entity_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[kind][entity_id] = loop.create_future()
+            self._queue[kind].append(entity_id)
+            if not self._dispatch_scheduled:
+                self._dispatch_scheduled = True
+                # Esperar a que el resto de corrutinas del mismo ciclo encolen sus IDs
+                loop.call_soon(self._start_dispatch)
+        return future
+
+    def _start_dispatch(self):
+        task = asyncio.ensure_future(self._dispatch())
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self):
+        self._dispatch_scheduled = False
+        queues = {kind: ids for kind, ids in self._queue.items() if ids}
+        self._queue = {kind: [] for kind in ENTITY_KEYS}
+        await asyncio.gather(*(
+            self._fetch(kind, chunk) for kind, ids in queues.items() for chunk in chunk_ids(ids)
+        ))
+
+    async def _fetch(self, kind: str, ids: list):
+        found = {}
+        try:
+            resp = await upstream.get(
+                f"{servers.TYA}/{kind}/list",
+                params={"ids": ",".join(map(str, ids))},
+                timeout=self._timeout,
+                headers={"Accept": "application/json"}
+            )
+            if resp.is_success:
+                key = ENTITY_KEYS[kind]
+                for item in resp.json():
+                    if isinstance(item, dict) and to_int_id(item.get(key)) is not None:
+                        found[to_int_id(item.get(key))] = item
+            else:
+                print(f"Error resolviendo lote de {kind} ({len(ids)} IDs): HTTP {resp.status_code}")
+                self._failed[kind].update(ids)
+        except UpstreamError as e:
+            print(f"Error resolviendo lote de {kind} ({len(ids)} IDs): {e}")
+            self._failed[kind].update(ids)
+        finally:
+            # Resolver siempre los futuros para que ningún handler quede esperando
+            for entity_id in ids:
+                future = self._futures[kind][entity_id]
+                if not future.done():
+                    future.set_result(found.get(entity_id))
+
+    async def load(self, kind: str, entity_id):
+        """Devuelve la entidad (dict) o None si no existe"""
+        entity_id = to_int_id(entity_id)
+        if entity_id is None:
+            return None
+        # shield: si se cancela este handler, el resultado compartido sigue disponible para el resto
+        return await asyncio.shield(self._schedule(kind, entity_id))
+
+    async def load_many(self, kind: str, ids, strict: bool = False) -> dict:
+        """
+        Devuelve {id: entidad o None} para los IDs indicados (sin duplicados).
+        Con strict=True lanza ValueError (UpstreamError) si el lote de alguno de ellos falló.
+        """
+        unique_ids = list(dict.fromkeys(i for i in map(to_int_id, ids or []) if i is not None))
+        futures = [asyncio.shield(self._schedule(kind, entity_id)) for entity_id in unique_ids]
+        results = await asyncio.gather(*futures)
+        if strict:
+            failed = [entity_id for entity_id in unique_ids if entity_id in self._failed[kind]]
+            if failed:
+                raise ValueError(f"TYA no resolvió {len(failed)} de {len(unique_ids)} {kind}")
+        return dict(zip(unique_ids, results))
+
+    async def load_list(self, kind: str, ids, strict: bool = False) -> list:
+        """Devuelve las entidades encontradas, en el orden de los IDs pedidos"""
+        entities = await self.load_many(kind, ids, strict=strict)
+        return [entity for entity in entities.values() if entity is not None]
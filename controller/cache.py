@@ -0,0 +1,75 @@
+"""
+Caché en memoria del proceso con caducidad (TTL), tamaño acotado y expulsión LRU.
+
+Además agrupa las cargas concurrentes de una misma clave: si varias peticiones
+piden a la vez un valor que no está en caché, solo una llega al microservicio
+y el resto espera su resultado.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache():
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # clave -> (caduca_en, valor)
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+        # Una carga en curso para esta clave ya no debe guardar su resultado
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._inflight.clear()
+
+    async def get_or_load(self, key, loader):
+        """
+        Devuelve el valor de la clave o lo obtiene con 'loader' (función sin argumentos
+        que devuelve una corrutina). Las excepciones del loader no se guardan en caché.
+        """
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._load(key, loader))
+        # shield: si se cancela una de las peticiones que esperan, la carga sigue para las demás
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader):
+        this_task = asyncio.current_task()
+        try:
+            value = await loader()
+            if self._inflight.get(key) is this_task:
+                self.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is this_task:
+                del self._inflight[key]
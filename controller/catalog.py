@@ -0,0 +1,273 @@
+"""
+Instantánea en memoria del catálogo de la tienda (canciones, álbumes y merchandising).
+
+Se descarga completa desde TYA y se refresca periódicamente (ver refdata.StaleWhileRevalidate).
+Al construirla se normalizan los productos y se precalculan índices por género y por
+artista y las ordenaciones admitidas (fecha/nombre, asc/desc), de modo que /shop se
+resuelve en memoria sin volver a consultar TYA.
+
+Los productos de la instantánea son compartidos entre peticiones: no deben modificarse.
+"""
+import asyncio
+import os
+import controller.msvc_servers as servers
+from controller.upstream import upstream
+from controller.batching import EntityLoader, ENTITY_KEYS, to_int_id
+from controller.images import normalize_image_url, GRID_IMAGE_WIDTH
+from controller.refdata import StaleWhileRevalidate
+from controller.cache import TTLCache
+
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", 60))
+# Tamaño de página de los endpoints /filter de TYA
+TYA_FILTER_PAGE_SIZE = 9
+# Páginas de /filter que se piden por adelantado mientras se recorre un listado
+FILTER_PAGE_WINDOW = int(os.getenv("FILTER_PAGE_WINDOW", 4))
+# Productos por página en la tienda y máximo que puede pedir el cliente
+SHOP_PAGE_SIZE = int(os.getenv("SHOP_PAGE_SIZE", 9))
+SHOP_MAX_PAGE_SIZE = 60
+# Combinaciones de filtros cuyos resultados se memorizan en cada instantánea
+QUERY_CACHE_SIZE = 256
+
+PRODUCT_KINDS = ("song", "album", "merch")
+ORDERS = ("date", "name")
+DIRECTIONS = ("asc", "desc")
+# Precio por defecto si TYA devuelve uno no válido
+DEFAULT_PRICES = {"song": 0.99, "album": 9.99, "merch": 19.99}
+
+
+async def walk_filter_ids(endpoint: str, params: dict, window: int = FILTER_PAGE_WINDOW) -> list:
+    """
+    Obtiene TODOS los IDs de un endpoint /filter paginado de TYA.
+    Mantiene hasta 'window' páginas en vuelo por delante de la que se está procesando,
+    y se detiene en la primera página vacía, incompleta o inexistente (404).
+    Cualquier otro error lanza UpstreamError: un listado a medias no debe pasar por completo
+    (StaleWhileRevalidate conserva entonces la instantánea anterior).
+    """
+    async def fetch_page(page):
+        resp = await upstream.get(
+            f"{servers.TYA}/{endpoint}",
+            params={**params, "page": page},
+            timeout=10,
+            headers={"Accept": "application/json"}
+        )
+        if resp.status_code == 404:
+            return None
+        resp.raise_for_status()
+        return resp.json()
+
+    all_ids = []
+    in_flight = {}
+    page = next_page = 1
+    try:
+        while True:
+            while len(in_flight) < window:
+                in_flight[next_page] = asyncio.ensure_future(fetch_page(next_page))
+                next_page += 1
+            ids = await in_flight.pop(page)
+            if not ids:
+                break
+            all_ids.extend(ids)
+            # Si recibimos menos IDs que el tamaño de página, es la última página
+            if len(ids) < TYA_FILTER_PAGE_SIZE:
+                break
+            page += 1
+    finally:
+        # Cancelar las páginas pedidas por adelantado que ya no hacen falta
+        for task in in_flight.values():
+            task.cancel()
+            # Recoger el error de las ya terminadas para que asyncio no lo avise como no leído
+            if task.done() and not task.cancelled():
+                task.exception()
+    return all_ids
+
+
+def parse_price(value, default: float) -> float:
+    """Convierte un precio de TYA ("10,00", "10.00" o número) a float; 'default' si no es válido"""
+    try:
+        if isinstance(value, str):
+            return float(value.replace(',', '.'))
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def normalize_product(item: dict, kind: str) -> dict:
+    """Normaliza portada, precio ("10,00" -> 10.0) y artistId (a int) de un producto de TYA"""
+    if item.get('cover'):
+        item['cover'] = normalize_image_url(item['cover'], servers.TYA, GRID_IMAGE_WIDTH)
+    if item.get('price'):
+        item['price'] = parse_price(item['price'], DEFAULT_PRICES[kind])
+    if item.get('artistId'):
+        try:
+            item['artistId'] = int(item['artistId'])
+        except (ValueError, TypeError):
+            pass
+    return item
+
+
+def _genre_ids(item: dict) -> set:
+    return {g for g in map(to_int_id, item.get('genres') or []) if g is not None}
+
+
+class CatalogSnapshot():
+
+    def __init__(self, products: dict):
+        # {tipo: {id: producto}}
+        self.products = {}
+        # {tipo: {genero: set(ids)}} y {tipo: {artista: set(ids)}}
+        self.by_genre = {}
+        self.by_artist = {}
+        # {tipo: {(orden, dirección): [productos]}} y la posición de cada id en cada ordenación
+        self.orderings = {}
+        self.ranks = {}
+        # Resultados ya calculados para combinaciones de filtros (la instantánea no cambia)
+        self._queries = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=float("inf"))
+
+        for kind in PRODUCT_KINDS:
+            key = ENTITY_KEYS[kind]
+            items = {}
+            by_genre, by_artist = {}, {}
+            for item in products.get(kind, []):
+                item_id = to_int_id(item.get(key))
+                if item_id is None:
+                    continue
+                items[item_id] = normalize_product(item, kind)
+                for genre_id in _genre_ids(item):
+                    by_genre.setdefault(genre_id, set()).add(item_id)
+                if item.get('artistId') is not None:
+                    by_artist.setdefault(item['artistId'], set()).add(item_id)
+            self.products[kind] = items
+            self.by_genre[kind] = by_genre
+            self.by_artist[kind] = by_artist
+
+            self.orderings[kind] = {}
+            self.ranks[kind] = {}
+            sort_keys = {
+                "date": lambda i: (str(items[i].get('releaseDate') or ''), i),
+                "name": lambda i: (str(items[i].get('title') or '').casefold(), i),
+            }
+            for order in ORDERS:
+                ascending = sorted(items, key=sort_keys[order])
+                for direction in DIRECTIONS:
+                    ids = ascending if direction == "asc" else ascending[::-1]
+                    self.orderings[kind][(order, direction)] = [items[i] for i in ids]
+                    self.ranks[kind][(order, direction)] = {item_id: pos for pos, item_id in enumerate(ids)}
+
+    def _matching(self, kind: str, genres: set, artists: set):
+        """IDs que cumplen los filtros (None si no hay ningún filtro)"""
+        candidates = None
+        if genres:
+            candidates = set()
+            for genre_id in genres:
+                candidates |= self.by_genre[kind].get(genre_id, set())
+        if artists:
+            by_artist = set()
+            for artist_id in artists:
+                by_artist |= self.by_artist[kind].get(artist_id, set())
+            candidates = by_artist if candidates is None else candidates & by_artist
+        return candidates
+
+    def query(self, kind: str, genres: set = None, artists: set = None, order: str = "date", direction: str = "desc") -> list:
+        """
+        Devuelve los productos de un tipo que tengan alguno de los géneros y pertenezcan
+        a alguno de los artistas indicados, ya ordenados.
+        El merchandising no tiene géneros, así que se oculta si hay filtro de género.
+        La lista devuelta se comparte entre peticiones: no debe modificarse.
+        """
+        if order not in ORDERS:
+            order = "date"
+        if direction not in DIRECTIONS:
+            direction = "desc"
+        if kind == "merch" and genres:
+            return []
+        if not genres and not artists:
+            return self.orderings[kind][(order, direction)]
+
+        key = (kind, frozenset(genres or ()), frozenset(artists or ()), order, direction)
+        result = self._queries.get(key)
+        if result is None:
+            rank = self.ranks[kind][(order, direction)]
+            items = self.products[kind]
+            result = [items[i] for i in sorted(self._matching(kind, genres, artists), key=rank.__getitem__)]
+            self._queries.set(key, result)
+        return result
+
+    def page(self, kind: str, genres: set = None, artists: set = None, order: str = "date", direction: str = "desc",
+             page: int = 1, page_size: int = SHOP_PAGE_SIZE) -> dict:
+        """Devuelve una página de resultados: {items, page, page_size, total, total_pages}"""
+        results = self.query(kind, genres, artists, order, direction)
+        total = len(results)
+        total_pages = max(1, -(-total // page_size))
+        page = min(max(1, page), total_pages)
+        start = (page - 1) * page_size
+        return {
+            "items": results[start:start + page_size],
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "total_pages": total_pages,
+        }
+
+    def facets(self, genres: set = None, artists: set = None) -> dict:
+        """
+        Número de productos por género y por artista para los filtros activos.
+        Cada faceta se cuenta aplicando el resto de filtros pero no el suyo propio,
+        para que al marcar una opción sigan viéndose las alternativas.
+        """
+        key = ("facets", frozenset(genres or ()), frozenset(artists or ()))
+        result = self._queries.get(key)
+        if result is not None:
+            return result
+
+        genre_counts, artist_counts = {}, {}
+        for kind in PRODUCT_KINDS:
+            if kind != "merch":
+                by_artist = self._matching(kind, None, artists)
+                for genre_id, ids in self.by_genre[kind].items():
+                    count = len(ids) if by_artist is None else len(ids & by_artist)
+                    if count:
+                        genre_counts[genre_id] = genre_counts.get(genre_id, 0) + count
+            if kind == "merch" and genres:
+                continue
+            by_genre = self._matching(kind, genres, None)
+            for artist_id, ids in self.by_artist[kind].items():
+                count = len(ids) if by_genre is None else len(ids & by_genre)
+                if count:
+                    artist_counts[artist_id] = artist_counts.get(artist_id, 0) + count
+
+        result = {"genres": genre_counts, "artists": artist_counts}
+        self._queries.set(key, result)
+        return result
+
+
+async def _load_catalog() -> CatalogSnapshot:
+    loader = EntityLoader(timeout=10)
+
+    async def load_products(kind):
+        ids = await walk_filter_ids(f"{kind}/filter", {"order": "date", "direction": "desc"})
+        # strict: un lote /list fallido invalida el refresco (se conserva la instantánea anterior)
+        return await loader.load_list(kind, ids, strict=True)
+
+    songs, albums, merch = await asyncio.gather(*(load_products(kind) for kind in PRODUCT_KINDS))
+    print(f"Catálogo actualizado - Songs: {len(songs)}, Albums: {len(albums)}, Merch: {len(merch)}")
+    return CatalogSnapshot({"song": songs, "album": albums, "merch": merch})
+
+
+catalog_ref = StaleWhileRevalidate("catalog", _load_catalog, CATALOG_TTL)
+
+
+async def get_catalog() -> CatalogSnapshot:
+    """Instantánea actual del catálogo (UpstreamError si aún no se ha podido construir ninguna)"""
+    return await catalog_ref.get()
+
+
+def expire():
+    """Marca el catálogo como desactualizado tras subir, editar o borrar productos"""
+    catalog_ref.expire()
+
+
+def start():
+    catalog_ref.start()
+
+async def stop():
+    await catalog_ref.stop()
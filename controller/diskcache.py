@@ -0,0 +1,157 @@
+"""
+Almacén LRU en disco direccionado por contenido, compartido por las cachés de ficheros
+(tracks de PT, estáticos de TYA).
+
+Cada fichero se guarda con el sha256 de su contenido como nombre, así que varias claves
+con el mismo contenido comparten fichero. El índice clave -> (hash, metadatos) vive en
+memoria y el total de bytes se mantiene por debajo de 'max_bytes' expulsando las claves
+usadas hace más tiempo. Un fichero expulsado mientras se está sirviendo sigue siendo
+legible por quien ya lo tiene abierto.
+
+Como el índice es de cada proceso, cada uno (p. ej. cada worker de uvicorn) guarda sus
+ficheros en su propio subdirectorio p{pid}. Al arrancar se borran el suyo (de una
+ejecución anterior con el mismo pid) y los de procesos que ya no existen, nunca los de
+otros workers vivos.
+"""
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+from collections import OrderedDict
+
+# Trozos en los que se envían los ficheros al navegador
+FILE_CHUNK_SIZE = 64 * 1024
+
+_CACHE_FILE_NAME = re.compile(r"[0-9a-f]{64}")
+_PROCESS_DIR_NAME = re.compile(r"p(\d+)")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe pero es de otro usuario
+        return True
+    return True
+
+
+class ContentStore():
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.root = directory
+        # Subdirectorio de este proceso (se fija en _prepare, ya en el proceso que lo usa)
+        self.directory = None
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # clave -> (hash, metadatos)
+        self._files = {}  # hash -> [tamaño, nº de claves que lo usan]
+        self._bytes = 0
+        self._prepared = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def _prepare(self):
+        # Los ficheros de una ejecución anterior no están en ningún índice: se descartan
+        if not self._prepared:
+            pid = os.getpid()
+            os.makedirs(self.root, exist_ok=True)
+            for name in os.listdir(self.root):
+                full_path = os.path.join(self.root, name)
+                match = _PROCESS_DIR_NAME.fullmatch(name)
+                if match:
+                    owner = int(match.group(1))
+                    if owner == pid or not _process_alive(owner):
+                        shutil.rmtree(full_path, ignore_errors=True)
+                elif name.startswith("tmp-") or _CACHE_FILE_NAME.fullmatch(name):
+                    # Formato anterior, sin subdirectorio por proceso
+                    try:
+                        os.unlink(full_path)
+                    except OSError:
+                        pass
+            self.directory = os.path.join(self.root, f"p{pid}")
+            os.makedirs(self.directory, exist_ok=True)
+            self._prepared = True
+
+    def path(self, digest: str) -> str:
+        self._prepare()
+        return os.path.join(self.directory, digest)
+
+    def temp_file(self):
+        """Fichero temporal en el mismo directorio (para poder renombrarlo sin copiar)"""
+        self._prepare()
+        return tempfile.NamedTemporaryFile(dir=self.directory, prefix="tmp-", delete=False)
+
+    def lookup(self, key):
+        """Devuelve (hash, metadatos) de la clave marcándola como usada, o None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def peek(self, key):
+        """Como lookup() pero sin alterar el orden LRU"""
+        return self._entries.get(key)
+
+    def put(self, key, tmp_path: str, digest: str, size: int, meta=None) -> bool:
+        """
+        Guarda el fichero temporal bajo su hash y lo asocia a la clave. Devuelve False (y no
+        toca el temporal) si el fichero no cabe en el presupuesto.
+        """
+        if size > self.max_bytes:
+            return False
+        if key in self._entries:
+            self.remove(key)
+        if digest in self._files:
+            self._files[digest][1] += 1
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, self.path(digest))
+            self._files[digest] = [size, 1]
+            self._bytes += size
+        self._entries[key] = (digest, meta)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self.remove(next(iter(self._entries)))
+        return True
+
+    def update_meta(self, key, meta):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries[key] = (entry[0], meta)
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        digest = entry[0]
+        size, refs = self._files[digest]
+        if refs > 1:
+            self._files[digest][1] -= 1
+            return
+        del self._files[digest]
+        self._bytes -= size
+        try:
+            os.unlink(self.path(digest))
+        except OSError:
+            pass
+
+
+async def iter_file(file, start: int, end: int, chunk_size: int = FILE_CHUNK_SIZE):
+    """Envía los bytes [start, end] de un fichero abierto por trozos y lo cierra al terminar"""
+    try:
+        await asyncio.to_thread(file.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(file.read, min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
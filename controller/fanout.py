@@ -0,0 +1,33 @@
+"""
+Utilidades para lanzar en paralelo las llamadas independientes de una página.
+"""
+import asyncio
+
+
+async def gather_with_deadline(sections: dict, deadline: float, fallbacks: dict = None) -> dict:
+    """
+    Ejecuta concurrentemente las corrutinas de 'sections' ({nombre: corrutina}) y espera
+    como máximo 'deadline' segundos en total.
+    Las secciones que fallen o sigan pendientes al vencer el plazo se cancelan y toman
+    el valor indicado en 'fallbacks' (None si no se indica).
+    """
+    if fallbacks is None:
+        fallbacks = {}
+    tasks = {name: asyncio.ensure_future(coro) for name, coro in sections.items()}
+    if not tasks:
+        return {}
+    done, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+
+    results = {}
+    for name, task in tasks.items():
+        if task in done and task.exception() is None:
+            results[name] = task.result()
+            continue
+        if task in pending:
+            print(f"Sección '{name}' fuera de plazo ({deadline}s), usando valor de respaldo")
+        else:
+            print(f"Error cargando sección '{name}': {task.exception()}")
+        results[name] = fallbacks.get(name)
+    return results
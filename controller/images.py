@@ -0,0 +1,582 @@
+"""
+Utilidades para las imágenes (portadas, fotos de perfil) servidas por los microservicios.
+
+Las portadas en línea (data:image/...;base64) se guardan una sola vez en un directorio
+por hash de contenido y se sustituyen por URLs cortas /covers/{hash}, que el navegador
+puede cachear indefinidamente: el directorio se comparte entre procesos y se conserva
+entre reinicios, así que la URL se resuelve en cualquier worker y tras reiniciar. Solo se
+sacan a /covers los formatos de mapa de bits (PNG, JPEG, GIF, WebP, AVIF): un SVG puede
+llevar scripts y servido desde nuestro origen sería un XSS, así que se queda en línea.
+El directorio tiene un presupuesto de bytes y se purgan las portadas servidas hace más tiempo.
+
+Los estáticos de TYA se sirven a través de /tya-static, un proxy que los guarda en una
+caché LRU en disco (diskcache.ContentStore) y los envía por trozos desde ahí. Cada
+fichero lleva un ETag fuerte (hash del contenido) para que el navegador revalide con
+304, y las copias locales se revalidan con TYA en segundo plano pasado un tiempo.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import controller.msvc_servers as servers
+from controller.upstream import upstream, UpstreamError
+from controller.diskcache import ContentStore, iter_file
+
+try:
+    from PIL import Image, features
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+STATIC_CACHE_DIR = os.getenv("STATIC_CACHE_DIR", os.path.join(tempfile.gettempdir(), "oversound-static"))
+STATIC_CACHE_MAX_BYTES = int(os.getenv("STATIC_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Segundos tras los que una copia local se revalida con TYA (sin bloquear la respuesta)
+STATIC_REVALIDATE_AFTER = float(os.getenv("STATIC_REVALIDATE_AFTER", 300))
+STATIC_CACHE_CONTROL = "public, max-age=86400"  # Cache por 24 horas
+
+COVER_STORE_DIR = os.getenv("COVER_STORE_DIR", os.path.join(tempfile.gettempdir(), "oversound-covers"))
+# Presupuesto de las variantes reducidas de las portadas (de cada proceso)
+COVER_STORE_MAX_BYTES = int(os.getenv("COVER_STORE_MAX_BYTES", 512 * 1024 * 1024))
+# Presupuesto de las portadas originales (directorio compartido por todos los procesos)
+COVER_ORIGINALS_MAX_BYTES = int(os.getenv("COVER_ORIGINALS_MAX_BYTES", 1024 * 1024 * 1024))
+# El contenido de /covers/{hash} no cambia nunca (si se purga, la página vuelve a guardarla)
+COVER_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# /covers se sirve desde nuestro origen: nada de lo que contenga puede ejecutarse ni reinterpretarse
+COVER_SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "Content-Security-Policy": "default-src 'none'; sandbox",
+}
+_DATA_URI = re.compile(r"data:(image/[\w.+-]+);base64,", re.IGNORECASE)
+_COVER_FILE_NAME = re.compile(r"[0-9a-f]{64}")
+
+# Anchos de las variantes reducidas: el ancho pedido se ajusta al siguiente de la lista
+# para que el número de variantes por imagen quede acotado
+VARIANT_WIDTHS = (80, 160, 300, 600, 1200)
+VARIANT_FORMATS = {"webp": ("WEBP", "image/webp"), "avif": ("AVIF", "image/avif"), "jpeg": ("JPEG", "image/jpeg")}
+VARIANT_QUALITY = 80
+# Anchos usados por las vistas: miniaturas de los grids y portada de las páginas de detalle
+GRID_IMAGE_WIDTH = 300
+DETAIL_IMAGE_WIDTH = 600
+
+
+def normalize_image_url(image_path: str, server_url: str, width: int = None) -> str:
+    """
+    Normaliza las URLs de imágenes:
+    - Si es base64 (data:image), la guarda en el almacén de portadas y devuelve /covers/{hash}
+    - Si es una URL completa (http://...), la devuelve tal cual
+    - Si es una ruta relativa (/images/..., /static/..., o solo el nombre del archivo), la convierte a URL completa del servidor especificado
+    Con 'width', las imágenes de TYA apuntan a una variante reducida en WebP de ese ancho.
+    """
+    if not image_path:
+        return ""
+    
+    # Si es base64, sacarla de la respuesta a una URL cacheable
+    if image_path.startswith("data:image"):
+        return cover_store.externalize(image_path, width)
+    
+    # Si ya es una URL completa, devolverla tal cual
+    if image_path.startswith("http://") or image_path.startswith("https://"):
+        return image_path
+
+    # Si ya se normalizó (apunta al proxy de TYA o al almacén de portadas), devolverla tal cual
+    if image_path.startswith("/tya-static/") or image_path.startswith("/covers/"):
+        return image_path
+    
+    # Si es una ruta relativa o solo el nombre del archivo, convertirla a URL del servidor especificado
+    if server_url:
+        clean_path = image_path
+        
+        # Si es TYA, servirla a través del proxy con caché local /tya-static{cover_path}
+        if server_url == servers.TYA:
+            # El path viene como /song/123.png o /album/456.jpg (a veces con /static delante
+            # o sin la barra inicial); el proxy ya añade /static al pedirlo a TYA
+            if clean_path.startswith("/static/"):
+                clean_path = clean_path[len("/static"):]
+            if not clean_path.startswith("/"):
+                clean_path = "/" + clean_path
+            # Construir como: /tya-static/song/123.png (o /tya-static/song/123.png?w=300&fmt=webp)
+            if width and PIL_AVAILABLE:
+                return f"/tya-static{clean_path}?w={width}&fmt=webp"
+            return f"/tya-static{clean_path}"
+
+        # Si es SYU, asegurarnos de que comience con /
+        if server_url == servers.SYU:
+            if clean_path.startswith("/static"):
+                clean_path = clean_path[len("/static"):]
+            if not clean_path.startswith("/"):
+                clean_path = "/" + clean_path
+
+            return f"{server_url}{clean_path}"
+    
+    return image_path
+
+
+def externalize_inline_image(image: str, width: int = None) -> str:
+    """Sustituye una imagen data:image por su URL /covers/{hash}; el resto de valores no se tocan"""
+    if image and isinstance(image, str) and image.startswith("data:image"):
+        return cover_store.externalize(image, width)
+    return image
+
+
+def variant_width(width: int) -> int:
+    """Ajusta un ancho pedido al siguiente ancho de variante admitido"""
+    for allowed in VARIANT_WIDTHS:
+        if width <= allowed:
+            return allowed
+    return VARIANT_WIDTHS[-1]
+
+
+def variant_format(fmt: str):
+    """Formato de salida soportado por esta instalación de Pillow (WebP por defecto), o None"""
+    fmt = (fmt or "webp").lower()
+    if fmt not in VARIANT_FORMATS or not features.check(fmt if fmt != "jpeg" else "jpg"):
+        fmt = "webp" if features.check("webp") else "jpeg"
+    return fmt
+
+
+def render_variant(source_path: str, out, width: int, fmt: str):
+    """Genera la variante reducida (sin ampliar nunca la original) y la escribe en 'out'"""
+    pil_format, _ = VARIANT_FORMATS[fmt]
+    with Image.open(source_path) as img:
+        img.seek(0)
+        img.thumbnail((width, width * 4))
+        if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert("RGBA")
+        img.save(out, format=pil_format, quality=VARIANT_QUALITY)
+
+
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+def serve_file(path: str, digest: str, content_type: str, request_headers, cache_control: str, extra_headers: dict = None):
+    """
+    Sirve por trozos un fichero con ETag fuerte (304 si el navegador ya lo tiene).
+    Lanza OSError si el fichero no se puede abrir.
+    """
+    etag = f'"{digest[:32]}"'
+    headers = {
+        "Cache-Control": cache_control,
+        "Access-Control-Allow-Origin": "*",
+        "ETag": etag,
+        **(extra_headers or {}),
+    }
+    if _etag_matches(etag, request_headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    f = open(path, "rb")
+    size = os.fstat(f.fileno()).st_size
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(iter_file(f, 0, size - 1), media_type=content_type, headers=headers)
+
+
+def serve_stored(store: ContentStore, key, digest: str, meta: dict, request_headers, cache_control: str, extra_headers: dict = None):
+    """
+    Sirve por trozos un fichero del almacén (ver serve_file).
+    Devuelve None si el fichero ya no está en disco.
+    """
+    try:
+        return serve_file(store.path(digest), digest, meta["content_type"], request_headers, cache_control, extra_headers)
+    except OSError as e:
+        print(f"Error abriendo {key} de la caché de imágenes: {e}")
+        store.remove(key)
+        return None
+
+
+async def store_variant(store: ContentStore, source_digest: str, key, width: int, fmt: str, source_path: str = None) -> bool:
+    """
+    Genera (en un hilo) la variante reducida de un fichero del almacén (o de 'source_path'
+    si la original está fuera de él) y la guarda bajo 'key'
+    """
+    out = store.temp_file()
+    try:
+        await asyncio.to_thread(render_variant, source_path or store.path(source_digest), out, width, fmt)
+    except Exception as e:
+        out.close()
+        os.unlink(out.name)
+        print(f"No se pudo generar la variante {key}: {e}")
+        return False
+    out.close()
+    with open(out.name, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    meta = {"content_type": VARIANT_FORMATS[fmt][1], "source": source_digest}
+    if not store.put(key, out.name, digest, os.path.getsize(out.name), meta):
+        os.unlink(out.name)
+        return False
+    return True
+
+
+class StaticProxy():
+    """Proxy con caché en disco para los estáticos de TYA (/static/{path})"""
+
+    def __init__(self, store: ContentStore, revalidate_after: float):
+        self.store = store
+        self.revalidate_after = revalidate_after
+        self._revalidating = {}
+        self._generating = {}
+
+    def _headers(self, content_type: str) -> dict:
+        return {
+            "Content-Type": content_type,
+            "Cache-Control": STATIC_CACHE_CONTROL,
+            "Access-Control-Allow-Origin": "*",
+        }
+
+    async def serve(self, path: str, request_headers, width: int = None, fmt: str = None) -> Response:
+        if width and PIL_AVAILABLE:
+            response = await self._serve_variant(path, request_headers, variant_width(width), variant_format(fmt))
+            if response is not None:
+                return response
+        entry = self.store.lookup(path)
+        if entry is not None:
+            response = self._serve_cached(path, *entry, request_headers)
+            if response is not None:
+                self._schedule_revalidation(path, entry[1])
+                return response
+        return await self._serve_upstream(path)
+
+    async def _serve_variant(self, path: str, request_headers, width: int, fmt: str):
+        """
+        Sirve la variante reducida de la imagen, generándola la primera vez a partir de la
+        original cacheada. Devuelve None si no se puede generar (se sirve la original).
+        """
+        key = f"{path}?w={width}&fmt={fmt}"
+        entry = self.store.lookup(key)
+        source = self.store.peek(path)
+        # La variante se regenera si la original ha cambiado desde que se generó
+        if entry is None or (source is not None and entry[1]["source"] != source[0]):
+            task = self._generating.get(key)
+            if task is None:
+                task = self._generating[key] = asyncio.ensure_future(self._generate_variant(path, key, width, fmt))
+            if not await asyncio.shield(task):
+                return None
+            entry = self.store.lookup(key)
+            if entry is None:
+                return None
+        elif source is not None:
+            self._schedule_revalidation(path, source[1])
+        return self._serve_cached(key, *entry, request_headers)
+
+    async def _generate_variant(self, path: str, key: str, width: int, fmt: str) -> bool:
+        try:
+            source = self.store.lookup(path)
+            if source is None:
+                async with upstream.stream("GET", f"{servers.TYA}/static/{path}", timeout=10) as resp:
+                    if not resp.is_success:
+                        return False
+                    await self._store_response(path, resp)
+                source = self.store.lookup(path)
+                if source is None:
+                    return False
+            return await store_variant(self.store, source[0], key, width, fmt)
+        except UpstreamError as e:
+            print(f"Error obteniendo {path} de TYA para generar la variante: {e}")
+            return False
+        finally:
+            self._generating.pop(key, None)
+
+    def _serve_cached(self, path: str, digest: str, meta: dict, request_headers):
+        return serve_stored(self.store, path, digest, meta, request_headers, STATIC_CACHE_CONTROL)
+
+    async def _serve_upstream(self, path: str) -> Response:
+        """Reenvía la imagen de TYA por trozos mientras la guarda en la caché"""
+        stream = upstream.stream("GET", f"{servers.TYA}/static/{path}", timeout=10)
+        resp = await stream.__aenter__()
+        if not resp.is_success:
+            await stream.__aexit__(None, None, None)
+            return JSONResponse(content={"error": "Imagen no encontrada"}, status_code=404)
+
+        content_type = resp.headers.get("Content-Type", "image/jpeg")
+        meta = self._meta(resp)
+        out = self.store.temp_file()
+
+        async def body():
+            digest, size, complete = hashlib.sha256(), 0, False
+            try:
+                async for chunk in resp.aiter_bytes():
+                    out.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+                    yield chunk
+                complete = True
+            finally:
+                await stream.__aexit__(None, None, None)
+                out.close()
+                if not (complete and self.store.put(path, out.name, digest.hexdigest(), size, meta)):
+                    os.unlink(out.name)
+
+        return StreamingResponse(body(), media_type=content_type, headers=self._headers(content_type))
+
+    def _meta(self, resp) -> dict:
+        return {
+            "content_type": resp.headers.get("Content-Type", "image/jpeg"),
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "checked_at": time.monotonic(),
+        }
+
+    async def _store_response(self, path: str, resp):
+        """Descarga a la caché el cuerpo de una respuesta de TYA"""
+        out = self.store.temp_file()
+        digest, size = hashlib.sha256(), 0
+        try:
+            async for chunk in resp.aiter_bytes():
+                out.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        except BaseException:
+            out.close()
+            os.unlink(out.name)
+            raise
+        out.close()
+        if not self.store.put(path, out.name, digest.hexdigest(), size, self._meta(resp)):
+            os.unlink(out.name)
+
+    def _schedule_revalidation(self, path: str, meta: dict):
+        if time.monotonic() - meta["checked_at"] < self.revalidate_after or path in self._revalidating:
+            return
+        self._revalidating[path] = asyncio.ensure_future(self._revalidate(path, meta))
+
+    async def _revalidate(self, path: str, meta: dict):
+        """GET condicional a TYA: 304 renueva la copia, 404 la descarta y 200 la sustituye"""
+        headers = {}
+        if meta["etag"]:
+            headers["If-None-Match"] = meta["etag"]
+        if meta["last_modified"]:
+            headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            async with upstream.stream("GET", f"{servers.TYA}/static/{path}", timeout=10, headers=headers) as resp:
+                if resp.status_code == 304:
+                    self.store.update_meta(path, {**meta, "checked_at": time.monotonic()})
+                elif resp.status_code == 404:
+                    self.store.remove(path)
+                elif resp.is_success:
+                    await self._store_response(path, resp)
+                else:
+                    print(f"TYA respondió {resp.status_code} al revalidar {path}, se mantiene la copia local")
+        except UpstreamError as e:
+            print(f"Error revalidando {path} con TYA: {e}")
+        finally:
+            self._revalidating.pop(path, None)
+
+
+static_proxy = StaticProxy(ContentStore(STATIC_CACHE_DIR, STATIC_CACHE_MAX_BYTES), STATIC_REVALIDATE_AFTER)
+
+
+def sniff_image_type(head: bytes):
+    """
+    Tipo MIME de una imagen de mapa de bits a partir de sus primeros bytes, o None si no es
+    ninguno de los admitidos (SVG, HTML o cualquier otra cosa)
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return None
+
+
+def _read_head(path: str, size: int = 32) -> bytes:
+    """Primeros bytes del fichero; marca además el fichero como usado (para la purga)"""
+    with open(path, "rb") as f:
+        head = f.read(size)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return head
+
+
+def _data_uri_head(payload: str) -> bytes:
+    """Primeros bytes de un base64 sin decodificarlo entero (b'' si no es válido)"""
+    try:
+        return base64.b64decode(payload[:32])
+    except (binascii.Error, ValueError):
+        return b""
+
+
+class CoverStore():
+    """
+    Almacén de las portadas que TYA devuelve en línea como data:image en base64.
+    Las originales se guardan en 'directory' con el hash del base64 como nombre (compartido
+    por todos los procesos y conservado entre reinicios) y se purgan por fecha de último uso
+    cuando superan 'max_bytes'; las variantes reducidas, que se pueden regenerar, van al
+    ContentStore de cada proceso.
+    """
+
+    def __init__(self, directory: str, variants: ContentStore, max_bytes: int):
+        self.directory = directory
+        self.variants = variants
+        self.max_bytes = max_bytes
+        self._known = set()  # portadas que ya están en disco
+        self._writing = {}  # portadas que se están guardando (hash -> tarea)
+        self._generating = {}
+        # Bytes escritos desde la última purga (None: aún no se ha revisado el directorio)
+        self._written_since_sweep = None
+        self._sweep_lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def externalize(self, data_uri: str, width: int = None) -> str:
+        """
+        Devuelve la URL de la portada y, si no estaba guardada, la decodifica y la escribe en
+        un hilo (sin bloquear el event loop). Si no es una data URI válida o no es una imagen
+        de mapa de bits (p. ej. SVG), la devuelve tal cual.
+        """
+        match = _DATA_URI.match(data_uri)
+        if match is None:
+            return data_uri
+        payload = data_uri[match.end():]
+        if sniff_image_type(_data_uri_head(payload)) is None:
+            return data_uri
+        # La clave es el hash del base64: no hace falta decodificar las portadas ya guardadas
+        key = hashlib.sha256(payload.encode()).hexdigest()
+        if key not in self._known and key not in self._writing:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # Fuera del event loop se puede escribir directamente
+                if self._write(key, payload):
+                    self._known.add(key)
+            else:
+                task = self._writing[key] = asyncio.ensure_future(asyncio.to_thread(self._write, key, payload))
+                task.add_done_callback(lambda done, key=key: self._written(key, done))
+        if width and PIL_AVAILABLE:
+            return f"/covers/{key}?w={width}&fmt=webp"
+        return f"/covers/{key}"
+
+    def _write(self, key: str, payload: str) -> bool:
+        """Decodifica la portada y la guarda de forma atómica (si otro proceso no lo ha hecho ya)"""
+        path = self.path(key)
+        if os.path.exists(path):
+            return True
+        try:
+            data = base64.b64decode(payload)
+        except (binascii.Error, ValueError) as e:
+            print(f"Portada en línea no válida ({key}): {e}")
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        out = tempfile.NamedTemporaryFile(dir=self.directory, prefix="tmp-", delete=False)
+        try:
+            out.write(data)
+            out.close()
+            os.replace(out.name, path)
+        except OSError as e:
+            out.close()
+            os.unlink(out.name)
+            print(f"Error guardando la portada {key}: {e}")
+            return False
+        self._after_write(len(data))
+        return True
+
+    def _after_write(self, size: int):
+        """Purga el directorio la primera vez y cada vez que se escribe un 5% del presupuesto"""
+        with self._sweep_lock:
+            if self._written_since_sweep is not None:
+                self._written_since_sweep += size
+                if self._written_since_sweep < self.max_bytes / 20:
+                    return
+            self._written_since_sweep = 0
+            self._sweep()
+
+    def _sweep(self):
+        """Borra las portadas usadas hace más tiempo hasta quedar por debajo de max_bytes"""
+        files, total = [], 0
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not _COVER_FILE_NAME.fullmatch(entry.name):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.name))
+                    total += stat.st_size
+        except OSError as e:
+            print(f"Error revisando el almacén de portadas: {e}")
+            return
+        if total <= self.max_bytes:
+            return
+        files.sort()
+        for _, size, name in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(self.path(name))
+            except OSError:
+                continue
+            # Si la vuelve a devolver TYA, externalize() la escribe de nuevo
+            self._known.discard(name)
+            total -= size
+
+    def _written(self, key: str, task: asyncio.Future):
+        self._writing.pop(key, None)
+        if not task.cancelled() and task.exception() is None and task.result():
+            self._known.add(key)
+
+    async def serve(self, key: str, request_headers, width: int = None, fmt: str = None) -> Response:
+        writing = self._writing.get(key)
+        if writing is not None:
+            await asyncio.shield(writing)
+        path = self.path(key)
+        try:
+            content_type = sniff_image_type(await asyncio.to_thread(_read_head, path))
+        except OSError:
+            # Purgada (quizá por otro proceso): que la próxima página la vuelva a guardar
+            self._known.discard(key)
+            return JSONResponse(content={"error": "Imagen no encontrada"}, status_code=404,
+                                headers={"Cache-Control": "no-store"})
+        if content_type is None:
+            # Nunca se sirve desde nuestro origen algo que no sea una imagen de mapa de bits
+            return JSONResponse(content={"error": "Imagen no encontrada"}, status_code=404,
+                                headers={"Cache-Control": "no-store"})
+        self._known.add(key)
+        if width and PIL_AVAILABLE:
+            width, fmt = variant_width(width), variant_format(fmt)
+            variant_key = f"{key}?w={width}&fmt={fmt}"
+            if self.variants.lookup(variant_key) is None:
+                task = self._generating.get(variant_key)
+                if task is None:
+                    task = self._generating[variant_key] = asyncio.ensure_future(self._generate(key, variant_key, width, fmt))
+                await asyncio.shield(task)
+            variant = self.variants.lookup(variant_key)
+            if variant is not None:
+                response = serve_stored(self.variants, variant_key, *variant, request_headers, COVER_CACHE_CONTROL,
+                                        COVER_SECURITY_HEADERS)
+                if response is not None:
+                    return response
+        try:
+            return serve_file(path, key, content_type, request_headers, COVER_CACHE_CONTROL, COVER_SECURITY_HEADERS)
+        except OSError as e:
+            print(f"Error abriendo la portada {key}: {e}")
+            return JSONResponse(content={"error": "Imagen no encontrada"}, status_code=404,
+                                headers={"Cache-Control": "no-store"})
+
+    async def _generate(self, key: str, variant_key: str, width: int, fmt: str):
+        try:
+            return await store_variant(self.variants, key, variant_key, width, fmt, source_path=self.path(key))
+        finally:
+            self._generating.pop(variant_key, None)
+
+
+cover_store = CoverStore(os.path.join(COVER_STORE_DIR, "originals"),
+                         ContentStore(os.path.join(COVER_STORE_DIR, "variants"), COVER_STORE_MAX_BYTES),
+                         COVER_ORIGINALS_MAX_BYTES)
@@ -0,0 +1,130 @@
+"""
+Tratamiento de los ficheros de audio subidos por los artistas.
+
+Las subidas multipart llegan a un fichero temporal (Starlette vuelca a disco las partes
+grandes). La duración se calcula con Mutagen leyendo ese fichero y el audio se reenvía a PT
+como {"track": "base64"} codificándolo por trozos mientras se envía, de modo que ni el
+fichero ni su base64 se cargan enteros en memoria.
+
+El trabajo de CPU de las subidas (parsear el JSON, decodificar el base64 y analizar el
+audio con Mutagen) se ejecuta en un pool acotado de hilos (media_pool) para no bloquear el
+event loop. Si hay demasiadas tareas esperando, las nuevas se rechazan (MediaPoolBusy).
+"""
+import asyncio
+import base64
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from mutagen import File as MutagenFile
+
+# Bytes del fichero que se codifican en cada trozo (múltiplo de 3: base64 sin relleno intermedio)
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+# Hilos dedicados al procesado de audio y tareas que pueden esperar turno antes de rechazar
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", min(4, os.cpu_count() or 1)))
+MEDIA_MAX_WAITING = int(os.getenv("MEDIA_MAX_WAITING", 16))
+
+
+class MediaPoolBusy(Exception):
+    pass
+
+
+class MediaPool():
+    """
+    Pool de hilos con un número máximo de tareas en ejecución ('workers') y de tareas en
+    espera ('max_waiting'). Cuando la cola está llena, run() lanza MediaPoolBusy en lugar de
+    seguir acumulando subidas en memoria.
+    """
+
+    def __init__(self, workers: int, max_waiting: int):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media")
+        self._slots = asyncio.Semaphore(workers)
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Tareas en el pool: en ejecución más en espera"""
+        return self.running + self.waiting
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": self.waiting,
+            "queue_depth": self.queue_depth,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    async def run(self, func, *args, **kwargs):
+        """Ejecuta func(*args, **kwargs) en el pool y devuelve su resultado"""
+        if self._slots.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            print(f"Pool de media lleno ({self.running} en ejecución, {self.waiting} en espera), tarea rechazada")
+            raise MediaPoolBusy()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+media_pool = MediaPool(MEDIA_WORKERS, MEDIA_MAX_WAITING)
+
+
+def audio_duration(source) -> int:
+    """Duración en segundos de un audio (ruta o fichero abierto), 0 si Mutagen no la reconoce"""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    audio = MutagenFile(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    # Un fichero sin etiquetas es falsy aunque tenga info, de ahí el 'is not None'
+    if audio is not None and audio.info:
+        return int(audio.info.length)
+    return 0
+
+
+def base64_duration(data: str) -> int:
+    """Duración en segundos de un audio codificado en base64"""
+    return audio_duration(BytesIO(base64.b64decode(data)))
+
+
+def _json_wrapper(field: str):
+    return f'{{"{field}": "'.encode(), b'"}'
+
+
+def json_base64_length(size: int, field: str = "track") -> int:
+    """Longitud exacta del cuerpo {"field": "base64"} para un fichero de 'size' bytes"""
+    prefix, suffix = _json_wrapper(field)
+    return len(prefix) + 4 * (-(-size // 3)) + len(suffix)
+
+
+async def iter_json_base64(file, field: str = "track"):
+    """Genera el cuerpo JSON {"field": "base64"} leyendo y codificando el fichero por trozos"""
+    prefix, suffix = _json_wrapper(field)
+    await asyncio.to_thread(file.seek, 0)
+    yield prefix
+    while True:
+        chunk = await asyncio.to_thread(file.read, BASE64_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield base64.b64encode(chunk)
+    yield suffix
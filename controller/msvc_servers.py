@@ -12,4 +12,29 @@ SYU = os.getenv('HOST_SYU', 'http://localhost:8080') # Servicio de Usuarios y Se
 TYA = os.getenv('HOST_TYA', 'http://localhost:8081') # Servicio de Temas y Autores
 TPP = os.getenv('HOST_TPP', 'http://localhost:8082') # Tienda y pasarela de pago
 PT  = os.getenv('HOST_PT',  'http://localhost:8083') # Proveedor de tracks
-RYE = os.getenv('HOST_RYE', 'http://localhost:8084') # Recomendaciones y Estadísticas
\ No newline at end of file
+RYE = os.getenv('HOST_RYE', 'http://localhost:8084') # Recomendaciones y Estadísticas
+
+"""
+CONFIGURACIÓN DE LOS POOLS DE CONEXIONES HACIA CADA SERVICIO.
+
+Cada servicio tiene su propio pool HTTP con conexiones keep-alive. Los valores
+por defecto se pueden sobreescribir por entorno, p. ej. POOL_MAX_TYA=400,
+POOL_KEEPALIVE_TYA=100, TIMEOUT_TYA=15 o HTTP2_TYA=1 (requiere el paquete h2).
+"""
+
+def _pool_config(service: str, max_connections: int, max_keepalive: int, timeout: float) -> dict:
+    return {
+        "max_connections": int(os.getenv(f'POOL_MAX_{service}', max_connections)),
+        "max_keepalive": int(os.getenv(f'POOL_KEEPALIVE_{service}', max_keepalive)),
+        "keepalive_expiry": float(os.getenv(f'POOL_KEEPALIVE_EXPIRY_{service}', 30)),
+        "timeout": float(os.getenv(f'TIMEOUT_{service}', timeout)),
+        "http2": os.getenv(f'HTTP2_{service}', '0') == '1',
+    }
+
+POOLS = {
+    SYU: _pool_config('SYU', 100, 50, 5),
+    TYA: _pool_config('TYA', 200, 100, 10),
+    TPP: _pool_config('TPP', 50, 20, 5),
+    PT:  _pool_config('PT',  50, 20, 30),
+    RYE: _pool_config('RYE', 50, 20, 20),
+}
@@ -1,72 +1,83 @@
 import json
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Query, Request, Response
 from fastapi.responses import JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
+from starlette.datastructures import UploadFile
 import os
-import requests
+import httpx
 import base64
-from io import BytesIO
 import view.oversound_view as osv
 import controller.msvc_servers as servers
-from mutagen import File as MutagenFile
-
-app = FastAPI()
+from controller.upstream import upstream, UpstreamError
+from controller.fanout import gather_with_deadline
+from controller.batching import EntityLoader, to_int_id
+from controller.images import normalize_image_url, static_proxy, cover_store, GRID_IMAGE_WIDTH, DETAIL_IMAGE_WIDTH
+from controller.cache import TTLCache
+import controller.refdata as refdata
+import controller.catalog as catalog
+import controller.tracks as tracks
+import controller.search as search
+import controller.media as media
+import controller.uploads as uploads
+import controller.profiles as profiles
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Abrir los pools de conexiones hacia los microservicios y cerrarlos al apagar
+    await upstream.start()
+    # Refresco periódico de géneros y directorio de artistas
+    refdata.start()
+    # Refresco periódico de la instantánea del catálogo de la tienda
+    catalog.start()
+    yield
+    await catalog.stop()
+    await refdata.stop()
+    await uploads.upload_queue.stop()
+    await upstream.aclose()
+    media.media_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 osv = osv.View()
 
-def obtain_user_data(token: str):
+# Caché de sesiones: evita consultar SYU /auth en cada petición del mismo usuario
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 30))
+auth_cache = TTLCache(maxsize=int(os.getenv("AUTH_CACHE_SIZE", 10000)), ttl=AUTH_CACHE_TTL)
+
+def _auth_cache_key(token: str) -> str:
+    # No guardar el token en claro en memoria, solo su hash
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def _fetch_user_data(token: str):
+    resp = await upstream.get(f"{servers.SYU}/auth", timeout=2, headers={"Accept": "application/json", "Cookie":f"oversound_auth={token}"})
+    if resp.status_code in (401, 403):
+        # Sesión no válida: se guarda también en caché para no repetir la consulta
+        return None
+    resp.raise_for_status()
+    user_data = resp.json()
+    # Normalizar URL de imagen de perfil del usuario
+    if user_data and user_data.get('image'):
+        user_data['image'] = normalize_image_url(user_data['image'], servers.SYU)
+    return user_data
+
+async def obtain_user_data(token: str):
     if not token:
         return None
     try:
-        resp = requests.get(f"{servers.SYU}/auth", timeout=2, headers={"Accept": "application/json", "Cookie":f"oversound_auth={token}"})
-        resp.raise_for_status()
-        user_data = resp.json()
-        # Normalizar URL de imagen de perfil del usuario
-        if user_data and user_data.get('image'):
-            user_data['image'] = normalize_image_url(user_data['image'], servers.SYU)
-        return user_data
-    except requests.RequestException:
+        user_data = await auth_cache.get_or_load(_auth_cache_key(token), lambda: _fetch_user_data(token))
+    except UpstreamError:
         return None
+    # Copia para que los handlers puedan modificarla sin alterar la caché
+    return dict(user_data) if user_data else None
 
-def normalize_image_url(image_path: str, server_url: str) -> str:
-    """
-    Normaliza las URLs de imágenes:
-    - Si es base64 (data:image), lo devuelve tal cual
-    - Si es una URL completa (http://...), la devuelve tal cual
-    - Si es una ruta relativa (/images/..., /static/..., o solo el nombre del archivo), la convierte a URL completa del servidor especificado
-    """
-    if not image_path:
-        return ""
-    
-    # Si ya es base64, devolverlo tal cual
-    if image_path.startswith("data:image"):
-        return image_path
-    
-    # Si ya es una URL completa, devolverla tal cual
-    if image_path.startswith("http://") or image_path.startswith("https://"):
-        return image_path
-    
-    # Si es una ruta relativa o solo el nombre del archivo, convertirla a URL del servidor especificado
-    if server_url:
-        clean_path = image_path
-        
-        # Si es TYA, construir la URL como TYA_SERVER/static{cover_path}
-        if server_url == servers.TYA:
-            # El path ya viene como /song/123.png o /album/456.jpg
-            # Construir como: http://localhost:8081/static/song/123.png
-            return f"{server_url}/static{clean_path}"
-
-        # Si es SYU, asegurarnos de que comience con /
-        if server_url == servers.SYU:
-            if clean_path.startswith("/static"):
-                clean_path = clean_path[len("/static"):]
-            if not clean_path.startswith("/"):
-                clean_path = "/" + clean_path
-
-            return f"{server_url}{clean_path}"
-    
-    return image_path
+def invalidate_user_data(token: str):
+    """Descarta la sesión cacheada (tras logout o cambios en el perfil)"""
+    if token:
+        auth_cache.invalidate(_auth_cache_key(token))
 
 # Configuración de CORS
 origins = [
@@ -92,187 +103,111 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
-@app.get("/")
-def index(request: Request):
-    token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
-    print(userdata)
-    # Load top lists and recommendations from RYE (server-side to avoid CORS and speed up page)
-    top_songs = []
-    top_artists = []
-    rec_songs = []
-    rec_artists = []
-
-    try:
-        ts = requests.get(f"{servers.RYE}/statistics/top-10-songs", timeout=3, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
-        if ts.ok:
-            top_songs_raw = ts.json()
-            # Enriquecer con datos completos de TYA
-            top_songs = []
-            for song_data in top_songs_raw:
-                song_id = song_data.get('songId') or song_data.get('id')
-                if song_id:
-                    try:
-                        # Intentar obtener datos completos de TYA
-                        song_resp = requests.get(f"{servers.TYA}/song/{song_id}", timeout=2, headers={"Accept": "application/json"})
-                        if song_resp.ok:
-                            full_song_data = song_resp.json()
-                            # Normalizar imagen
-                            if full_song_data.get('cover'):
-                                full_song_data['image'] = normalize_image_url(full_song_data['cover'], servers.TYA)
-                            # Convertir price a float
-                            if 'price' in full_song_data:
-                                try:
-                                    full_song_data['price'] = float(full_song_data['price'])
-                                except (ValueError, TypeError):
-                                    full_song_data['price'] = 0.0
-                            # Convertir duration a int
-                            if 'duration' in full_song_data:
-                                try:
-                                    full_song_data['duration'] = int(full_song_data['duration'])
-                                except (ValueError, TypeError):
-                                    full_song_data['duration'] = 0
-                            top_songs.append(full_song_data)
-                        else:
-                            # Si falla, usar datos básicos y añadir campos por defecto
-                            song_data['price'] = song_data.get('price', 0.0)
-                            song_data['duration'] = song_data.get('duration', 0)
-                            song_data['image'] = song_data.get('image', '/static/img/utils/default-song.svg')
-                            top_songs.append(song_data)
-                    except requests.RequestException:
-                        # Si falla, usar datos básicos
-                        song_data['price'] = song_data.get('price', 0.0)
-                        song_data['duration'] = song_data.get('duration', 0)
-                        song_data['image'] = song_data.get('image', '/static/img/utils/default-song.svg')
-                        top_songs.append(song_data)
-                else:
-                    top_songs.append(song_data)
-    except requests.RequestException as e:
-        print(f"Error fetching top songs from RYE: {e}")
-
-    try:
-        ta = requests.get(f"{servers.RYE}/statistics/top-10-artists", timeout=3, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
-        if ta.ok:
-            top_artists_raw = ta.json()
-            # Enriquecer con datos completos de TYA si es necesario
-            top_artists = []
-            for artist_data in top_artists_raw:
-                artist_id = artist_data.get('artistId') or artist_data.get('id')
-                if artist_id:
-                    try:
-                        # Intentar obtener datos completos de TYA
-                        artist_resp = requests.get(f"{servers.TYA}/artist/{artist_id}", timeout=2, headers={"Accept": "application/json"})
-                        if artist_resp.ok:
-                            artist_full = artist_resp.json()
-                            # Asegurar que artistId es int
-                            if artist_full.get('artistId'):
-                                artist_full['artistId'] = int(artist_full['artistId'])
-                            top_artists.append(artist_full)
-                        else:
-                            # Si TYA falla, usar datos de RYE
-                            if artist_data.get('artistId'):
-                                artist_data['artistId'] = int(artist_data['artistId'])
-                            top_artists.append(artist_data)
-                    except Exception:
-                        # En caso de error, usar datos de RYE
-                        if artist_data.get('artistId'):
-                            artist_data['artistId'] = int(artist_data['artistId'])
-                        top_artists.append(artist_data)
-                else:
-                    top_artists.append(artist_data)
-    except requests.RequestException as e:
-        print(f"Error fetching top artists from RYE: {e}")
-
-    try:
-        rs = requests.get(f"{servers.RYE}/recommendations/song", timeout=20, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
-        if rs.ok:
-            rec_songs_raw = rs.json()
-            # Enriquecer con datos completos de TYA
-            rec_songs = []
-            for song_data in rec_songs_raw:
-                song_id = song_data.get('songId') or song_data.get('id')
-                if song_id:
-                    try:
-                        song_resp = requests.get(f"{servers.TYA}/song/{song_id}", timeout=2, headers={"Accept": "application/json"})
-                        if song_resp.ok:
-                            full_song_data = song_resp.json()
-                            if full_song_data.get('cover'):
-                                full_song_data['image'] = normalize_image_url(full_song_data['cover'], servers.TYA)
-                            # Convertir price a float
-                            if 'price' in full_song_data:
-                                try:
-                                    full_song_data['price'] = float(full_song_data['price'])
-                                except (ValueError, TypeError):
-                                    full_song_data['price'] = 0.0
-                            # Convertir duration a int
-                            if 'duration' in full_song_data:
-                                try:
-                                    full_song_data['duration'] = int(full_song_data['duration'])
-                                except (ValueError, TypeError):
-                                    full_song_data['duration'] = 0
-                            rec_songs.append(full_song_data)
-                        else:
-                            song_data['price'] = song_data.get('price', 0.0)
-                            song_data['duration'] = song_data.get('duration', 0)
-                            song_data['image'] = song_data.get('image', '/static/img/utils/default-song.svg')
-                            rec_songs.append(song_data)
-                    except requests.RequestException:
-                        song_data['price'] = song_data.get('price', 0.0)
-                        song_data['duration'] = song_data.get('duration', 0)
-                        song_data['image'] = song_data.get('image', '/static/img/utils/default-song.svg')
-                        rec_songs.append(song_data)
-                else:
-                    rec_songs.append(song_data)
-    except requests.RequestException as e:
-        print(f"Error fetching recommended songs from RYE: {e}")
-
-    try:
-        ra = requests.get(f"{servers.RYE}/recommendations/artist", timeout=10, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
-        if ra.ok:
-            rec_artists_ids = ra.json()
-            # Enriquecer con datos completos de TYA
-            rec_artists = []
-            for artist_data in rec_artists_ids:
-                artist_id = artist_data.get('artistId') or artist_data.get('id') or artist_data
-                if artist_id and isinstance(artist_id, (int, str)):
-                    try:
-                        artist_resp = requests.get(f"{servers.TYA}/artist/{int(artist_id)}", timeout=2, headers={"Accept": "application/json"})
-                        if artist_resp.ok:
-                            artist_full = artist_resp.json()
-                            # Normalizar artistId a int
-                            if artist_full.get('artistId'):
-                                artist_full['artistId'] = int(artist_full['artistId'])
-                            rec_artists.append(artist_full)
-                        else:
-                            # Si TYA no tiene el artista, usar los datos de RYE
-                            if isinstance(artist_data, dict) and artist_data.get('artistId'):
-                                artist_data['artistId'] = int(artist_data['artistId'])
-                            rec_artists.append(artist_data)
-                    except Exception as ex:
-                        if isinstance(artist_data, dict) and artist_data.get('artistId'):
-                            artist_data['artistId'] = int(artist_data['artistId'])
-                        rec_artists.append(artist_data)
-                else:
-                    rec_artists.append(artist_data)
-    except requests.RequestException as e:
-        print(f"Error fetching recommended artists from RYE: {e}")
+# Plazo total (en segundos) que la portada espera a sus secciones antes de renderizar
+HOME_PAGE_DEADLINE = float(os.getenv("HOME_PAGE_DEADLINE", 4))
+
+# Último valor correcto de las secciones comunes a todos los usuarios de la portada.
+# Las recomendaciones son personales, así que su respaldo es siempre la lista vacía.
+_home_last_good = {"top_songs": [], "top_artists": [], "genres_map": {}}
+
+
+def _home_song(song_data, full_song_data):
+    """Completa una canción de RYE con sus datos de TYA (o valores por defecto si no están)"""
+    if full_song_data is None:
+        # Si falla, usar datos básicos y añadir campos por defecto
+        song_data['price'] = song_data.get('price', 0.0)
+        song_data['duration'] = song_data.get('duration', 0)
+        song_data['image'] = song_data.get('image', '/static/img/utils/default-song.svg')
+        return song_data
+    full_song_data = dict(full_song_data)
+    # Normalizar imagen
+    if full_song_data.get('cover'):
+        full_song_data['image'] = normalize_image_url(full_song_data['cover'], servers.TYA, GRID_IMAGE_WIDTH)
+    # Convertir price a float
+    if 'price' in full_song_data:
+        try:
+            full_song_data['price'] = float(full_song_data['price'])
+        except (ValueError, TypeError):
+            full_song_data['price'] = 0.0
+    # Convertir duration a int
+    if 'duration' in full_song_data:
+        try:
+            full_song_data['duration'] = int(full_song_data['duration'])
+        except (ValueError, TypeError):
+            full_song_data['duration'] = 0
+    return full_song_data
+
+
+def _home_artist(artist_data, artist_full):
+    """Completa un artista de RYE con sus datos de TYA (o los de RYE si no están)"""
+    if artist_full is not None:
+        artist_full = dict(artist_full)
+        # Asegurar que artistId es int
+        if artist_full.get('artistId'):
+            artist_full['artistId'] = int(artist_full['artistId'])
+        return artist_full
+    if isinstance(artist_data, dict) and artist_data.get('artistId'):
+        artist_data['artistId'] = int(artist_data['artistId'])
+    return artist_data
+
+
+def _home_item_id(item, key):
+    if isinstance(item, dict):
+        return to_int_id(item.get(key) or item.get('id'))
+    return to_int_id(item)
+
+
+async def _load_home_songs(path: str, token: str, timeout: float, loader: EntityLoader):
+    resp = await upstream.get(f"{servers.RYE}{path}", timeout=timeout, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
+    resp.raise_for_status()
+    songs_raw = resp.json()
+    # Resolver todas las canciones en una sola llamada a TYA
+    full_songs = await loader.load_many("song", [_home_item_id(s, 'songId') for s in songs_raw])
+    return [
+        _home_song(song_data, full_songs.get(_home_item_id(song_data, 'songId'))) if _home_item_id(song_data, 'songId') else song_data
+        for song_data in songs_raw
+    ]
+
+
+async def _load_home_artists(path: str, token: str, timeout: float, loader: EntityLoader):
+    resp = await upstream.get(f"{servers.RYE}{path}", timeout=timeout, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
+    resp.raise_for_status()
+    artists_raw = resp.json()
+    # Resolver todos los artistas en una sola llamada a TYA
+    full_artists = await loader.load_many("artist", [_home_item_id(a, 'artistId') for a in artists_raw])
+    return [
+        _home_artist(artist_data, full_artists.get(_home_item_id(artist_data, 'artistId'))) if _home_item_id(artist_data, 'artistId') else artist_data
+        for artist_data in artists_raw
+    ]
 
-    # Obtener géneros para mapeo
-    genres_map = {}
-    try:
-        genres_resp = requests.get(f"{servers.TYA}/genres", timeout=3, headers={"Accept": "application/json"})
-        if genres_resp.ok:
-            all_genres = genres_resp.json()
-            genres_map = {g.get('id'): g.get('name') for g in all_genres if isinstance(g, dict) and g.get('id')}
-    except requests.RequestException as e:
-        print(f"Error fetching genres from TYA: {e}")
 
-    return osv.get_home_view(request, userdata, servers.SYU, servers.RYE, servers.TYA, top_songs, top_artists, rec_songs, rec_artists, genres_map)
+@app.get("/")
+async def index(request: Request):
+    token = request.cookies.get("oversound_auth")
+    userdata = await obtain_user_data(token)
+    # Cargar top y recomendaciones de RYE (en el servidor para evitar CORS).
+    # Las secciones son independientes: se piden a la vez y la página se renderiza
+    # como mucho en HOME_PAGE_DEADLINE segundos, con respaldo para las que no lleguen.
+    loader = EntityLoader(timeout=2)
+    sections = await gather_with_deadline({
+        "top_songs": _load_home_songs("/statistics/top-10-songs", token, 3, loader),
+        "top_artists": _load_home_artists("/statistics/top-10-artists", token, 3, loader),
+        "rec_songs": _load_home_songs("/recommendations/song", token, 20, loader),
+        "rec_artists": _load_home_artists("/recommendations/artist", token, 10, loader),
+        "genres_map": refdata.get_genres_map(),
+    }, HOME_PAGE_DEADLINE, fallbacks={**_home_last_good, "rec_songs": [], "rec_artists": []})
+
+    for name in _home_last_good:
+        if sections[name]:
+            _home_last_good[name] = sections[name]
+
+    return osv.get_home_view(request, userdata, servers.SYU, servers.RYE, servers.TYA,
+                             sections["top_songs"], sections["top_artists"], sections["rec_songs"], sections["rec_artists"], sections["genres_map"])
 
 @app.get("/login")
-def login_page(request: Request):
+async def login_page(request: Request):
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     if userdata:
         return RedirectResponse("/")
     return osv.get_login_view(request, userdata, servers.FND)
@@ -282,14 +217,14 @@ async def login(request: Request):
     # Se obtienen los datos del formulario
     body = await request.json()
     # Se hace un post a SYU
-    resp = requests.post(
+    resp = await upstream.post(
         f"{servers.SYU}/login", 
         json=body,
         timeout=2, 
         headers={"Accept": "application/json"}
     )
     response_data = resp.json()
-    if resp.ok:
+    if resp.is_success:
         response = JSONResponse(content={"message": "Login successful"})
         response.set_cookie(key="oversound_auth", value=response_data.get("session_token"), httponly=True, 
                             secure=False, samesite="lax", path="/")
@@ -298,29 +233,30 @@ async def login(request: Request):
         return JSONResponse(content=response_data, status_code=resp.status_code)
 
 @app.post("/logout")
-def logout(request: Request):
+async def logout(request: Request):
     try:
         token = request.cookies.get("oversound_auth")
-        resp = requests.get(f"{servers.SYU}/logout", timeout=2, headers={"Accept": "applications/json", "Cookie": f"oversound_auth={token}"})
+        invalidate_user_data(token)
+        resp = await upstream.get(f"{servers.SYU}/logout", timeout=2, headers={"Accept": "applications/json", "Cookie": f"oversound_auth={token}"})
         resp.raise_for_status()
         Response.delete_cookie("session")
         return resp.json()
-    except requests.RequestException:
+    except UpstreamError:
         return Response(content=json.dumps({"error": "Couldn't connect with authentication service"}), media_type="application/json", status_code=500)
 
 @app.get("/register")
-def register_page(request: Request):
+async def register_page(request: Request):
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     if userdata:
         return RedirectResponse("/")
     return osv.get_register_view(request, userdata, servers.FND)
 
 
 @app.get("/forgot-password")
-def forgot_password_page(request: Request):
+async def forgot_password_page(request: Request):
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     if userdata:
         return RedirectResponse("/")
     return osv.get_forgot_password_view(request, userdata, servers.FND)
@@ -351,14 +287,14 @@ async def register(request: Request):
     # Se obtienen los datos del formulario
     body = await request.json()
     # Se hace un post a SYU
-    resp = requests.post(
+    resp = await upstream.post(
         f"{servers.SYU}/register", 
         json=body,
         timeout=2, 
         headers={"Accept": "application/json"}
     )
     response_data = resp.json()
-    if resp.ok:
+    if resp.is_success:
         response = JSONResponse(content={"message": "Register successful"})
         response.set_cookie(key="oversound_auth", value=response_data.get("session_token"), httponly=True, 
                             secure=False, samesite="lax", path="/")
@@ -366,259 +302,124 @@ async def register(request: Request):
     else:
         return JSONResponse(content=response_data, status_code=resp.status_code)
 
+# Plazo (en segundos) para esperar al catálogo si aún no hay ninguna instantánea cargada
+SHOP_DEADLINE = float(os.getenv("SHOP_DEADLINE", 10))
+
+
+def parse_id_list(value: str) -> set:
+    """Convierte '1,2,3' en {1, 2, 3}, ignorando los valores no numéricos"""
+    if not value:
+        return set()
+    return {i for i in map(to_int_id, value.split(',')) if i is not None}
+
+
+SHOP_SECTIONS = {"songs": "song", "albums": "album", "merch": "merch"}
+
+
+def _shop_page_size(page_size: int) -> int:
+    return min(max(1, page_size), catalog.SHOP_MAX_PAGE_SIZE)
+
+
 @app.get("/shop")
-def shop(request: Request, 
+async def shop(request: Request, 
          genres: str = Query(default=None),
          artists: str = Query(default=None),
          order: str = Query(default="date"),
-         direction: str = Query(default="desc")):
+         direction: str = Query(default="desc"),
+         page: int = Query(default=1),
+         page_size: int = Query(default=catalog.SHOP_PAGE_SIZE)):
     """
-    Renderiza la vista de la tienda con filtrado desde TYA.
-    Obtiene TODOS los productos para que la paginación se haga en el frontend.
+    Renderiza la vista de la tienda filtrando y ordenando sobre la instantánea del catálogo.
+    Solo se incluye la página pedida de cada sección; el resto las pide el frontend a /api/shop.
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
+    page_size = _shop_page_size(page_size)
 
     try:
-        # Construir parámetros de filtrado para TYA
-        base_filter_params = {
-            "order": order,
-            "direction": direction
+        # La instantánea se refresca en segundo plano; solo se espera si todavía no hay ninguna
+        snapshot = await asyncio.wait_for(asyncio.shield(catalog.get_catalog()), SHOP_DEADLINE)
+
+        selected_genres = parse_id_list(genres)
+        selected_artists = parse_id_list(artists)
+        pagination = {
+            section: snapshot.page(kind, selected_genres, selected_artists, order, direction, page, page_size)
+            for section, kind in SHOP_SECTIONS.items()
         }
-        
-        if genres:
-            base_filter_params["genres"] = genres
-        
-        if artists:
-            base_filter_params["artists"] = artists
-
-        # Función helper para obtener TODOS los IDs paginados (TYA limita a 9 por página)
-        def get_all_ids(endpoint, params):
-            all_ids = []
-            page = 1
-            while True:
-                params_with_page = {**params, "page": page}
-                resp = requests.get(
-                    f"{servers.TYA}/{endpoint}",
-                    params=params_with_page,
-                    timeout=10,
-                    headers={"Accept": "application/json"}
-                )
-                if resp.ok:
-                    ids = resp.json()
-                    if not ids or len(ids) == 0:
-                        break
-                    all_ids.extend(ids)
-                    # Si recibimos menos de 9 IDs, es la última página
-                    if len(ids) < 9:
-                        break
-                    page += 1
-                else:
-                    break
-            return all_ids
-
-        # Obtener TODOS los IDs filtrados desde TYA (con paginación automática)
-        song_ids = get_all_ids("song/filter", base_filter_params)
-        album_ids = get_all_ids("album/filter", base_filter_params)
-        merch_ids = get_all_ids("merch/filter", base_filter_params)
-        
-        print(f"Fetched IDs - Songs: {len(song_ids)}, Albums: {len(album_ids)}, Merch: {len(merch_ids)}")
-
-        # Obtener datos completos de los productos
-        songs = []
-        if song_ids:
-            songs_resp = requests.get(
-                f"{servers.TYA}/song/list",
-                params={"ids": ",".join(map(str, song_ids))},
-                timeout=10,
-                headers={"Accept": "application/json"}
-            )
-            songs = songs_resp.json() if songs_resp.ok else []
-
-        albums = []
-        if album_ids:
-            albums_resp = requests.get(
-                f"{servers.TYA}/album/list",
-                params={"ids": ",".join(map(str, album_ids))},
-                timeout=10,
-                headers={"Accept": "application/json"}
-            )
-            albums = albums_resp.json() if albums_resp.ok else []
-
-        merch = []
-        if merch_ids:
-            merch_resp = requests.get(
-                f"{servers.TYA}/merch/list",
-                params={"ids": ",".join(map(str, merch_ids))},
-                timeout=10,
-                headers={"Accept": "application/json"}
-            )
-            merch = merch_resp.json() if merch_resp.ok else []
-
-        # Normalizar URLs de imágenes, precios y artistId para todos los productos
-        for song in songs:
-            if song.get('cover'):
-                song['cover'] = normalize_image_url(song['cover'], servers.TYA)
-            # Normalizar precio: convertir string "10,00" a float 10.00
-            if song.get('price'):
-                try:
-                    if isinstance(song['price'], str):
-                        song['price'] = float(song['price'].replace(',', '.'))
-                    else:
-                        song['price'] = float(song['price'])
-                except (ValueError, TypeError):
-                    song['price'] = 0.99
-            # Normalizar artistId a int
-            if song.get('artistId'):
-                try:
-                    song['artistId'] = int(song['artistId'])
-                except (ValueError, TypeError):
-                    pass
-        
-        for album in albums:
-            if album.get('cover'):
-                album['cover'] = normalize_image_url(album['cover'], servers.TYA)
-            # Normalizar precio
-            if album.get('price'):
-                try:
-                    if isinstance(album['price'], str):
-                        album['price'] = float(album['price'].replace(',', '.'))
-                    else:
-                        album['price'] = float(album['price'])
-                except (ValueError, TypeError):
-                    album['price'] = 9.99
-            # Normalizar artistId a int
-            if album.get('artistId'):
-                try:
-                    album['artistId'] = int(album['artistId'])
-                except (ValueError, TypeError):
-                    pass
-        
-        for item in merch:
-            if item.get('cover'):
-                item['cover'] = normalize_image_url(item['cover'], servers.TYA)
-            # Normalizar precio
-            if item.get('price'):
-                try:
-                    if isinstance(item['price'], str):
-                        item['price'] = float(item['price'].replace(',', '.'))
-                    else:
-                        item['price'] = float(item['price'])
-                except (ValueError, TypeError):
-                    item['price'] = 19.99
-            # Normalizar artistId a int
-            if item.get('artistId'):
-                try:
-                    item['artistId'] = int(item['artistId'])
-                except (ValueError, TypeError):
-                    pass
-
-        # POST-FILTRADO: Validar que los productos realmente coincidan con los filtros seleccionados
-        # Esto es necesario porque algunos productos pueden no tener todos los campos
-        selected_genres = [int(g) for g in genres.split(',')] if genres else []
-        selected_artists = [int(a) for a in artists.split(',')] if artists else []
-        
-        if selected_genres or selected_artists:
-            # Filtrar canciones
-            filtered_songs = []
-            for song in songs:
-                # Verificar artista
-                if selected_artists and song.get('artistId') not in selected_artists:
-                    continue
-                # Verificar géneros (la canción debe tener al menos uno de los géneros seleccionados)
-                if selected_genres:
-                    song_genres = song.get('genres', [])
-                    # Convertir géneros a int para comparar correctamente
-                    song_genres_int = [int(g) if isinstance(g, str) else g for g in song_genres]
-                    if not song_genres_int or not any(g in selected_genres for g in song_genres_int):
-                        continue
-                filtered_songs.append(song)
-            songs = filtered_songs
-            
-            # Filtrar álbumes
-            filtered_albums = []
-            for album in albums:
-                # Verificar artista
-                if selected_artists and album.get('artistId') not in selected_artists:
-                    continue
-                # Verificar géneros (el álbum debe tener al menos uno de los géneros seleccionados)
-                if selected_genres:
-                    album_genres = album.get('genres', [])
-                    # Convertir géneros a int para comparar correctamente
-                    album_genres_int = [int(g) if isinstance(g, str) else g for g in album_genres]
-                    if not album_genres_int or not any(g in selected_genres for g in album_genres_int):
-                        continue
-                filtered_albums.append(album)
-            albums = filtered_albums
-            
-            # Filtrar merchandising (solo por artista, merch NO tiene géneros según YAML)
-            filtered_merch = []
-            for item in merch:
-                # Verificar artista
-                if selected_artists and item.get('artistId') not in selected_artists:
-                    continue
-                # Si se seleccionaron géneros pero merch no tiene géneros, ocultar el merch
-                if selected_genres:
-                    # Merchandising no tiene campo genres, así que lo ocultamos si hay filtro de género activo
-                    continue
-                filtered_merch.append(item)
-            merch = filtered_merch
-
-        # Obtener géneros y artistas para los filtros
-        genres_resp = requests.get(f"{servers.TYA}/genres", timeout=5, headers={"Accept": "application/json"})
-        all_genres = genres_resp.json() if genres_resp.ok else []
-        
-        # Obtener todos los artistas
-        artists_resp = requests.get(
-            f"{servers.TYA}/artist/filter",
-            params={"order": "name", "direction": "asc"},
-            timeout=10,
-            headers={"Accept": "application/json"}
-        )
-        if artists_resp.ok:
-            artist_ids = artists_resp.json()
-            if artist_ids:
-                artists_list_resp = requests.get(
-                    f"{servers.TYA}/artist/list",
-                    params={"ids": ",".join(map(str, artist_ids))},
-                    timeout=10,
-                    headers={"Accept": "application/json"}
-                )
-                all_artists = artists_list_resp.json() if artists_list_resp.ok else []
-            else:
-                all_artists = []
-        else:
-            all_artists = []
+        facets = snapshot.facets(selected_genres, selected_artists)
 
-        # Crear mapeos
-        artists_map = {a.get('artistId'): a.get('artisticName') for a in all_artists if isinstance(a, dict) and a.get('artistId')}
-        
-        # Crear genres_map con claves tanto int como string para compatibilidad
-        genres_map = {}
-        for g in all_genres:
-            if isinstance(g, dict) and g.get('id'):
-                genre_id = g.get('id')
-                genre_name = g.get('name')
-                genres_map[genre_id] = genre_name  # int key
-                genres_map[str(genre_id)] = genre_name  # string key
+        # Obtener géneros y artistas para los filtros (y sus mapeos) desde la caché de referencia
+        all_genres = await refdata.get_genres()
+        genres_map = await refdata.get_genres_map()
+        all_artists = await refdata.get_artists()
+        artists_map = await refdata.get_artists_map()
 
     except Exception as e:
         print(f"Error en shop: {e}")
         import traceback
         traceback.print_exc()
-        songs, albums, merch = [], [], []
+        empty_page = {"items": [], "page": 1, "page_size": page_size, "total": 0, "total_pages": 1}
+        pagination = {section: empty_page for section in SHOP_SECTIONS}
+        facets = {"genres": {}, "artists": {}}
         all_genres, all_artists = [], []
         artists_map, genres_map = {}, {}
 
-    # print count of all data
-    print(f"Shop data counts - Songs: {len(songs)}, Albums: {len(albums)}, Merch: {len(merch)}")
+    songs = pagination["songs"]["items"]
+    albums = pagination["albums"]["items"]
+    merch = pagination["merch"]["items"]
+    print(f"Shop data counts - Songs: {pagination['songs']['total']}, Albums: {pagination['albums']['total']}, Merch: {pagination['merch']['total']}")
 
     return osv.get_shop_view(
         request, userdata, 
         songs, all_genres, all_artists, albums, merch,
-        artists_map, genres_map, servers.TYA
+        artists_map, genres_map, servers.TYA, pagination, facets
     )
 
+
+@app.get("/api/shop")
+async def shop_api(section: str = Query(default=None),
+                   genres: str = Query(default=None),
+                   artists: str = Query(default=None),
+                   order: str = Query(default="date"),
+                   direction: str = Query(default="desc"),
+                   page: int = Query(default=1),
+                   page_size: int = Query(default=catalog.SHOP_PAGE_SIZE)):
+    """
+    Devuelve una página de productos de la tienda en JSON junto con los contadores por
+    género y artista. Con 'section' (songs, albums o merch) solo se devuelve esa sección.
+    """
+    if section is not None and section not in SHOP_SECTIONS:
+        return JSONResponse(content={"error": "Sección no válida"}, status_code=400)
+    sections = [section] if section else list(SHOP_SECTIONS)
+    page_size = _shop_page_size(page_size)
+
+    try:
+        snapshot = await asyncio.wait_for(asyncio.shield(catalog.get_catalog()), SHOP_DEADLINE)
+    except Exception as e:
+        print(f"Error obteniendo el catálogo para /api/shop: {e}")
+        return JSONResponse(content={"error": "Catálogo no disponible"}, status_code=503)
+
+    genres_map = await refdata.get_genres_map()
+    artists_map = await refdata.get_artists_map()
+    selected_genres = parse_id_list(genres)
+    selected_artists = parse_id_list(artists)
+
+    content = {}
+    for name in sections:
+        result = snapshot.page(SHOP_SECTIONS[name], selected_genres, selected_artists, order, direction, page, page_size)
+        # Se añaden los nombres de artista y géneros sin tocar los productos compartidos de la instantánea
+        result["items"] = [
+            {
+                **item,
+                "artistName": artists_map.get(item.get('artistId'), 'Artista desconocido'),
+                "genreNames": [genres_map.get(g, 'Sin género') for g in item.get('genres') or []],
+            }
+            for item in result["items"]
+        ]
+        content[name] = result
+    content["facets"] = snapshot.facets(selected_genres, selected_artists)
+    return JSONResponse(content=content)
+
 @app.get("/cart")
 async def get_cart(request: Request):
     """
@@ -627,7 +428,7 @@ async def get_cart(request: Request):
     - Si Accept contiene 'text/html': renderiza la página HTML del carrito
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     # Obtener el header Accept
     accept_header = request.headers.get("accept", "")
@@ -638,17 +439,17 @@ async def get_cart(request: Request):
             return JSONResponse(content={"error": "No autenticado"}, status_code=401)
         
         try:
-            cart_resp = requests.get(
+            cart_resp = await upstream.get(
                 f"{servers.TPP}/cart",
                 timeout=5,
                 headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
             )
             cart_resp.raise_for_status()
             return JSONResponse(content=cart_resp.json(), status_code=cart_resp.status_code)
-        except requests.Timeout:
+        except httpx.TimeoutException:
             print(f"Timeout obteniendo carrito - el servicio está tardando demasiado")
             return JSONResponse(content={"items": [], "total": 0, "loading": True}, status_code=202)
-        except requests.RequestException as e:
+        except UpstreamError as e:
             print(f"Error obteniendo carrito: {e}")
             # Devolver carrito vacío en lugar de error para no romper la UI
             return JSONResponse(content={"items": [], "total": 0}, status_code=200)
@@ -663,242 +464,59 @@ async def get_cart(request: Request):
 
 # ============ ENDPOINTS DE BÚSQUEDA ============
 
+@app.get("/api/search")
+async def search_all(q: str = Query(..., min_length=3), limit: int = Query(search.SEARCH_LIMIT, gt=0)):
+    """
+    Búsqueda federada: busca canciones, álbumes, artistas y merchandising a la vez y
+    devuelve los resultados agrupados por tipo, ordenados por relevancia y limitados a
+    'limit' por tipo
+    """
+    results = await search.search(q, limit=min(limit, search.SEARCH_MAX_LIMIT))
+    content = {search.SEARCH_GROUPS[kind]: items for kind, items in results.items()}
+    return JSONResponse(content={"query": q, **content}, status_code=200)
+
+
+async def search_single(kind: str, q: str) -> JSONResponse:
+    """Búsqueda en un solo tipo (endpoints /api/search/{tipo}), sin límite de resultados"""
+    results = await search.search(q, kinds=(kind,))
+    return JSONResponse(content=results[kind], status_code=200)
+
 @app.get("/api/search/song")
-def search_songs(q: str = Query(..., min_length=3)):
+async def search_songs(q: str = Query(..., min_length=3)):
     """
     Busca canciones por query y devuelve los datos completos
     """
-    try:
-        # Buscar (devuelve lista de objetos con songId)
-        search_resp = requests.get(
-            f"{servers.TYA}/song/search",
-            params={"q": q},
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-        
-        if not search_resp.ok:
-            return JSONResponse(content=[], status_code=200)
-        
-        song_objects = search_resp.json()
-        
-        if not song_objects or len(song_objects) == 0:
-            return JSONResponse(content=[], status_code=200)
-        
-        # Extraer IDs de los objetos
-        song_ids = [obj.get('songId') for obj in song_objects if obj.get('songId')]
-        
-        if not song_ids:
-            return JSONResponse(content=[], status_code=200)
-        
-        # Resolver datos completos con IDs separados por comas en el parámetro
-        ids_string = ','.join(map(str, song_ids))
-        list_resp = requests.get(
-            f"{servers.TYA}/song/list",
-            params={"ids": ids_string},
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-
-        # Para el autor, resolver su nombre artístico
-        fix_list = list_resp.json()
-        for song in fix_list:
-            artist_id = song.get('artistId')
-            if artist_id:
-                try:
-                    artist_resp = requests.get(
-                    f"{servers.TYA}/artist/{artist_id}",
-                    timeout=5,
-                    headers={"Accept": "application/json"}
-                    )
-                    if artist_resp.ok:
-                        artist_data = artist_resp.json()
-                        song['artistName'] = artist_data.get('artisticName', 'Artista desconocido')
-                    else:
-                        song['artistName'] = 'Artista desconocido'
-                    
-                except requests.RequestException:
-                    song['artistName'] = 'Artista desconocido'
-        
-        if list_resp.ok:
-            print(fix_list)
-            return JSONResponse(content=fix_list, status_code=200)
-        else:
-            return JSONResponse(content=[], status_code=200)
-            
-    except requests.RequestException as e:
-        print(f"Error buscando canciones: {e}")
-        return JSONResponse(content=[], status_code=200)
+    return await search_single("song", q)
 
 @app.get("/api/search/album")
-def search_albums(q: str = Query(..., min_length=3)):
+async def search_albums(q: str = Query(..., min_length=3)):
     """
     Busca álbumes por query y devuelve los datos completos
     """
-    try:
-        # Buscar (devuelve lista de objetos con albumId)
-        search_resp = requests.get(
-            f"{servers.TYA}/album/search",
-            params={"q": q},
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-        
-        if not search_resp.ok:
-            return JSONResponse(content=[], status_code=200)
-        
-        album_objects = search_resp.json()
-        
-        if not album_objects or len(album_objects) == 0:
-            return JSONResponse(content=[], status_code=200)
-        
-        # Extraer IDs de los objetos
-        album_ids = [obj.get('albumId') for obj in album_objects if obj.get('albumId')]
-        
-        if not album_ids:
-            return JSONResponse(content=[], status_code=200)
-        
-        # Resolver datos completos con IDs separados por comas en el parámetro
-        ids_string = ','.join(map(str, album_ids))
-        list_resp = requests.get(
-            f"{servers.TYA}/album/list",
-            params={"ids": ids_string},
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-        
-        # Para el autor, resolver su nombre artístico
-        fix_list = list_resp.json()
-        for album in fix_list:
-            artist_id = album.get('artistId')
-            if artist_id:
-                try:
-                    artist_resp = requests.get(
-                    f"{servers.TYA}/artist/{artist_id}",
-                    timeout=5,
-                    headers={"Accept": "application/json"}
-                    )
-                    if artist_resp.ok:
-                        artist_data = artist_resp.json()
-                        album['artistName'] = artist_data.get('artisticName', 'Artista desconocido')
-                    else:
-                        album['artistName'] = 'Artista desconocido'
-                    
-                except requests.RequestException:
-                    album['artistName'] = 'Artista desconocido'
-
-        if list_resp.ok:
-            print(fix_list)
-            return JSONResponse(content=fix_list, status_code=200)
-        else:
-            return JSONResponse(content=[], status_code=200)
-            
-    except requests.RequestException as e:
-        print(f"Error buscando álbumes: {e}")
-        return JSONResponse(content=[], status_code=200)
+    return await search_single("album", q)
 
 @app.get("/api/search/artist")
-def search_artists(q: str = Query(..., min_length=3)):
+async def search_artists(q: str = Query(..., min_length=3)):
     """
     Busca artistas por query y devuelve los datos completos
     """
-    try:
-        # Buscar (devuelve lista de objetos con artistId)
-        search_resp = requests.get(
-            f"{servers.TYA}/artist/search",
-            params={"q": q},
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-        
-        if not search_resp.ok:
-            return JSONResponse(content=[], status_code=200)
-        
-        artist_objects = search_resp.json()
-        
-        if not artist_objects or len(artist_objects) == 0:
-            return JSONResponse(content=[], status_code=200)
-        
-        # Extraer IDs de los objetos
-        artist_ids = [obj.get('artistId') for obj in artist_objects if obj.get('artistId')]
-        
-        if not artist_ids:
-            return JSONResponse(content=[], status_code=200)
-        
-        # Resolver datos completos con IDs separados por comas en el parámetro
-        ids_string = ','.join(map(str, artist_ids))
-        list_resp = requests.get(
-            f"{servers.TYA}/artist/list",
-            params={"ids": ids_string},
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-        
-        if list_resp.ok:
-            print(list_resp.json())            
-            return JSONResponse(content=list_resp.json(), status_code=200)
-        else:
-            return JSONResponse(content=[], status_code=200)
-            
-    except requests.RequestException as e:
-        print(f"Error buscando artistas: {e}")
-        return JSONResponse(content=[], status_code=200)
+    return await search_single("artist", q)
 
 @app.get("/api/search/merch")
-def search_merch(q: str = Query(..., min_length=3)):
+async def search_merch(q: str = Query(..., min_length=3)):
     """
     Busca merchandising por query y devuelve los datos completos
     """
-    try:
-        # Buscar (devuelve lista de objetos con merchId)
-        search_resp = requests.get(
-            f"{servers.TYA}/merch/search",
-            params={"q": q},
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-        
-        if not search_resp.ok:
-            return JSONResponse(content=[], status_code=200)
-        
-        merch_objects = search_resp.json()
-        
-        if not merch_objects or len(merch_objects) == 0:
-            return JSONResponse(content=[], status_code=200)
-        
-        # Extraer IDs de los objetos
-        merch_ids = [obj.get('merchId') for obj in merch_objects if obj.get('merchId')]
-        
-        if not merch_ids:
-            return JSONResponse(content=[], status_code=200)
-        
-        # Resolver datos completos con IDs separados por comas en el parámetro
-        ids_string = ','.join(map(str, merch_ids))
-        list_resp = requests.get(
-            f"{servers.TYA}/merch/list",
-            params={"ids": ids_string},
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-        
-        if list_resp.ok:
-            print(list_resp.json())            
-            return JSONResponse(content=list_resp.json(), status_code=200)
-        else:
-            return JSONResponse(content=[], status_code=200)
-            
-    except requests.RequestException as e:
-        print(f"Error buscando merchandising: {e}")
-        return JSONResponse(content=[], status_code=200)
+    return await search_single("merch", q)
 
 
 @app.get("/giftcard")
-def giftcard(request: Request):
+async def giftcard(request: Request):
     """
     Ruta para mostrar la página de compra de tarjetas regalo
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_giftcard_view(request, userdata, servers.SYU)
 
 
@@ -908,7 +526,7 @@ async def purchase_giftcard(request: Request):
     Ruta para procesar la compra de una tarjeta regalo
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -959,62 +577,62 @@ async def purchase_giftcard(request: Request):
 
 
 @app.get("/terms")
-def get_terms(request: Request):
+async def get_terms(request: Request):
     """
     Ruta para mostrar términos de uso
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_terms_view(request, userdata, servers.SYU)
 
 
 @app.get("/privacy")
-def get_privacy(request: Request):
+async def get_privacy(request: Request):
     """
     Ruta para mostrar política de privacidad
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_privacy_view(request, userdata, servers.SYU)
 
 
 @app.get("/cookies")
-def get_cookies(request: Request):
+async def get_cookies(request: Request):
     """
     Ruta para mostrar política de cookies
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_cookies_view(request, userdata, servers.SYU)
 
 
 @app.get("/faq")
-def get_faq(request: Request):
+async def get_faq(request: Request):
     """
     Ruta para mostrar preguntas frecuentes
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_faq_view(request, userdata, servers.SYU)
 
 
 @app.get("/contact")
-def get_contact(request: Request):
+async def get_contact(request: Request):
     """
     Ruta para mostrar formulario de contacto
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_contact_view(request, userdata, servers.SYU)
 
 
 @app.get("/help")
-def get_help(request: Request):
+async def get_help(request: Request):
     """
     Ruta para mostrar centro de ayuda
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_help_view(request, userdata, servers.SYU)
 
 
@@ -1022,21 +640,17 @@ def get_help(request: Request):
 
 # API endpoints para obtener datos del microservicio TYA
 @app.get("/api/genres")
-def get_genres_api(request: Request):
+async def get_genres_api(request: Request):
     """
-    Proxy para obtener géneros desde TYA
+    Proxy para obtener géneros desde TYA (servidos desde la caché de referencia)
     """
     try:
-        genres_resp = requests.get(
-            f"{servers.TYA}/genres",
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-        if genres_resp.ok:
-            return JSONResponse(content=genres_resp.json())
+        genres = (await refdata.genres_ref.get())["genres"]
+        return JSONResponse(content=genres)
+    except httpx.HTTPStatusError as e:
         return JSONResponse(
             content={"error": "No se pudieron obtener los géneros"},
-            status_code=genres_resp.status_code
+            status_code=e.response.status_code
         )
     except Exception as e:
         print(f"Error obteniendo géneros: {e}")
@@ -1047,50 +661,27 @@ def get_genres_api(request: Request):
 
 
 @app.get("/api/artists")
-def get_artists_api(request: Request):
+async def get_artists_api(request: Request):
     """
     Proxy para obtener lista de artistas desde TYA
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
-        # Usar filter sin parámetros para obtener todos los artistas
-        artists_resp = requests.get(
-            f"{servers.TYA}/artist/filter",
-            timeout=5,
-            headers={"Accept": "application/json"}
-        )
-        
-        if artists_resp.ok:
-            artist_ids = artists_resp.json()
-            
-            if not artist_ids:
-                return JSONResponse(content=[])
-            
-            # Obtener detalles de los artistas
-            ids_str = ','.join(map(str, artist_ids))
-            details_resp = requests.get(
-                f"{servers.TYA}/artist/list?ids={ids_str}",
-                timeout=5,
-                headers={"Accept": "application/json"}
-            )
-            
-            if details_resp.ok:
-                artists = details_resp.json()
-                # Filtrar el artista actual
-                current_artist_id = userdata.get('artistId')
-                filtered_artists = [a for a in artists if a.get('artistId') != current_artist_id]
-                return JSONResponse(content=filtered_artists)
-            
-            return JSONResponse(content=[])
-        
+        # Directorio completo de artistas desde la caché de referencia
+        artists = (await refdata.artists_ref.get())["artists"]
+        # Filtrar el artista actual
+        current_artist_id = userdata.get('artistId')
+        filtered_artists = [a for a in artists if a.get('artistId') != current_artist_id]
+        return JSONResponse(content=filtered_artists)
+    except httpx.HTTPStatusError as e:
         return JSONResponse(
             content={"error": "No se pudieron obtener los artistas"},
-            status_code=artists_resp.status_code
+            status_code=e.response.status_code
         )
     except Exception as e:
         print(f"Error obteniendo artistas: {e}")
@@ -1101,14 +692,14 @@ def get_artists_api(request: Request):
 
 
 @app.get("/api/song/{songId}")
-def get_song_api(request: Request, songId: int):
+async def get_song_api(request: Request, songId: int):
     """
     Proxy para obtener información de una canción desde TYA
     """
     token = request.cookies.get("oversound_auth")
     
     try:
-        song_resp = requests.get(
+        song_resp = await upstream.get(
             f"{servers.TYA}/song/{songId}",
             timeout=5,
             headers={
@@ -1117,7 +708,7 @@ def get_song_api(request: Request, songId: int):
             }
         )
         
-        if song_resp.ok:
+        if song_resp.is_success:
             song_data = song_resp.json()
             # Normalizar URL de cover
             if song_data.get('cover'):
@@ -1137,14 +728,14 @@ def get_song_api(request: Request, songId: int):
 
 
 @app.get("/api/artist/{artistId}")
-def get_artist_api(request: Request, artistId: int):
+async def get_artist_api(request: Request, artistId: int):
     """
     Proxy para obtener información de un artista desde TYA
     """
     token = request.cookies.get("oversound_auth")
     
     try:
-        artist_resp = requests.get(
+        artist_resp = await upstream.get(
             f"{servers.TYA}/artist/{artistId}",
             timeout=5,
             headers={
@@ -1153,7 +744,7 @@ def get_artist_api(request: Request, artistId: int):
             }
         )
         
-        if artist_resp.ok:
+        if artist_resp.is_success:
             artist_data = artist_resp.json()
             # Normalizar URL de imagen
             if artist_data.get('artisticImage'):
@@ -1173,35 +764,15 @@ def get_artist_api(request: Request, artistId: int):
 
 
 @app.get("/tya-static/{path:path}")
-async def proxy_tya_static(request: Request, path: str):
+async def proxy_tya_static(request: Request, path: str,
+                           w: int = Query(default=None, gt=0),
+                           fmt: str = Query(default=None)):
     """
-    Proxy para servir archivos estáticos de TYA (imágenes)
+    Proxy para servir archivos estáticos de TYA (imágenes) desde la caché local en disco
+    Con ?w=300&fmt=webp devuelve una variante reducida, generada una vez y cacheada
     """
     try:
-        # Construir la URL completa hacia TYA
-        tya_url = f"{servers.TYA}/static/{path}"
-        
-        # Hacer la petición a TYA
-        response = requests.get(tya_url, timeout=10, stream=True)
-        
-        if not response.ok:
-            return JSONResponse(
-                content={"error": "Imagen no encontrada"},
-                status_code=404
-            )
-        
-        # Determinar el tipo de contenido
-        content_type = response.headers.get('Content-Type', 'image/jpeg')
-        
-        # Devolver la imagen
-        return Response(
-            content=response.content,
-            media_type=content_type,
-            headers={
-                "Cache-Control": "public, max-age=86400",  # Cache por 24 horas
-                "Access-Control-Allow-Origin": "*"
-            }
-        )
+        return await static_proxy.serve(path, request.headers, w, fmt)
         
     except Exception as e:
         print(f"Error proxying TYA static file {path}: {e}")
@@ -1211,13 +782,26 @@ async def proxy_tya_static(request: Request, path: str):
         )
 
 
+@app.get("/covers/{key}")
+async def get_cover(request: Request, key: str,
+                    w: int = Query(default=None, gt=0),
+                    fmt: str = Query(default=None)):
+    """
+    Sirve una portada que TYA devolvió en línea (data:image) desde el almacén local por hash
+    Con ?w=300&fmt=webp devuelve una variante reducida
+    """
+    if len(key) != 64 or any(c not in "0123456789abcdef" for c in key):
+        return JSONResponse(content={"error": "Imagen no encontrada"}, status_code=404)
+    return await cover_store.serve(key, request.headers, w, fmt)
+
+
 @app.get("/api/my-albums")
-def get_my_albums_api(request: Request):
+async def get_my_albums_api(request: Request):
     """
     Proxy para obtener álbumes del artista actual desde TYA
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -1229,13 +813,13 @@ def get_my_albums_api(request: Request):
         artist_id = userdata.get('artistId')
         
         # Obtener el artista para ver sus álbumes
-        artist_resp = requests.get(
+        artist_resp = await upstream.get(
             f"{servers.TYA}/artist/{artist_id}",
             timeout=5,
             headers={"Accept": "application/json"}
         )
         
-        if not artist_resp.ok:
+        if not artist_resp.is_success:
             return JSONResponse(content=[])
         
         artist_data = artist_resp.json()
@@ -1246,13 +830,13 @@ def get_my_albums_api(request: Request):
         
         # Obtener detalles de los álbumes
         ids_str = ','.join(map(str, album_ids))
-        albums_resp = requests.get(
+        albums_resp = await upstream.get(
             f"{servers.TYA}/album/list?ids={ids_str}",
             timeout=5,
             headers={"Accept": "application/json"}
         )
         
-        if albums_resp.ok:
+        if albums_resp.is_success:
             return JSONResponse(content=albums_resp.json())
         
         return JSONResponse(content=[])
@@ -1263,12 +847,12 @@ def get_my_albums_api(request: Request):
 
 
 @app.get("/api/my-songs")
-def get_my_songs_api(request: Request):
+async def get_my_songs_api(request: Request):
     """
     Proxy para obtener canciones del artista actual desde TYA
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -1280,13 +864,13 @@ def get_my_songs_api(request: Request):
         artist_id = userdata.get('artistId')
         
         # Obtener el artista para ver sus canciones
-        artist_resp = requests.get(
+        artist_resp = await upstream.get(
             f"{servers.TYA}/artist/{artist_id}",
             timeout=5,
             headers={"Accept": "application/json"}
         )
         
-        if not artist_resp.ok:
+        if not artist_resp.is_success:
             return JSONResponse(content=[])
         
         artist_data = artist_resp.json()
@@ -1297,13 +881,13 @@ def get_my_songs_api(request: Request):
         
         # Obtener detalles de las canciones
         ids_str = ','.join(map(str, song_ids))
-        songs_resp = requests.get(
+        songs_resp = await upstream.get(
             f"{servers.TYA}/song/list?ids={ids_str}",
             timeout=5,
             headers={"Accept": "application/json"}
         )
         
-        if songs_resp.ok:
+        if songs_resp.is_success:
             return JSONResponse(content=songs_resp.json())
         
         return JSONResponse(content=[])
@@ -1314,12 +898,12 @@ def get_my_songs_api(request: Request):
 
 
 @app.get("/song/upload")
-def upload_song_page(request: Request):
+async def upload_song_page(request: Request):
     """
     Ruta para mostrar la página de subir canción
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -1328,31 +912,9 @@ def upload_song_page(request: Request):
     if not userdata.get('artistId'):
         return osv.get_error_view(request, userdata, "Debes ser un artista para subir canciones", "")
     
-    # Obtener géneros desde TYA
-    genres = []
-    try:
-        resp = requests.get(f"{servers.TYA}/genres", timeout=5, headers={"Accept": "application/json"})
-        if resp.ok:
-            genres = resp.json()
-    except requests.RequestException:
-        pass  # Dejar vacío si falla
-    
-    # Obtener artistas desde TYA
-    artists = []
-    try:
-        # Primero filter para obtener todos los artistas (objetos básicos)
-        filter_resp = requests.get(f"{servers.TYA}/artist/filter", timeout=5, headers={"Accept": "application/json"})
-        if filter_resp.ok:
-            artist_objects = filter_resp.json()
-            artist_ids = artist_objects
-            if artist_ids:
-                # Luego list para obtener detalles completos
-                ids_str = ','.join(map(str, artist_ids))
-                list_resp = requests.get(f"{servers.TYA}/artist/list?ids={ids_str}", timeout=5, headers={"Accept": "application/json"})
-                if list_resp.ok:
-                    artists = list_resp.json()
-    except requests.RequestException:
-        pass
+    # Obtener géneros y artistas desde la caché de referencia (vacíos si TYA no responde)
+    genres = await refdata.get_genres()
+    artists = await refdata.get_artists()
     
     # Filtrar el artista actual de la lista de colaboradores
     artists = [a for a in artists if a['artistId'] != userdata.get('artistId')]
@@ -1363,25 +925,25 @@ def upload_song_page(request: Request):
         artist_id = userdata.get('artistId')
         if artist_id:
             # Obtener el artista para ver sus álbumes
-            artist_resp = requests.get(
+            artist_resp = await upstream.get(
                 f"{servers.TYA}/artist/{artist_id}",
                 timeout=5,
                 headers={"Accept": "application/json"}
             )
-            if artist_resp.ok:
+            if artist_resp.is_success:
                 artist_data = artist_resp.json()
                 album_ids = artist_data.get('owner_albums', [])
                 if album_ids:
                     # Obtener detalles de los álbumes
                     ids_str = ','.join(map(str, album_ids))
-                    albums_resp = requests.get(
+                    albums_resp = await upstream.get(
                         f"{servers.TYA}/album/list?ids={ids_str}",
                         timeout=5,
                         headers={"Accept": "application/json"}
                     )
-                    if albums_resp.ok:
+                    if albums_resp.is_success:
                         albums = albums_resp.json()
-    except requests.RequestException:
+    except UpstreamError:
         pass
     
     return osv.get_upload_song_view(request, userdata, genres, artists, albums)
@@ -1390,10 +952,14 @@ def upload_song_page(request: Request):
 @app.post("/song/upload")
 async def upload_song(request: Request):
     """
-    Ruta para procesar la subida de una canción
+    Ruta para procesar la subida de una canción.
+    Admite multipart/form-data (el audio se vuelca a un fichero temporal) o, por
+    compatibilidad, JSON con el audio y la portada en base64.
+    Responde 202 con el ID de un trabajo de subida: PT y TYA se procesan en segundo plano
+    y el progreso se consulta en /upload/jobs/{jobId}
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -1402,95 +968,211 @@ async def upload_song(request: Request):
         return JSONResponse(content={"error": "Debes ser un artista"}, status_code=403)
     
     try:
-        body = await request.json()
-        
-        # Extraer datos del body
-        title = body.get('title')
-        price = float(body.get('price'))
-        description = body.get('description') or None
-        release_date = body.get('releaseDate') or None
-        album_id = body.get('albumId')
-        genres = body.get('genres', [])
-        collaborators = body.get('collaborators', [])
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            async with request.form() as form:
+                return await submit_song_multipart(userdata, token, form)
+
+        # El JSON trae el audio en base64: se parsea en el pool de media
+        body = await media.media_pool.run(json.loads, await request.body())
         audio_base64 = body.get('audioFile')
+        audio_session = body.get('audioSession')
         cover_base64 = body.get('coverFile')
         cover_extension = body.get('coverExtension')
         
-        if not audio_base64:
+        if not audio_base64 and not audio_session:
             return JSONResponse(content={"success": False, "message": "Archivo de audio requerido"}, status_code=400)
         
         if not cover_base64:
             return JSONResponse(content={"success": False, "message": "Imagen de portada requerida"}, status_code=400)
-        
-        # Decodificar archivos
-        audio_content = base64.b64decode(audio_base64)
-        cover_content = base64.b64decode(cover_base64)
-        
-        # Calcular duración del archivo de audio
-        audio = MutagenFile(BytesIO(audio_content))
-        if audio and audio.info:
-            duration = int(audio.info.length)
-        else:
-            duration = 0
-        
-        # Convertir imagen de portada a base64 con prefijo
-        cover_base64_full = f"data:image/{cover_extension};base64,{cover_base64}"
-        
-        # Subir archivo a PT
-        pt_body = {'track': audio_base64}
-        pt_resp = requests.post(f"{servers.PT}/track/upload", json=pt_body, timeout=10, headers={"Cookie": f"oversound_auth={token}"})
-        
-        if not pt_resp.ok:
-            return JSONResponse(content={"success": False, "message": f"Error subiendo a PT: {pt_resp.text}"}, status_code=pt_resp.status_code)
-        
-        pt_data = pt_resp.json()
-        track_id = pt_data['idtrack']
-        
-        # Preparar datos para TYA
-        release_date_formatted = f"{release_date}T00:00:00Z" if release_date else None
-        body_tya = {
-            'title': title,
-            'duration': duration,
-            'price': price,
-            'description': description,
-            'trackId': track_id,
-            'cover': cover_base64_full,
-            'releaseDate': release_date_formatted,
-            'albumId': album_id,
-            'genres': [int(g) for g in genres],
-            'collaborators': [int(c) for c in collaborators] if collaborators else []
-        }
-        
-        # Enviar a TYA para crear la canción
-        song_resp = requests.post(
-            f"{servers.TYA}/song/upload",
-            json=body_tya,
-            timeout=20,
-            headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-        )
-        
-        if song_resp.ok:
-            song_data = song_resp.json()
-            return JSONResponse(content={
-                "success": True,
-                "message": "Canción subida exitosamente",
-                "songId": song_data.get('songId')
-            })
-        else:
-            return JSONResponse(content={"success": False, "message": f"Error en TYA: {song_resp.text}"}, status_code=song_resp.status_code)
-    
+
+        try:
+            fields = uploads.song_fields(body)
+        except (ValueError, TypeError):
+            return JSONResponse(content={"success": False, "message": "Datos de la canción no válidos"}, status_code=400)
+
+        if audio_session:
+            # Audio ya subido por trozos: el trabajo cierra la sesión solo si la subida termina bien
+            session = uploads.upload_sessions.claim(audio_session, userdata.get('userId'))
+            if session is None:
+                return incomplete_audio_session_response()
+            return submit_song_job(userdata, token, fields, session.path, f"data:image/{cover_extension};base64,{cover_base64}", session)
+        audio_path = await uploads.upload_queue.spool_base64(audio_base64)
+        return submit_song_job(userdata, token, fields, audio_path, f"data:image/{cover_extension};base64,{cover_base64}")
+    
+    except media.MediaPoolBusy:
+        return media_pool_busy_response()
     except Exception as e:
         print(f"Error subiendo canción: {e}")
         return JSONResponse(content={"error": "Error al subir la canción"}, status_code=500)
 
 
+def media_pool_busy_response() -> JSONResponse:
+    return JSONResponse(
+        content={"success": False, "message": "El servidor está procesando muchas subidas, inténtalo de nuevo en unos segundos"},
+        status_code=503,
+        headers={"Retry-After": "5"}
+    )
+
+
+async def submit_song_multipart(userdata: dict, token: str, form) -> JSONResponse:
+    """Subida de canción en multipart: el audio ya está en un fichero temporal"""
+    audio_file = form.get('audioFile')
+    audio_session = form.get('audioSession')
+    cover_file = form.get('coverFile')
+    if not audio_session and (not isinstance(audio_file, UploadFile) or not audio_file.size):
+        return JSONResponse(content={"success": False, "message": "Archivo de audio requerido"}, status_code=400)
+    if not isinstance(cover_file, UploadFile) or not cover_file.size:
+        return JSONResponse(content={"success": False, "message": "Imagen de portada requerida"}, status_code=400)
+
+    try:
+        fields = uploads.song_fields({
+            'title': form.get('title'),
+            'price': form.get('price'),
+            'description': form.get('description'),
+            'releaseDate': form.get('releaseDate'),
+            'albumId': form.get('albumId'),
+            'genres': form.getlist('genres'),
+            'collaborators': form.getlist('collaborators'),
+        })
+    except (ValueError, TypeError):
+        return JSONResponse(content={"success": False, "message": "Datos de la canción no válidos"}, status_code=400)
+
+    cover_extension = form.get('coverExtension') or (cover_file.filename or '').rsplit('.', 1)[-1].lower()
+    cover_base64 = base64.b64encode(await cover_file.read()).decode()
+
+    if audio_session:
+        # Audio ya subido por trozos: el trabajo cierra la sesión solo si la subida termina bien
+        session = uploads.upload_sessions.claim(audio_session, userdata.get('userId'))
+        if session is None:
+            return incomplete_audio_session_response()
+        return submit_song_job(userdata, token, fields, session.path, f"data:image/{cover_extension};base64,{cover_base64}", session)
+    # El temporal del multipart se cierra con la petición: el trabajo usa su propia copia
+    audio_path = await uploads.upload_queue.spool_file(audio_file.file)
+    return submit_song_job(userdata, token, fields, audio_path, f"data:image/{cover_extension};base64,{cover_base64}")
+
+
+def incomplete_audio_session_response() -> JSONResponse:
+    return JSONResponse(content={"success": False, "message": "La subida del audio no existe o no está completa"}, status_code=400)
+
+
+def submit_song_job(userdata: dict, token: str, fields: dict, audio_path: str, cover: str, session=None) -> JSONResponse:
+    """Encola el trabajo de subida y responde 202 con su ID"""
+    job = uploads.upload_queue.submit(uploads.UploadJob(userdata.get('userId'), token, fields, audio_path, cover, session))
+    return JSONResponse(content={
+        "success": True,
+        "message": "Subida recibida, procesando la canción",
+        "jobId": job.id,
+        "status": job.status,
+        "statusUrl": f"/upload/jobs/{job.id}"
+    }, status_code=202)
+
+
+@app.get("/upload/jobs/{jobId}")
+async def get_upload_job(request: Request, jobId: str):
+    """
+    Estado de un trabajo de subida del usuario: queued, processing (con la etapa en curso
+    y los intentos de cada etapa), done (con songId) o failed (con el motivo)
+    """
+    token = request.cookies.get("oversound_auth")
+    userdata = await obtain_user_data(token)
+
+    if not userdata:
+        return JSONResponse(content={"error": "No autenticado"}, status_code=401)
+
+    job = uploads.upload_queue.get(jobId, userdata.get('userId'))
+    if job is None:
+        return JSONResponse(content={"error": "Trabajo de subida no encontrado"}, status_code=404)
+    return JSONResponse(content=job.to_dict(), status_code=200)
+
+
+@app.post("/upload/sessions")
+async def create_upload_session(request: Request):
+    """
+    Crea una sesión de subida reanudable por trozos para un audio de 'size' bytes.
+    Los trozos se envían con PUT /upload/sessions/{sessionId}?offset=N y, una vez completa,
+    la sesión se usa como 'audioSession' al subir o editar la canción
+    """
+    token = request.cookies.get("oversound_auth")
+    userdata = await obtain_user_data(token)
+
+    if not userdata:
+        return JSONResponse(content={"error": "No autenticado"}, status_code=401)
+
+    if not userdata.get('artistId'):
+        return JSONResponse(content={"error": "Debes ser un artista"}, status_code=403)
+
+    try:
+        body = await request.json()
+        session = uploads.upload_sessions.create(userdata.get('userId'), int(body.get('size')))
+    except (ValueError, TypeError, AttributeError):
+        return JSONResponse(content={"error": f"Tamaño no válido (máximo {uploads.UPLOAD_SESSION_MAX_BYTES} bytes)"}, status_code=400)
+    return JSONResponse(content=session.to_dict(), status_code=201)
+
+
+@app.get("/upload/sessions/{sessionId}")
+async def get_upload_session(request: Request, sessionId: str):
+    """
+    Estado de una sesión de subida: bytes recibidos (offset) desde los que continuar
+    """
+    token = request.cookies.get("oversound_auth")
+    userdata = await obtain_user_data(token)
+
+    if not userdata:
+        return JSONResponse(content={"error": "No autenticado"}, status_code=401)
+
+    session = uploads.upload_sessions.get(sessionId, userdata.get('userId'))
+    if session is None:
+        return JSONResponse(content={"error": "Sesión de subida no encontrada"}, status_code=404)
+    return JSONResponse(content=session.to_dict(), status_code=200)
+
+
+@app.put("/upload/sessions/{sessionId}")
+async def put_upload_chunk(request: Request, sessionId: str, offset: int = Query(..., ge=0)):
+    """
+    Recibe un trozo del audio (cuerpo binario) que empieza en 'offset'.
+    Responde 409 con el offset actual si el trozo no continúa lo ya recibido
+    """
+    token = request.cookies.get("oversound_auth")
+    userdata = await obtain_user_data(token)
+
+    if not userdata:
+        return JSONResponse(content={"error": "No autenticado"}, status_code=401)
+
+    session = uploads.upload_sessions.get(sessionId, userdata.get('userId'))
+    if session is None:
+        return JSONResponse(content={"error": "Sesión de subida no encontrada"}, status_code=404)
+
+    try:
+        await uploads.upload_sessions.write(session, offset, request.stream())
+    except uploads.SessionConflict:
+        return JSONResponse(content={"error": "El trozo no continúa la subida", **session.to_dict()}, status_code=409)
+    except ValueError:
+        return JSONResponse(content={"error": "El trozo supera el tamaño declarado", **session.to_dict()}, status_code=413)
+    return JSONResponse(content=session.to_dict(), status_code=200)
+
+
+@app.get("/api/media/status")
+async def media_pool_status(request: Request):
+    """
+    Estado del pool de procesado de audio: tareas en ejecución y en espera (profundidad de
+    cola), completadas y rechazadas por estar lleno. Solo para artistas autenticados (los
+    únicos que suben audio): no se expone la capacidad del pool a cualquiera.
+    """
+    userdata = await obtain_user_data(request.cookies.get("oversound_auth"))
+    if not userdata:
+        return JSONResponse(content={"error": "No autenticado"}, status_code=401)
+    if not userdata.get('artistId'):
+        return JSONResponse(content={"error": "Solo disponible para artistas"}, status_code=403)
+    return JSONResponse(content=media.media_pool.stats(), status_code=200)
+
+
 @app.get("/album/upload")
-def upload_album_page(request: Request):
+async def upload_album_page(request: Request):
     """
     Ruta para mostrar la página de subir álbum
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -1505,43 +1187,29 @@ def upload_album_page(request: Request):
         artist_id = userdata.get('artistId')
         if artist_id:
             # Obtener el artista para ver sus canciones
-            artist_resp = requests.get(
+            artist_resp = await upstream.get(
                 f"{servers.TYA}/artist/{artist_id}",
                 timeout=5,
                 headers={"Accept": "application/json"}
             )
-            if artist_resp.ok:
+            if artist_resp.is_success:
                 artist_data = artist_resp.json()
                 song_ids = artist_data.get('owner_songs', [])
                 if song_ids:
                     # Obtener detalles de las canciones
                     ids_str = ','.join(map(str, song_ids))
-                    songs_resp = requests.get(
+                    songs_resp = await upstream.get(
                         f"{servers.TYA}/song/list?ids={ids_str}",
                         timeout=5,
                         headers={"Accept": "application/json"}
                     )
-                    if songs_resp.ok:
+                    if songs_resp.is_success:
                         songs = songs_resp.json()
-    except requests.RequestException:
+    except UpstreamError:
         pass
     
-    # Obtener artistas desde TYA
-    artists = []
-    try:
-        # Primero filter para obtener todos los artistas (objetos básicos)
-        filter_resp = requests.get(f"{servers.TYA}/artist/filter", timeout=5, headers={"Accept": "application/json"})
-        if filter_resp.ok:
-            artist_objects = filter_resp.json()
-            artist_ids = artist_objects
-            if artist_ids:
-                # Luego list para obtener detalles completos
-                ids_str = ','.join(map(str, artist_ids))
-                list_resp = requests.get(f"{servers.TYA}/artist/list?ids={ids_str}", timeout=5, headers={"Accept": "application/json"})
-                if list_resp.ok:
-                    artists = list_resp.json()
-    except requests.RequestException:
-        pass
+    # Obtener artistas desde la caché de referencia
+    artists = await refdata.get_artists()
     
     # Filtrar el artista actual de la lista de colaboradores
     artists = [a for a in artists if a['artistId'] != userdata.get('artistId')]
@@ -1555,7 +1223,7 @@ async def upload_album(request: Request):
     Ruta para procesar la creación de un álbum
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -1586,14 +1254,15 @@ async def upload_album(request: Request):
         }
         
         # Enviar a TYA para crear el álbum
-        album_resp = requests.post(
+        album_resp = await upstream.post(
             f"{servers.TYA}/album/upload",
             json=tya_body,
             timeout=15,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         
-        if album_resp.ok:
+        if album_resp.is_success:
+            catalog.expire()
             album_data = album_resp.json()
             return JSONResponse(content={
                 "success": True,
@@ -1610,12 +1279,12 @@ async def upload_album(request: Request):
 
 # Upload Merchandising Routes
 @app.get("/merch/upload")
-def upload_merch_page(request: Request):
+async def upload_merch_page(request: Request):
     """
     Ruta para mostrar la página de subir merchandising
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -1633,7 +1302,7 @@ async def upload_merch(request: Request):
     Ruta para procesar la subida de merchandising
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -1648,7 +1317,7 @@ async def upload_merch(request: Request):
         body['artistId'] = userdata.get('artistId')
         
         # Enviar a TYA para crear el merchandising
-        merch_resp = requests.post(
+        merch_resp = await upstream.post(
             f"{servers.TYA}/merch/upload",
             json=body,
             timeout=20,
@@ -1656,7 +1325,8 @@ async def upload_merch(request: Request):
         )
         print(merch_resp.status_code, merch_resp.text)
         
-        if merch_resp.ok:
+        if merch_resp.is_success:
+            catalog.expire()
             merch_data = merch_resp.json()
             return JSONResponse(content={
                 "message": "Merchandising subido exitosamente",
@@ -1672,9 +1342,9 @@ async def upload_merch(request: Request):
 
 
 @app.get("/user/{username}")
-def register(request: Request, username: str):
+async def register(request: Request, username: str):
     token = request.cookies.get("session")
-    userdata = requests.get(f"{servers.SYU}/user/{username}", timeout=2, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
+    userdata = await upstream.get(f"{servers.SYU}/user/{username}", timeout=2, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
     userdata.raise_for_status()
     return userdata.json()
 
@@ -1685,14 +1355,14 @@ async def delete_song(request: Request, songId: int):
     Ruta para eliminar una canción
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
         # Primero obtener los datos de la canción para verificar la propiedad
-        song_resp = requests.get(f"{servers.TYA}/song/{songId}", timeout=2, headers={"Accept": "application/json"})
+        song_resp = await upstream.get(f"{servers.TYA}/song/{songId}", timeout=2, headers={"Accept": "application/json"})
         song_resp.raise_for_status()
         song_data = song_resp.json()
         
@@ -1701,209 +1371,147 @@ async def delete_song(request: Request, songId: int):
             return JSONResponse(content={"error": "No tienes permisos para eliminar esta canción"}, status_code=403)
         
         # Eliminar la canción
-        delete_resp = requests.delete(
+        delete_resp = await upstream.delete(
             f"{servers.TYA}/song/{songId}",
             timeout=5,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         
-        if delete_resp.ok:
+        if delete_resp.is_success:
+            catalog.expire()
             return JSONResponse(content={"message": "Canción eliminada exitosamente"})
         else:
             error_data = delete_resp.json() if delete_resp.text else {"error": "Error desconocido"}
             return JSONResponse(content=error_data, status_code=delete_resp.status_code)
     
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error eliminando canción: {e}")
         return JSONResponse(content={"error": "Error al eliminar la canción"}, status_code=500)
 
 
-@app.get("/song/{songId}")
-def get_song(request: Request, songId: int):
-    token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
-    
-    try:
-        # Obtener información de la canción
-        song_resp = requests.get(f"{servers.TYA}/song/{songId}", timeout=2, headers={"Accept": "application/json"})
-        song_resp.raise_for_status()
-        song_data = song_resp.json()
-        
-        # Normalizar URL de la portada
-        song_data['cover'] = normalize_image_url(song_data.get('cover', ''), servers.TYA)
-        
-        # Asegurar que price sea float
-        song_data['price'] = float(song_data.get('price', '0.0').replace(',', '.'))
-        
-        # Resolver artista principal
-        try:
-            artist_resp = requests.get(f"{servers.TYA}/artist/{song_data['artistId']}", timeout=2, headers={"Accept": "application/json"})
-            artist_resp.raise_for_status()
-            song_data['artist'] = artist_resp.json()
-        except requests.RequestException:
-            song_data['artist'] = {"artistId": song_data['artistId'], "nombre": "Artista desconocido"}
-        
-        # Resolver colaboradores
-        collaborators = []
-        if song_data.get('collaborators'):
-            for collab_id in song_data['collaborators']:
-                try:
-                    collab_resp = requests.get(f"{servers.TYA}/artist/{collab_id}", timeout=2, headers={"Accept": "application/json"})
-                    collab_resp.raise_for_status()
-                    collaborators.append(collab_resp.json())
-                except requests.RequestException:
-                    collaborators.append({"artistId": collab_id, "nombre": "Artista desconocido"})
-        song_data['collaborators_data'] = collaborators
-        
-        # Resolver géneros
-        genres = []
-        if song_data.get('genres'):
-            try:
-                genres_resp = requests.get(f"{servers.TYA}/genres", timeout=2, headers={"Accept": "application/json"})
-                genres_resp.raise_for_status()
-                all_genres = genres_resp.json()
-                # Convertir los IDs de géneros a enteros para la comparación
-                genre_ids = [int(g) if isinstance(g, str) else g for g in song_data['genres']]
-                genres = [g for g in all_genres if g['id'] in genre_ids]
-            except requests.RequestException as e:
-                print(f"[DEBUG] Error getting genres: {e}")
-                pass
-        song_data['genres_data'] = genres
-        
-        # Resolver álbum original si existe
-        if song_data.get('albumId') is not None:
-            try:
-                album_resp = requests.get(f"{servers.TYA}/album/{song_data['albumId']}", timeout=2, headers={"Accept": "application/json"})
-                album_resp.raise_for_status()
-                album_data = album_resp.json()
-                
-                # Resolver artista del álbum
-                try:
-                    album_artist_resp = requests.get(f"{servers.TYA}/artist/{album_data['artistId']}", timeout=2, headers={"Accept": "application/json"})
-                    album_artist_resp.raise_for_status()
-                    album_data['artist'] = album_artist_resp.json()
-                except requests.RequestException:
-                    album_data['artist'] = {"artistId": album_data['artistId'], "nombre": "Artista desconocido"}
-                
-                song_data['original_album'] = album_data
-            except requests.RequestException:
-                song_data['original_album'] = None
-        else:
-            song_data['original_album'] = None
-        
-        # Resolver álbumes linkeados
-        linked_albums_data = []
-        if song_data.get('linked_albums'):
-            for linked_album_id in song_data['linked_albums']:
-                try:
-                    linked_album_resp = requests.get(f"{servers.TYA}/album/{linked_album_id}", timeout=2, headers={"Accept": "application/json"})
-                    linked_album_resp.raise_for_status()
-                    linked_album_data = linked_album_resp.json()
-                    
-                    # Resolver artista del álbum linkeado
-                    try:
-                        linked_artist_resp = requests.get(f"{servers.TYA}/artist/{linked_album_data['artistId']}", timeout=2, headers={"Accept": "application/json"})
-                        linked_artist_resp.raise_for_status()
-                        linked_album_data['artist'] = linked_artist_resp.json()
-                    except requests.RequestException:
-                        linked_album_data['artist'] = {"artistId": linked_album_data['artistId'], "nombre": "Artista desconocido"}
-                    
-                    linked_albums_data.append(linked_album_data)
-                except requests.RequestException:
-                    pass  # Ignorar álbumes que no se puedan cargar
-        song_data['linked_albums_data'] = linked_albums_data
-        
-        # Normalizar URLs de imágenes
-        if song_data.get('cover'):
-            song_data['cover'] = normalize_image_url(song_data['cover'], servers.TYA)
-        if song_data.get('original_album') and song_data['original_album'].get('cover'):
-            song_data['original_album']['cover'] = normalize_image_url(song_data['original_album']['cover'], servers.TYA)
-        for linked_album in song_data.get('linked_albums_data', []):
-            if linked_album.get('cover'):
-                linked_album['cover'] = normalize_image_url(linked_album['cover'], servers.TYA)
-        
-        # Normalizar precio: convertir string "10,00" a float 10.00
-        if song_data.get('price'):
-            try:
-                if isinstance(song_data['price'], str):
-                    song_data['price'] = float(song_data['price'].replace(',', '.'))
-                else:
-                    song_data['price'] = float(song_data['price'])
-            except (ValueError, TypeError):
-                song_data['price'] = 0.99
-        else:
-            song_data['price'] = 0.99
-        
-        # Normalizar precios de álbumes relacionados
-        if song_data.get('original_album') and song_data['original_album'].get('price'):
-            try:
-                if isinstance(song_data['original_album']['price'], str):
-                    song_data['original_album']['price'] = float(song_data['original_album']['price'].replace(',', '.'))
-                else:
-                    song_data['original_album']['price'] = float(song_data['original_album']['price'])
-            except (ValueError, TypeError):
-                song_data['original_album']['price'] = 9.99
-        
-        for linked_album in song_data.get('linked_albums_data', []):
-            if linked_album.get('price'):
-                try:
-                    if isinstance(linked_album['price'], str):
-                        linked_album['price'] = float(linked_album['price'].replace(',', '.'))
-                    else:
-                        linked_album['price'] = float(linked_album['price'])
-                except (ValueError, TypeError):
-                    linked_album['price'] = 9.99
-        
-        # Determinar si está en favoritos
-        isLiked = False
-        if userdata:
-            try:
-                fav_resp = requests.get(f"{servers.SYU}/favs/songs", timeout=2, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
-                if fav_resp.ok:
-                    fav_songs = fav_resp.json()
-                    # fav_songs puede ser lista de ids (integers) o objetos con id
-                    isLiked = songId in [item if isinstance(item, int) else item.get('id', 0) for item in fav_songs]
-            except requests.RequestException:
-                pass
-        
-        # Determinar si está en carrito (por ahora False, implementar después)
-        inCarrito = False
-        
-        # Determinar tipo de usuario (0: no autenticado, 1: usuario, 2: artista)
-        tipoUsuario = 0
-        if userdata:
-            tipoUsuario = 1  # TODO: Implementar lógica para distinguir artista
+# Plazo total para construir la página de una canción
+SONG_PAGE_DEADLINE = float(os.getenv("SONG_PAGE_DEADLINE", 4))
+UNKNOWN_ARTIST = "Artista desconocido"
+SONG_METRICS_FALLBACK = {"playbacks": 0, "sales": 0, "downloads": 0}
+
+
+def _unknown_artist(artist_id) -> dict:
+    return {"artistId": artist_id, "nombre": UNKNOWN_ARTIST}
+
+
+async def load_fav_ids(kind: str, token: str, id_key: str = 'id') -> set:
+    """IDs de los favoritos del usuario en SYU (songs, albums o artists)"""
+    if not token:
+        return set()
+    fav_resp = await upstream.get(f"{servers.SYU}/favs/{kind}", timeout=2, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
+    if not fav_resp.is_success:
+        return set()
+    # Puede ser lista de ids (integers) o de objetos con 'id_key'
+    return {item if isinstance(item, int) else item.get(id_key, 0) for item in fav_resp.json()}
+
+
+async def _load_song_metrics(songId: int) -> dict:
+    metrics_resp = await upstream.get(f"{servers.RYE}/statistics/metrics/song/{songId}", timeout=5)
+    metrics_resp.raise_for_status()
+    metrics_data = metrics_resp.json()
+    return {
+        "sales": metrics_data.get("sales", 0),
+        "downloads": metrics_data.get("downloads", 0),
+        "playbacks": metrics_data.get("playbacks", 0)
+    }
+
+
+async def _load_song_relations(song_data: dict, loader: EntityLoader) -> dict:
+    """
+    Artistas (autor y colaboradores) y álbumes (original y linkeados) de la canción en un
+    único lote por tipo, y después los artistas de esos álbumes (los ya cargados no se repiten)
+    """
+    artist_ids = [song_data.get('artistId'), *(song_data.get('collaborators') or [])]
+    album_ids = [song_data.get('albumId'), *(song_data.get('linked_albums') or [])]
+    artists, albums = await asyncio.gather(loader.load_many("artist", artist_ids), loader.load_many("album", album_ids))
+    artists.update(await loader.load_many("artist", [album.get('artistId') for album in albums.values() if album]))
+    return {"artists": artists, "albums": albums}
+
+
+def _song_page_album(album_id, relations: dict):
+    """Copia del álbum con su artista, portada y precio normalizados (None si no se pudo cargar)"""
+    album_data = relations["albums"].get(to_int_id(album_id))
+    if not album_data:
+        return None
+    album_data = dict(album_data)
+    album_data['artist'] = relations["artists"].get(to_int_id(album_data.get('artistId'))) or _unknown_artist(album_data.get('artistId'))
+    if album_data.get('cover'):
+        album_data['cover'] = normalize_image_url(album_data['cover'], servers.TYA, GRID_IMAGE_WIDTH)
+    if album_data.get('price'):
+        album_data['price'] = catalog.parse_price(album_data['price'], 9.99)
+    return album_data
 
-        metrics = None
-        try:
-            metrics_resp = requests.get(f"{servers.RYE}/statistics/metrics/song/{songId}", timeout=5)
-            metrics_resp.raise_for_status()
-            metrics_data = metrics_resp.json()
-            print(f"[DEBUG] Metrics response data: {metrics_data}")
-            metrics = {
-            "sales": metrics_data.get("sales", 0),
-            "downloads": metrics_data.get("downloads", 0),
-            "playbacks": metrics_data.get("playbacks", 0)
-            }
-        except requests.RequestException as e:
-            print(f"Error obteniendo métricas del artista: {e}")
-            metrics = {"playbacks": 0, "sales": 0, "downloads": 0}
-        
-        return osv.get_song_view(request, song_data, tipoUsuario, userdata, isLiked, inCarrito, servers.SYU, metrics, servers.TYA, servers.RYE, servers.PT)
-        
-    except requests.RequestException as e:
-        # En caso de error, mostrar página de error
-        print(e)
-        return osv.get_error_view(request, userdata, f"No se pudo cargar la canción", str(e))
+
+@app.get("/song/{songId}")
+async def get_song(request: Request, songId: int):
+    token = request.cookies.get("oversound_auth")
+    userdata = await obtain_user_data(token)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SONG_PAGE_DEADLINE
+
+    async def load_song():
+        song_resp = await upstream.get(f"{servers.TYA}/song/{songId}", timeout=2, headers={"Accept": "application/json"})
+        song_resp.raise_for_status()
+        return song_resp.json()
+
+    # Etapa 1: la canción y todo lo que no depende de ella (favoritos, métricas, géneros)
+    sections = await gather_with_deadline({
+        "song": load_song(),
+        "favs": load_fav_ids("songs", token if userdata else None),
+        "metrics": _load_song_metrics(songId),
+        "genres": refdata.get_genres(),
+    }, SONG_PAGE_DEADLINE, fallbacks={"favs": set(), "metrics": SONG_METRICS_FALLBACK, "genres": []})
+    song_data = sections["song"]
+    if not song_data:
+        return osv.get_error_view(request, userdata, f"No se pudo cargar la canción", "")
+
+    # Etapas 2 y 3: artistas y álbumes relacionados, por lotes, en lo que quede de plazo
+    relations = (await gather_with_deadline(
+        {"relations": _load_song_relations(song_data, EntityLoader(timeout=2))},
+        max(0, deadline - loop.time()),
+        fallbacks={"relations": {"artists": {}, "albums": {}}}
+    ))["relations"]
+
+    # Normalización en una sola pasada
+    song_data['cover'] = normalize_image_url(song_data.get('cover', ''), servers.TYA, DETAIL_IMAGE_WIDTH)
+    song_data['price'] = catalog.parse_price(song_data.get('price'), 0.99) if song_data.get('price') else 0.99
+    song_data['artist'] = relations["artists"].get(to_int_id(song_data.get('artistId'))) or _unknown_artist(song_data.get('artistId'))
+    song_data['collaborators_data'] = [
+        relations["artists"].get(to_int_id(collab_id)) or _unknown_artist(collab_id)
+        for collab_id in song_data.get('collaborators') or []
+    ]
+    genre_ids = {to_int_id(g) for g in song_data.get('genres') or []}
+    song_data['genres_data'] = [g for g in sections["genres"] if g['id'] in genre_ids]
+    song_data['original_album'] = _song_page_album(song_data['albumId'], relations) if song_data.get('albumId') is not None else None
+    # Los álbumes linkeados que no se puedan cargar se omiten
+    linked_albums = (_song_page_album(album_id, relations) for album_id in song_data.get('linked_albums') or [])
+    song_data['linked_albums_data'] = [album for album in linked_albums if album]
+
+    isLiked = songId in sections["favs"]
+    
+    # Determinar si está en carrito (por ahora False, implementar después)
+    inCarrito = False
+    
+    # Determinar tipo de usuario (0: no autenticado, 1: usuario, 2: artista)
+    tipoUsuario = 0
+    if userdata:
+        tipoUsuario = 1  # TODO: Implementar lógica para distinguir artista
+
+    return osv.get_song_view(request, song_data, tipoUsuario, userdata, isLiked, inCarrito, servers.SYU, sections["metrics"], servers.TYA, servers.RYE, servers.PT)
 
 
 @app.get("/song/{songId}/edit")
-def get_song_edit_page(request: Request, songId: int):
+async def get_song_edit_page(request: Request, songId: int):
     """
     Ruta para mostrar la página de edición de una canción
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -1914,7 +1522,7 @@ def get_song_edit_page(request: Request, songId: int):
     
     try:
         # Obtener datos de la canción
-        song_resp = requests.get(f"{servers.TYA}/song/{songId}", timeout=5, headers={"Accept": "application/json"})
+        song_resp = await upstream.get(f"{servers.TYA}/song/{songId}", timeout=5, headers={"Accept": "application/json"})
         song_resp.raise_for_status()
         song_data = song_resp.json()
         
@@ -1931,34 +1539,9 @@ def get_song_edit_page(request: Request, songId: int):
         if int(userdata.get('artistId')) != int(song_data.get('artistId')):
             return osv.get_error_view(request, userdata, "No tienes permiso para editar esta canción", "")
         
-        # Obtener géneros disponibles
-        try:
-            genres_resp = requests.get(f"{servers.TYA}/genres", timeout=5, headers={"Accept": "application/json"})
-            genres_resp.raise_for_status()
-            genres = genres_resp.json()
-        except requests.RequestException:
-            genres = []
-        
-        # Obtener artistas para colaboradores
-        try:
-            # Primero filter para obtener todos los artistas (IDs)
-            filter_resp = requests.get(f"{servers.TYA}/artist/filter", timeout=5, headers={"Accept": "application/json"})
-            if filter_resp.ok:
-                artist_ids = filter_resp.json()
-                if artist_ids:
-                    # Luego list para obtener detalles completos
-                    ids_str = ','.join(map(str, artist_ids))
-                    artists_resp = requests.get(f"{servers.TYA}/artist/list?ids={ids_str}", timeout=5, headers={"Accept": "application/json"})
-                    if artists_resp.ok:
-                        artists = artists_resp.json()
-                    else:
-                        artists = []
-                else:
-                    artists = []
-            else:
-                artists = []
-        except requests.RequestException:
-            artists = []
+        # Obtener géneros disponibles y artistas para colaboradores (caché de referencia)
+        genres = await refdata.get_genres()
+        artists = await refdata.get_artists()
         
         # Filtrar el artista actual de la lista de colaboradores
         artists = [a for a in artists if a['artistId'] != userdata.get('artistId')]
@@ -1968,7 +1551,7 @@ def get_song_edit_page(request: Request, songId: int):
         
         return osv.get_song_edit_view(request, userdata, song_data, servers.TYA)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo datos de la canción: {e}")
         return osv.get_error_view(request, userdata, "No se pudo cargar los datos de la canción", str(e))
 
@@ -1979,7 +1562,7 @@ async def update_song(request: Request, songId: int):
     Ruta para actualizar una canción
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -1989,14 +1572,15 @@ async def update_song(request: Request, songId: int):
     
     try:
         # Primero verificar propiedad
-        song_resp = requests.get(f"{servers.TYA}/song/{songId}", timeout=2, headers={"Accept": "application/json"})
+        song_resp = await upstream.get(f"{servers.TYA}/song/{songId}", timeout=2, headers={"Accept": "application/json"})
         song_resp.raise_for_status()
         song_data = song_resp.json()
         
         if int(userdata.get('artistId')) != int(song_data.get('artistId')):
             return JSONResponse(content={"error": "No tienes permiso para editar esta canción"}, status_code=403)
         
-        body = await request.json()
+        # El JSON puede traer el audio en base64: se parsea en el pool de media
+        body = await media.media_pool.run(json.loads, await request.body())
         
         # Extraer datos
         title = body.get('title')
@@ -2006,6 +1590,7 @@ async def update_song(request: Request, songId: int):
         genres = body.get('genres', [])
         collaborators = body.get('collaborators', [])
         audio_base64 = body.get('audioFile')
+        audio_session = body.get('audioSession')
         cover_base64 = body.get('coverFile')
         cover_extension = body.get('coverExtension')
         
@@ -2019,21 +1604,35 @@ async def update_song(request: Request, songId: int):
             'collaborators': [int(c) for c in collaborators] if collaborators else []
         }
         
-        # Si hay nuevo audio, subir a PT
-        if audio_base64:
-            audio_content = base64.b64decode(audio_base64)
-            # Calcular duración
-            audio = MutagenFile(BytesIO(audio_content))
-            if audio and audio.info:
-                duration = int(audio.info.length)
-            else:
-                duration = 0
-            update_data['duration'] = duration
+        # Si hay nuevo audio subido por trozos, subirlo a PT desde su fichero
+        if audio_session:
+            # La sesión solo se cierra cuando PT acepta el track: si algo falla antes (pool
+            # lleno, error de PT) el audio sigue subido y la edición se puede reintentar
+            session = uploads.upload_sessions.claim(audio_session, userdata.get('userId'))
+            if session is None:
+                return JSONResponse(content={"message": "La subida del audio no existe o no está completa"}, status_code=400)
+            try:
+                update_data['duration'] = await media.media_pool.run(media.audio_duration, session.path)
+                pt_resp = await uploads.send_track(session.path, token)
+                if pt_resp.is_success:
+                    update_data['trackId'] = pt_resp.json()['idtrack']
+            except BaseException:
+                uploads.upload_sessions.release(session)
+                raise
+            if not pt_resp.is_success:
+                uploads.upload_sessions.release(session)
+                return JSONResponse(content={"message": f"Error subiendo a PT: {pt_resp.text}"}, status_code=pt_resp.status_code)
+            uploads.upload_sessions.finish(session)
+
+        # Si hay nuevo audio en base64, subir a PT
+        elif audio_base64:
+            # Calcular duración (decodificación y Mutagen en el pool de media)
+            update_data['duration'] = await media.media_pool.run(media.base64_duration, audio_base64)
             
             # Subir a PT
             pt_body = {'track': audio_base64}
-            pt_resp = requests.post(f"{servers.PT}/track/upload", json=pt_body, timeout=10, headers={"Cookie": f"oversound_auth={token}"})
-            if not pt_resp.ok:
+            pt_resp = await upstream.post(f"{servers.PT}/track/upload", json=pt_body, timeout=10, headers={"Cookie": f"oversound_auth={token}"})
+            if not pt_resp.is_success:
                 return JSONResponse(content={"message": f"Error subiendo a PT: {pt_resp.text}"}, status_code=pt_resp.status_code)
             pt_data = pt_resp.json()
             track_id = pt_data['idtrack']
@@ -2045,17 +1644,20 @@ async def update_song(request: Request, songId: int):
             update_data['cover'] = cover_base64_full
         
         # Enviar actualización a TYA
-        update_resp = requests.patch(
+        update_resp = await upstream.patch(
             f"{servers.TYA}/song/{songId}",
             json=update_data,
             timeout=5,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         update_resp.raise_for_status()
+        catalog.expire()
         
         return JSONResponse(content={"message": "Canción actualizada correctamente", "songId": songId}, status_code=200)
         
-    except requests.RequestException as e:
+    except media.MediaPoolBusy:
+        return media_pool_busy_response()
+    except UpstreamError as e:
         error_msg = str(e)
         try:
             error_msg = e.response.json().get('message', str(e))
@@ -2070,14 +1672,14 @@ async def delete_album(request: Request, albumId: int):
     Ruta para eliminar un álbum
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
         # Primero obtener los datos del álbum para verificar la propiedad
-        album_resp = requests.get(f"{servers.TYA}/album/{albumId}", timeout=2, headers={"Accept": "application/json"})
+        album_resp = await upstream.get(f"{servers.TYA}/album/{albumId}", timeout=2, headers={"Accept": "application/json"})
         album_resp.raise_for_status()
         album_data = album_resp.json()
         
@@ -2086,190 +1688,140 @@ async def delete_album(request: Request, albumId: int):
             return JSONResponse(content={"error": "No tienes permisos para eliminar este álbum"}, status_code=403)
         
         # Eliminar el álbum
-        delete_resp = requests.delete(
+        delete_resp = await upstream.delete(
             f"{servers.TYA}/album/{albumId}",
             timeout=5,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         
-        if delete_resp.ok:
+        if delete_resp.is_success:
+            catalog.expire()
             return JSONResponse(content={"message": "Álbum eliminado exitosamente"})
         else:
             error_data = delete_resp.json() if delete_resp.text else {"error": "Error desconocido"}
             return JSONResponse(content=error_data, status_code=delete_resp.status_code)
     
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error eliminando álbum: {e}")
         return JSONResponse(content={"error": "Error al eliminar el álbum"}, status_code=500)
 
 
+# Plazo total para construir la página de un álbum
+ALBUM_PAGE_DEADLINE = float(os.getenv("ALBUM_PAGE_DEADLINE", 4))
+
+
+def _unknown_album_artist(artist_id) -> dict:
+    return {"artistId": artist_id, "artisticName": "Artista desconocido"}
+
+
+async def _load_album_tracks(album_data: dict, loader: EntityLoader) -> list:
+    """Canciones del álbum con su artista resuelto (las canciones y sus artistas en un lote por tipo)"""
+    songs = await loader.load_list("song", album_data.get('songs') or [])
+    song_artists = await loader.load_many("artist", [song_data.get('artistId') for song_data in songs])
+    return [
+        dict(song_data, artist=song_artists.get(to_int_id(song_data.get('artistId'))) or _unknown_album_artist(song_data.get('artistId')))
+        for song_data in songs
+    ]
+
+
+async def _load_album_related(album_data: dict, albumId: int, loader: EntityLoader) -> dict:
+    """
+    Artista del álbum y álbumes relacionados del mismo artista (owner_albums), sin el actual
+    y máximo 6. Comparte el loader con _load_album_tracks para ir en los mismos lotes.
+    """
+    artist = await loader.load("artist", album_data.get('artistId'))
+    related_ids = [aid for aid in (artist or {}).get('owner_albums') or [] if to_int_id(aid) != albumId][:6]
+    related_albums = await loader.load_list("album", related_ids)
+    return {"artist": artist, "albums": [dict(related) for related in related_albums]}
+
+
 @app.get("/album/{albumId}")
-def get_album(request: Request, albumId: int):
+async def get_album(request: Request, albumId: int):
     """
     Ruta para mostrar un álbum específico desde la tienda
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
-    
-    try:
-        # Obtener información del álbum
-        album_resp = requests.get(f"{servers.TYA}/album/{albumId}", timeout=2, headers={"Accept": "application/json"})
+    userdata = await obtain_user_data(token)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + ALBUM_PAGE_DEADLINE
+
+    async def load_album():
+        album_resp = await upstream.get(f"{servers.TYA}/album/{albumId}", timeout=2, headers={"Accept": "application/json"})
         album_resp.raise_for_status()
-        album_data = album_resp.json()
-        
-        # Resolver artista principal del álbum
-        try:
-            artist_resp = requests.get(f"{servers.TYA}/artist/{album_data['artistId']}", timeout=2, headers={"Accept": "application/json"})
-            artist_resp.raise_for_status()
-            album_data['artist'] = artist_resp.json()
-        except requests.RequestException:
-            album_data['artist'] = {"artistId": album_data['artistId'], "artisticName": "Artista desconocido"}
-        
-        # Resolver géneros
-        genres = []
-        if album_data.get('genres'):
-            try:
-                genres_resp = requests.get(f"{servers.TYA}/genres", timeout=2, headers={"Accept": "application/json"})
-                genres_resp.raise_for_status()
-                all_genres = genres_resp.json()
-                genres = [g for g in all_genres if g['id'] in album_data['genres']]
-            except requests.RequestException:
-                pass
-        album_data['genres_data'] = genres
-        
-        # Resolver canciones del álbum usando /song/list
-        songs = []
-        if album_data.get('songs'):
-            try:
-                # Obtener todas las canciones en una sola petición
-                song_ids = ','.join(str(sid) for sid in album_data['songs'])
-                songs_resp = requests.get(f"{servers.TYA}/song/list?ids={song_ids}", timeout=2, headers={"Accept": "application/json"})
-                songs_resp.raise_for_status()
-                songs_list = songs_resp.json()
-                
-                # Resolver artistas de las canciones
-                for song_data in songs_list:
-                    try:
-                        song_artist_resp = requests.get(f"{servers.TYA}/artist/{song_data['artistId']}", timeout=2, headers={"Accept": "application/json"})
-                        song_artist_resp.raise_for_status()
-                        song_data['artist'] = song_artist_resp.json()
-                    except requests.RequestException:
-                        song_data['artist'] = {"artistId": song_data['artistId'], "artisticName": "Artista desconocido"}
-                    songs.append(song_data)
-            except requests.RequestException:
-                pass  # Si no se pueden cargar, dejar vacío
-        
-        # Ordenar canciones por albumOrder si existe (None se trata como 999 para ordenar al final)
-        songs = sorted(songs, key=lambda x: x.get('albumOrder') if x.get('albumOrder') is not None else 999)
-        album_data['songs_data'] = songs
-        
-        # Resolver álbumes relacionados del mismo artista usando el campo owner_albums del artista
-        related_albums = []
-        if album_data.get('artist') and album_data['artist'].get('owner_albums'):
-            try:
-                # Excluir el álbum actual y tomar máximo 6
-                related_ids = [aid for aid in album_data['artist']['owner_albums'] if aid != albumId][:6]
-                if related_ids:
-                    related_ids_str = ','.join(str(aid) for aid in related_ids)
-                    related_resp = requests.get(f"{servers.TYA}/album/list?ids={related_ids_str}", timeout=2, headers={"Accept": "application/json"})
-                    related_resp.raise_for_status()
-                    related_albums = related_resp.json()
-            except requests.RequestException:
-                pass  # Si no se pueden cargar, dejar vacío
-        album_data['related_albums'] = related_albums
-        
-        # Normalizar URLs de imágenes y precios
-        if album_data.get('cover'):
-            album_data['cover'] = normalize_image_url(album_data['cover'], servers.TYA)
-        for song in album_data.get('songs_data', []):
-            if song.get('cover'):
-                song['cover'] = normalize_image_url(song['cover'], servers.TYA)
-            # Normalizar precio de canción
-            if song.get('price'):
-                try:
-                    if isinstance(song['price'], str):
-                        song['price'] = float(song['price'].replace(',', '.'))
-                    else:
-                        song['price'] = float(song['price'])
-                except (ValueError, TypeError):
-                    song['price'] = 0.99
-        for related in album_data.get('related_albums', []):
-            if related.get('cover'):
-                related['cover'] = normalize_image_url(related['cover'], servers.TYA)
-            # Normalizar precio de álbum relacionado
-            if related.get('price'):
-                try:
-                    if isinstance(related['price'], str):
-                        related['price'] = float(related['price'].replace(',', '.'))
-                    else:
-                        related['price'] = float(related['price'])
-                except (ValueError, TypeError):
-                    related['price'] = 9.99
-        
-        # Normalizar precio: convertir string "10,00" a float 10.00
-        if album_data.get('price'):
+        return album_resp.json()
+
+    # Etapa 1: el álbum y todo lo que no depende de él (favoritos, géneros)
+    sections = await gather_with_deadline({
+        "album": load_album(),
+        "favs": load_fav_ids("albums", token if userdata else None, id_key='albumId'),
+        "genres": refdata.get_genres(),
+    }, ALBUM_PAGE_DEADLINE, fallbacks={"favs": set(), "genres": []})
+    album_data = sections["album"]
+    if not album_data:
+        return osv.get_error_view(request, userdata, f"No se pudo cargar el álbum", "")
+
+    # Etapa 2: canciones, artista y álbumes relacionados, por lotes, en lo que quede de plazo;
+    # si alguna parte no llega a tiempo la página se muestra sin ella
+    loader = EntityLoader(timeout=2)
+    relations = await gather_with_deadline({
+        "tracks": _load_album_tracks(album_data, loader),
+        "related": _load_album_related(album_data, albumId, loader),
+    }, max(0, deadline - loop.time()), fallbacks={"tracks": [], "related": {"artist": None, "albums": []}})
+    album_data['artist'] = relations["related"]["artist"] or _unknown_album_artist(album_data.get('artistId'))
+    album_data['songs_data'] = relations["tracks"]
+    album_data['related_albums'] = relations["related"]["albums"]
+
+    genre_ids = {to_int_id(g) for g in album_data.get('genres') or []}
+    album_data['genres_data'] = [g for g in sections["genres"] if g['id'] in genre_ids]
+
+    # Ordenar canciones por albumOrder si existe (None se trata como 999 para ordenar al final)
+    songs = sorted(album_data['songs_data'], key=lambda x: x.get('albumOrder') if x.get('albumOrder') is not None else 999)
+    album_data['songs_data'] = songs
+
+    # Normalizar URLs de imágenes y precios, y sumar la duración total en la misma pasada
+    album_data['cover'] = normalize_image_url(album_data['cover'], servers.TYA, DETAIL_IMAGE_WIDTH) if album_data.get('cover') else album_data.get('cover')
+    album_data['price'] = catalog.parse_price(album_data['price'], 0.0) if album_data.get('price') else 0.0
+    total_duration = 0
+    for song in songs:
+        if song.get('cover'):
+            song['cover'] = normalize_image_url(song['cover'], servers.TYA, GRID_IMAGE_WIDTH)
+        if song.get('price'):
+            song['price'] = catalog.parse_price(song['price'], 0.99)
+        if song.get('duration'):
             try:
-                if isinstance(album_data['price'], str):
-                    album_data['price'] = float(album_data['price'].replace(',', '.'))
-                else:
-                    album_data['price'] = float(album_data['price'])
+                total_duration += int(song['duration'])
             except (ValueError, TypeError):
-                album_data['price'] = 0.0
-        else:
-            album_data['price'] = 0.0
-        
-        # Calcular duración total del álbum
-        total_duration = 0
-        for song in songs:
-            if song.get('duration'):
-                try:
-                    total_duration += int(song['duration'])
-                except (ValueError, TypeError):
-                    pass  # Si no se puede convertir, ignorar
-        
-        # Formatear duración total
-        minutes = total_duration // 60
-        seconds = total_duration % 60
-        tiempo_formateado = f"{minutes}:{seconds:02d}"
-        
-        # Determinar si está en favoritos y carrito (por ahora False, implementar después)
-        isLiked = False
-        if userdata:
-            try:
-                fav_resp = requests.get(f"{servers.SYU}/favs/albums", timeout=2, headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"})
-                if fav_resp.ok:
-                    fav_albums = fav_resp.json()
-                    # Manejar tanto listas de objetos como listas de IDs
-                    if fav_albums and len(fav_albums) > 0:
-                        if isinstance(fav_albums[0], dict):
-                            # Lista de objetos con 'albumId'
-                            isLiked = albumId in [fav.get('albumId') for fav in fav_albums]
-                        else:
-                            # Lista de IDs directamente
-                            isLiked = albumId in fav_albums
-            except requests.RequestException:
-                pass  # Si no se pueden cargar favoritos, asumir False
-        inCarrito = False
-        
-        # Determinar tipo de usuario (0: no autenticado, 1: usuario, 2: artista)
-        tipoUsuario = 0
-        if userdata:
-            tipoUsuario = 1  # TODO: Implementar lógica para distinguir artista
-        
-        return osv.get_album_view(request, album_data, tipoUsuario, isLiked, inCarrito, tiempo_formateado, userdata, servers.PT)
-        
-    except requests.RequestException as e:
-        # En caso de error, mostrar página de error
-        return osv.get_error_view(request, userdata, f"No se pudo cargar el álbum", str(e))
+                pass  # Si no se puede convertir, ignorar
+    for related in album_data['related_albums']:
+        if related.get('cover'):
+            related['cover'] = normalize_image_url(related['cover'], servers.TYA, GRID_IMAGE_WIDTH)
+        if related.get('price'):
+            related['price'] = catalog.parse_price(related['price'], 9.99)
+
+    # Formatear duración total
+    minutes = total_duration // 60
+    seconds = total_duration % 60
+    tiempo_formateado = f"{minutes}:{seconds:02d}"
+
+    isLiked = albumId in sections["favs"]
+    inCarrito = False
+
+    # Determinar tipo de usuario (0: no autenticado, 1: usuario, 2: artista)
+    tipoUsuario = 0
+    if userdata:
+        tipoUsuario = 1  # TODO: Implementar lógica para distinguir artista
+
+    return osv.get_album_view(request, album_data, tipoUsuario, isLiked, inCarrito, tiempo_formateado, userdata, servers.PT)
 
 
 @app.get("/album/{albumId}/edit")
-def get_album_edit_page(request: Request, albumId: int):
+async def get_album_edit_page(request: Request, albumId: int):
     """
     Ruta para mostrar la página de edición de un álbum
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -2280,7 +1832,7 @@ def get_album_edit_page(request: Request, albumId: int):
     
     try:
         # Obtener datos del álbum
-        album_resp = requests.get(f"{servers.TYA}/album/{albumId}", timeout=5, headers={"Accept": "application/json"})
+        album_resp = await upstream.get(f"{servers.TYA}/album/{albumId}", timeout=5, headers={"Accept": "application/json"})
         album_resp.raise_for_status()
         album_data = album_resp.json()
         
@@ -2300,8 +1852,8 @@ def get_album_edit_page(request: Request, albumId: int):
         try:
             if album_data.get('songs'):
                 ids_str = ','.join(map(str, album_data['songs']))
-                songs_resp = requests.get(f"{servers.TYA}/song/list?ids={ids_str}", timeout=5, headers={"Accept": "application/json"})
-                if songs_resp.ok:
+                songs_resp = await upstream.get(f"{servers.TYA}/song/list?ids={ids_str}", timeout=5, headers={"Accept": "application/json"})
+                if songs_resp.is_success:
                     album_songs = songs_resp.json()
                     # Asegurar que duration sea int
                     for song in album_songs:
@@ -2310,39 +1862,14 @@ def get_album_edit_page(request: Request, albumId: int):
                     album_songs = []
             else:
                 album_songs = []
-        except requests.RequestException:
+        except UpstreamError:
             album_songs = []
         
         album_data['album_songs'] = album_songs
         
-        # Obtener géneros disponibles
-        try:
-            genres_resp = requests.get(f"{servers.TYA}/genres", timeout=5, headers={"Accept": "application/json"})
-            genres_resp.raise_for_status()
-            genres = genres_resp.json()
-        except requests.RequestException:
-            genres = []
-        
-        # Obtener artistas para colaboradores
-        try:
-            # Primero filter para obtener todos los artistas (IDs)
-            filter_resp = requests.get(f"{servers.TYA}/artist/filter", timeout=5, headers={"Accept": "application/json"})
-            if filter_resp.ok:
-                artist_ids = filter_resp.json()
-                if artist_ids:
-                    # Luego list para obtener detalles completos
-                    ids_str = ','.join(map(str, artist_ids))
-                    artists_resp = requests.get(f"{servers.TYA}/artist/list?ids={ids_str}", timeout=5, headers={"Accept": "application/json"})
-                    if artists_resp.ok:
-                        artists = artists_resp.json()
-                    else:
-                        artists = []
-                else:
-                    artists = []
-            else:
-                artists = []
-        except requests.RequestException:
-            artists = []
+        # Obtener géneros disponibles y artistas para colaboradores (caché de referencia)
+        genres = await refdata.get_genres()
+        artists = await refdata.get_artists()
         
         # Filtrar el artista actual de la lista de colaboradores
         artists = [a for a in artists if a['artistId'] != userdata.get('artistId')]
@@ -2352,7 +1879,7 @@ def get_album_edit_page(request: Request, albumId: int):
         
         return osv.get_album_edit_view(request, userdata, album_data, servers.TYA)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo datos del álbum: {e}")
         return osv.get_error_view(request, userdata, "No se pudo cargar los datos del álbum", str(e))
 
@@ -2363,7 +1890,7 @@ async def update_album(request: Request, albumId: int):
     Ruta para actualizar un álbum
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -2373,7 +1900,7 @@ async def update_album(request: Request, albumId: int):
     
     try:
         # Primero verificar propiedad
-        album_resp = requests.get(f"{servers.TYA}/album/{albumId}", timeout=2, headers={"Accept": "application/json"})
+        album_resp = await upstream.get(f"{servers.TYA}/album/{albumId}", timeout=2, headers={"Accept": "application/json"})
         album_resp.raise_for_status()
         album_data = album_resp.json()
         
@@ -2410,17 +1937,18 @@ async def update_album(request: Request, albumId: int):
             update_data['cover'] = cover_base64_full
         
         # Enviar actualización a TYA
-        update_resp = requests.patch(
+        update_resp = await upstream.patch(
             f"{servers.TYA}/album/{albumId}",
             json=update_data,
             timeout=5,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         update_resp.raise_for_status()
+        catalog.expire()
         
         return JSONResponse(content={"message": "Álbum actualizado correctamente", "albumId": albumId}, status_code=200)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         error_msg = str(e)
         try:
             error_msg = e.response.json().get('message', str(e))
@@ -2435,14 +1963,14 @@ async def delete_merch(request: Request, merchId: int):
     Ruta para eliminar un producto de merchandising
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
         # Primero obtener los datos del merch para verificar la propiedad
-        merch_resp = requests.get(f"{servers.TYA}/merch/{merchId}", timeout=2, headers={"Accept": "application/json"})
+        merch_resp = await upstream.get(f"{servers.TYA}/merch/{merchId}", timeout=2, headers={"Accept": "application/json"})
         merch_resp.raise_for_status()
         merch_data = merch_resp.json()
         
@@ -2451,43 +1979,44 @@ async def delete_merch(request: Request, merchId: int):
             return JSONResponse(content={"error": "No tienes permisos para eliminar este producto"}, status_code=403)
         
         # Eliminar el merchandising
-        delete_resp = requests.delete(
+        delete_resp = await upstream.delete(
             f"{servers.TYA}/merch/{merchId}",
             timeout=5,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         
-        if delete_resp.ok:
+        if delete_resp.is_success:
+            catalog.expire()
             return JSONResponse(content={"message": "Producto eliminado exitosamente"})
         else:
             error_data = delete_resp.json() if delete_resp.text else {"error": "Error desconocido"}
             return JSONResponse(content=error_data, status_code=delete_resp.status_code)
     
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error eliminando merchandising: {e}")
         return JSONResponse(content={"error": "Error al eliminar el producto"}, status_code=500)
 
 
 @app.get("/merch/{merchId}")
-def get_merch(request: Request, merchId: int):
+async def get_merch(request: Request, merchId: int):
     """
     Ruta para mostrar un producto de merchandising específico desde la tienda
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     try:
         # Obtener información del merch
-        merch_resp = requests.get(f"{servers.TYA}/merch/{merchId}", timeout=2, headers={"Accept": "application/json"})
+        merch_resp = await upstream.get(f"{servers.TYA}/merch/{merchId}", timeout=2, headers={"Accept": "application/json"})
         merch_resp.raise_for_status()
         merch_data = merch_resp.json()
         
         # Resolver artista principal del merch
         try:
-            artist_resp = requests.get(f"{servers.TYA}/artist/{merch_data['artistId']}", timeout=2, headers={"Accept": "application/json"})
+            artist_resp = await upstream.get(f"{servers.TYA}/artist/{merch_data['artistId']}", timeout=2, headers={"Accept": "application/json"})
             artist_resp.raise_for_status()
             merch_data['artist'] = artist_resp.json()
-        except requests.RequestException:
+        except UpstreamError:
             merch_data['artist'] = {"artistId": merch_data['artistId'], "artisticName": "Artista desconocido"}
         
         # Resolver colaboradores del merch (similar a las canciones)
@@ -2495,19 +2024,19 @@ def get_merch(request: Request, merchId: int):
         if merch_data.get('collaborators'):
             for collab_id in merch_data['collaborators']:
                 try:
-                    collab_resp = requests.get(f"{servers.TYA}/artist/{collab_id}", timeout=2, headers={"Accept": "application/json"})
+                    collab_resp = await upstream.get(f"{servers.TYA}/artist/{collab_id}", timeout=2, headers={"Accept": "application/json"})
                     collab_resp.raise_for_status()
                     collaborators.append(collab_resp.json())
-                except requests.RequestException:
+                except UpstreamError:
                     collaborators.append({"artistId": collab_id, "artisticName": "Artista desconocido"})
         merch_data['collaborators_data'] = collaborators
         
         # Normalizar URLs de imágenes y precios
         if merch_data.get('cover'):
-            merch_data['cover'] = normalize_image_url(merch_data['cover'], servers.TYA)
+            merch_data['cover'] = normalize_image_url(merch_data['cover'], servers.TYA, DETAIL_IMAGE_WIDTH)
         for related in merch_data.get('related_merch', []):
             if related.get('cover'):
-                related['cover'] = normalize_image_url(related['cover'], servers.TYA)
+                related['cover'] = normalize_image_url(related['cover'], servers.TYA, GRID_IMAGE_WIDTH)
             # Normalizar precio de merchandising relacionado
             if related.get('price'):
                 try:
@@ -2544,19 +2073,19 @@ def get_merch(request: Request, merchId: int):
         
         return osv.get_merch_view(request, merch_data, tipoUsuario, isLiked, inCarrito, userdata, servers.SYU, servers.TYA)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         # En caso de error, mostrar página de error
         print(e)
         return osv.get_error_view(request, userdata, f"No se pudo cargar el producto de merchandising", str(e))
 
 
 @app.get("/merch/{merchId}/edit")
-def get_merch_edit_page(request: Request, merchId: int):
+async def get_merch_edit_page(request: Request, merchId: int):
     """
     Ruta para mostrar la página de edición de un producto de merchandising
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -2567,7 +2096,7 @@ def get_merch_edit_page(request: Request, merchId: int):
     
     try:
         # Obtener datos del merchandising
-        merch_resp = requests.get(f"{servers.TYA}/merch/{merchId}", timeout=5, headers={"Accept": "application/json"})
+        merch_resp = await upstream.get(f"{servers.TYA}/merch/{merchId}", timeout=5, headers={"Accept": "application/json"})
         merch_resp.raise_for_status()
         merch_data = merch_resp.json()
         
@@ -2594,7 +2123,7 @@ def get_merch_edit_page(request: Request, merchId: int):
                 merch_data['price'] = ''
         return osv.get_merch_edit_view(request, userdata, merch_data, servers.TYA)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo datos del merchandising: {e}")
         return osv.get_error_view(request, userdata, "No se pudo cargar los datos del producto", str(e))
 
@@ -2605,7 +2134,7 @@ async def update_merch(request: Request, merchId: int):
     Ruta para actualizar un producto de merchandising
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -2615,7 +2144,7 @@ async def update_merch(request: Request, merchId: int):
     
     try:
         # Primero verificar propiedad
-        merch_resp = requests.get(f"{servers.TYA}/merch/{merchId}", timeout=2, headers={"Accept": "application/json"})
+        merch_resp = await upstream.get(f"{servers.TYA}/merch/{merchId}", timeout=2, headers={"Accept": "application/json"})
         merch_resp.raise_for_status()
         merch_data = merch_resp.json()
         
@@ -2638,17 +2167,18 @@ async def update_merch(request: Request, merchId: int):
                 body.pop('price', None)
         
         # Enviar actualización a TYA
-        update_resp = requests.patch(
+        update_resp = await upstream.patch(
             f"{servers.TYA}/merch/{merchId}",
             json=body,
             timeout=5,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         update_resp.raise_for_status()
+        catalog.expire()
         
         return JSONResponse(content={"message": "Producto actualizado correctamente", "merchId": merchId}, status_code=200)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         error_msg = str(e)
         try:
             error_msg = e.response.json().get('message', str(e))
@@ -2658,29 +2188,23 @@ async def update_merch(request: Request, merchId: int):
 
 
 @app.get("/label/{labelId}")
-def get_label(request: Request, labelId: int):
+async def get_label(request: Request, labelId: int):
     """
     Ruta para mostrar el perfil de una discográfica
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     try:
         # Obtener información de la discográfica
-        label_resp = requests.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
+        label_resp = await upstream.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
         label_resp.raise_for_status()
         label_data = label_resp.json()
         
         # Resolver artistas de la discográfica
         artists = []
         if label_data.get('artists'):
-            for artist_id in label_data['artists']:
-                try:
-                    artist_resp = requests.get(f"{servers.TYA}/artist/{artist_id}", timeout=2, headers={"Accept": "application/json"})
-                    artist_resp.raise_for_status()
-                    artists.append(artist_resp.json())
-                except requests.RequestException:
-                    pass
+            artists = await EntityLoader(timeout=2).load_list("artist", label_data['artists'])
         label_data['artists'] = artists
         label_data['artists_count'] = len(artists)
         
@@ -2690,49 +2214,49 @@ def get_label(request: Request, labelId: int):
         
         return osv.get_label_view(request, label_data, is_owner, is_member, userdata, servers.SYU)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(e)
         return osv.get_error_view(request, userdata, "No se pudo cargar la discográfica", str(e))
 
 
 @app.get("/label/create")
-def get_label_create(request: Request):
+async def get_label_create(request: Request):
     """
     Ruta para la página de crear discográfica
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
     
     # Verificar si el usuario ya tiene una discográfica
     try:
-        existing_label_resp = requests.get(f"{servers.TYA}/user/{userdata.get('userId')}/label", timeout=2, headers={"Accept": "application/json"})
-        if existing_label_resp.ok:
+        existing_label_resp = await upstream.get(f"{servers.TYA}/user/{userdata.get('userId')}/label", timeout=2, headers={"Accept": "application/json"})
+        if existing_label_resp.is_success:
             existing_label = existing_label_resp.json()
             if existing_label:
                 return RedirectResponse(f"/label/{existing_label.get('id')}/edit")
-    except requests.RequestException:
+    except UpstreamError:
         pass
     
     return osv.get_label_create_view(request, None, userdata, servers.SYU)
 
 
 @app.get("/label/{labelId}/edit")
-def get_label_edit(request: Request, labelId: int):
+async def get_label_edit(request: Request, labelId: int):
     """
     Ruta para editar una discográfica existente
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
     
     try:
         # Obtener información de la discográfica
-        label_resp = requests.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
+        label_resp = await upstream.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
         label_resp.raise_for_status()
         label_data = label_resp.json()
         
@@ -2742,7 +2266,7 @@ def get_label_edit(request: Request, labelId: int):
         
         return osv.get_label_create_view(request, label_data, userdata, servers.SYU)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(e)
         return osv.get_error_view(request, userdata, "No se pudo cargar la discográfica", str(e))
 
@@ -2753,7 +2277,7 @@ async def create_label(request: Request):
     Ruta para crear una nueva discográfica
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -2765,14 +2289,14 @@ async def create_label(request: Request):
         body['ownerId'] = userdata.get('userId')
         
         # Crear la discográfica en la API
-        label_resp = requests.post(
+        label_resp = await upstream.post(
             f"{servers.TYA}/label",
             json=body,
             timeout=2,
             headers={"Accept": "application/json"}
         )
         
-        if label_resp.ok:
+        if label_resp.is_success:
             label_data = label_resp.json()
             return JSONResponse(content={"labelId": label_data.get('id')})
         else:
@@ -2790,14 +2314,14 @@ async def update_label(request: Request, labelId: int):
     Ruta para actualizar una discográfica
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
         # Verificar que sea propietario
-        label_resp = requests.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
+        label_resp = await upstream.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
         label_resp.raise_for_status()
         label_data = label_resp.json()
         
@@ -2807,14 +2331,14 @@ async def update_label(request: Request, labelId: int):
         body = await request.json()
         
         # Actualizar la discográfica
-        update_resp = requests.put(
+        update_resp = await upstream.put(
             f"{servers.TYA}/label/{labelId}",
             json=body,
             timeout=2,
             headers={"Accept": "application/json"}
         )
         
-        if update_resp.ok:
+        if update_resp.is_success:
             return JSONResponse(content={"message": "Discográfica actualizada"})
         else:
             error_data = update_resp.json()
@@ -2831,14 +2355,14 @@ async def delete_label(request: Request, labelId: int):
     Ruta para eliminar una discográfica
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
         # Verificar que sea propietario
-        label_resp = requests.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
+        label_resp = await upstream.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
         label_resp.raise_for_status()
         label_data = label_resp.json()
         
@@ -2846,13 +2370,13 @@ async def delete_label(request: Request, labelId: int):
             return JSONResponse(content={"error": "No tienes permisos"}, status_code=403)
         
         # Eliminar la discográfica
-        delete_resp = requests.delete(
+        delete_resp = await upstream.delete(
             f"{servers.TYA}/label/{labelId}",
             timeout=2,
             headers={"Accept": "application/json"}
         )
         
-        if delete_resp.ok:
+        if delete_resp.is_success:
             return JSONResponse(content={"message": "Discográfica eliminada"})
         else:
             error_data = delete_resp.json() if delete_resp.text else {}
@@ -2869,20 +2393,20 @@ async def join_label(request: Request, labelId: int):
     Ruta para que un artista se una a una discográfica
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
         # Unirse a la discográfica
-        join_resp = requests.post(
+        join_resp = await upstream.post(
             f"{servers.TYA}/label/{labelId}/artist/{userdata.get('artistId')}",
             timeout=2,
             headers={"Accept": "application/json"}
         )
         
-        if join_resp.ok:
+        if join_resp.is_success:
             return JSONResponse(content={"message": "Te has unido a la discográfica"})
         else:
             error_data = join_resp.json() if join_resp.text else {}
@@ -2899,20 +2423,20 @@ async def leave_label(request: Request, labelId: int):
     Ruta para que un artista salga de una discográfica
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
         # Salir de la discográfica
-        leave_resp = requests.delete(
+        leave_resp = await upstream.delete(
             f"{servers.TYA}/label/{labelId}/artist/{userdata.get('artistId')}",
             timeout=2,
             headers={"Accept": "application/json"}
         )
         
-        if leave_resp.ok:
+        if leave_resp.is_success:
             return JSONResponse(content={"message": "Has salido de la discográfica"})
         else:
             error_data = leave_resp.json() if leave_resp.text else {}
@@ -2929,14 +2453,14 @@ async def remove_artist_from_label(request: Request, labelId: int, artistId: int
     Ruta para que el propietario elimine un artista de la discográfica
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
         # Verificar que sea propietario
-        label_resp = requests.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
+        label_resp = await upstream.get(f"{servers.TYA}/label/{labelId}", timeout=2, headers={"Accept": "application/json"})
         label_resp.raise_for_status()
         label_data = label_resp.json()
         
@@ -2944,13 +2468,13 @@ async def remove_artist_from_label(request: Request, labelId: int, artistId: int
             return JSONResponse(content={"error": "No tienes permisos"}, status_code=403)
         
         # Eliminar artista
-        remove_resp = requests.delete(
+        remove_resp = await upstream.delete(
             f"{servers.TYA}/label/{labelId}/artist/{artistId}",
             timeout=2,
             headers={"Accept": "application/json"}
         )
         
-        if remove_resp.ok:
+        if remove_resp.is_success:
             return JSONResponse(content={"message": "Artista eliminado"})
         else:
             error_data = remove_resp.json() if remove_resp.text else {}
@@ -2962,14 +2486,14 @@ async def remove_artist_from_label(request: Request, labelId: int, artistId: int
 
 
 @app.get("/user/label")
-def get_user_label(request: Request):
+async def get_user_label(request: Request):
     """
     Ruta para obtener la discográfica del usuario actual (si existe)
     DEPRECADO: La funcionalidad de discográficas está en proceso de descontinuación.
     Siempre devuelve que no hay discográfica sin consultar el backend.
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -2979,14 +2503,14 @@ def get_user_label(request: Request):
 
 
 @app.get("/artist/{artistId}/label")
-def get_artist_label(request: Request, artistId: int):
+async def get_artist_label(request: Request, artistId: int):
     """
     Ruta para obtener la discográfica de un artista específico
     DEPRECADO: La funcionalidad de discográficas está en proceso de descontinuación.
     Siempre devuelve que no hay discográfica sin consultar el backend.
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     # Determinar si es el propietario (para mantener compatibilidad)
     is_owner = False
@@ -3003,422 +2527,139 @@ def get_artist_label(request: Request, artistId: int):
 # ==================== USER PROFILE ROUTES ====================
 
 @app.get("/profile")
-def get_profile(request: Request):
+async def get_profile(request: Request):
     """
     Ruta para mostrar el perfil del usuario autenticado
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
-    
-    try:
-        # Obtener métodos de pago del usuario
-        payment_methods = []
-        try:
-            payment_resp = requests.get(
-                f"{servers.TPP}/payment",
-                timeout=2,
-                headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-            )
-            if payment_resp.ok:
-                payment_methods = payment_resp.json()
-        except requests.RequestException:
-            payment_methods = []
-        
-        # Obtener favoritos del usuario
-        favorite_songs = []
-        favorite_albums = []
-        favorite_artists = []
-        
-        try:
-            # Obtener canciones favoritas
-            songs_resp = requests.get(
-                f"{servers.SYU}/favs/songs",
-                timeout=2,
-                headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-            )
-            if songs_resp.ok:
-                song_ids = songs_resp.json()
-                if song_ids:
-                    # Obtener datos completos de las canciones
-                    song_ids_str = ','.join(map(str, song_ids))
-                    songs_data_resp = requests.get(
-                        f"{servers.TYA}/song/list?ids={song_ids_str}",
-                        timeout=5,
-                        headers={"Accept": "application/json"}
-                    )
-                    if songs_data_resp.ok:
-                        favorite_songs = songs_data_resp.json()
-                        # Resolver artistas de las canciones
-                        for song in favorite_songs:
-                            try:
-                                artist_resp = requests.get(
-                                    f"{servers.TYA}/artist/{song['artistId']}",
-                                    timeout=2,
-                                    headers={"Accept": "application/json"}
-                                )
-                                if artist_resp.ok:
-                                    song['artist'] = artist_resp.json()
-                                else:
-                                    song['artist'] = {"artistId": song['artistId'], "artisticName": "Artista Desconocido"}
-                            except requests.RequestException:
-                                song['artist'] = {"artistId": song['artistId'], "artisticName": "Artista Desconocido"}
-                        # Normalizar URLs de imágenes para canciones
-                        for song in favorite_songs:
-                            if song.get('cover'):
-                                song['cover'] = normalize_image_url(song['cover'], servers.TYA)
-        except requests.RequestException:
-            favorite_songs = []
-        
-        try:
-            # Obtener álbumes favoritos
-            albums_resp = requests.get(
-                f"{servers.SYU}/favs/albums",
-                timeout=2,
-                headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-            )
-            if albums_resp.ok:
-                album_ids = albums_resp.json()
-                if album_ids:
-                    # Obtener datos completos de los álbumes
-                    album_ids_str = ','.join(map(str, album_ids))
-                    albums_data_resp = requests.get(
-                        f"{servers.TYA}/album/list?ids={album_ids_str}",
-                        timeout=5,
-                        headers={"Accept": "application/json"}
-                    )
-                    if albums_data_resp.ok:
-                        favorite_albums = albums_data_resp.json()
-                        # Resolver artistas de los albums
-                        for album in favorite_albums:
-                            try:
-                                artist_resp = requests.get(
-                                    f"{servers.TYA}/artist/{album['artistId']}",
-                                    timeout=2,
-                                    headers={"Accept": "application/json"}
-                                )
-                                if artist_resp.ok:
-                                    album['artist'] = artist_resp.json()
-                                else:
-                                    album['artist'] = {"artistId": album['artistId'], "artisticName": "Artista Desconocido"}
-                            except requests.RequestException:
-                                album['artist'] = {"artistId": album['artistId'], "artisticName": "Artista Desconocido"}
-                        # Normalizar URLs de imágenes para álbumes
-                        for album in favorite_albums:
-                            if album.get('cover'):
-                                album['cover'] = normalize_image_url(album['cover'], servers.TYA)
-        except requests.RequestException:
-            favorite_albums = []
-        
-        try:
-            # Obtener artistas favoritos
-            artists_resp = requests.get(
-                f"{servers.SYU}/favs/artists",
-                timeout=2,
-                headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-            )
-            if artists_resp.ok:
-                artist_ids = artists_resp.json()
-                if artist_ids:
-                    # Obtener datos completos de los artistas
-                    artist_ids_str = ','.join(map(str, artist_ids))
-                    artists_data_resp = requests.get(
-                        f"{servers.TYA}/artist/list?ids={artist_ids_str}",
-                        timeout=5,
-                        headers={"Accept": "application/json"}
-                    )
-                    if artists_data_resp.ok:
-                        favorite_artists = artists_data_resp.json()
-                        # Normalizar URLs de imágenes para artistas
-                        for artist in favorite_artists:
-                            if artist.get('artisticImage'):
-                                artist['artisticImage'] = normalize_image_url(artist['artisticImage'], servers.TYA)
-        except requests.RequestException:
-            favorite_artists = []
-
-        biblioteca = []
-        elementos_biblioteca = {'songs': [],
-            'albums': []
-        }
-        # Obtener elementos de la biblioteca del usuario
-        try:
-            biblioteca_resp = requests.get(
-                f"{servers.TPP}/purchase",
-                timeout = 2,
-                headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-            )
-            if not biblioteca_resp.ok:
-                raise requests.RequestException("Error al obtener la biblioteca")
-            
-            biblioteca = biblioteca_resp.json()
-            print(biblioteca)
-            
-            albums = []
-            included_songs = []
-            songs = []
-            for purchase in biblioteca:
-                for album in purchase.get('albumIds', []):
-                    if album not in albums:
-                        albums.append(album)
-                        albums_response = requests.get(
-                            f"{servers.TYA}/album/{album}",
-                            timeout=2,
-                            headers={"Accept": "application/json"}
-                        )
-                        if not albums_response.ok:
-                            continue
-                        album_data = albums_response.json()
-                        for song_id in album_data.get('songIds', []):
-                            if song_id not in included_songs:
-                                included_songs.append(song_id)
-            
-            for purchase in biblioteca:
-                for song in purchase.get('songIds', []):
-                    if song not in included_songs:
-                        songs.append(song)
-
-            # Obtener los datos de las canciones
-            print(songs)
-            if songs:
-                canciones_biblioteca_resp = requests.get( 
-                    f"{servers.TYA}/song/list?ids={','.join(map(str, songs))}",
-                    timeout = 2,
-                    headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-                )
-                if canciones_biblioteca_resp.ok:
-                    elementos_biblioteca['songs'] = canciones_biblioteca_resp.json() #Listado de canciones
-
-            # Obtener los datos de los albums
-            if albums:
-                albums_biblioteca_resp = requests.get( 
-                    f"{servers.TYA}/album/list?ids={','.join(map(str, albums))}",
-                    timeout = 2,
-                    headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-                )
-                if albums_biblioteca_resp.ok:
-                    elementos_biblioteca['albums'] = albums_biblioteca_resp.json() #Listado de albums
-
-        except requests.RequestException:
-            elementos_biblioteca = {'songs': [], 'albums': []}
-
-        
-        # Para simplificar, asumimos datos vacíos de biblioteca y listas
-        # En un caso real, se obtendrían del servidor
-        listas_completas = []
-        print(elementos_biblioteca['songs'])
-        
-        return osv.get_perfil_view(
-            request, 
-            userdata, 
-            elementos_biblioteca, 
-            listas_completas,
-            is_own_profile=True,
-            payment_methods=payment_methods,
-            favorite_songs=favorite_songs,
-            favorite_albums=favorite_albums,
-            favorite_artists=favorite_artists,
-            syu_server=servers.SYU,
-            tya_server=servers.TYA,
-            pt_server=servers.PT
+
+    async def load_payment_methods():
+        payment_resp = await upstream.get(
+            f"{servers.TPP}/payment",
+            timeout=2,
+            headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
-        
-    except Exception as e:
-        print(e)
-        return osv.get_error_view(request, userdata, "No se pudo cargar el perfil", str(e))
+        return payment_resp.json() if payment_resp.is_success else []
+
+    # Métodos de pago, favoritos y biblioteca en paralelo; las entidades de TYA por lotes
+    loader = EntityLoader(timeout=2)
+    sections = await gather_with_deadline({
+        "payment_methods": load_payment_methods(),
+        "favorites": profiles.load_favorites(token, loader),
+        "library": profiles.get_library(userdata.get('userId'), token, loader),
+    }, profiles.PROFILE_DEADLINE, fallbacks={
+        "payment_methods": [],
+        "favorites": profiles.EMPTY_FAVORITES,
+        "library": profiles.EMPTY_LIBRARY,
+    })
+    favorites = sections["favorites"]
+
+    # Para simplificar, asumimos datos vacíos de listas
+    # En un caso real, se obtendrían del servidor
+    listas_completas = []
+
+    return osv.get_perfil_view(
+        request, 
+        userdata, 
+        sections["library"], 
+        listas_completas,
+        is_own_profile=True,
+        payment_methods=sections["payment_methods"],
+        favorite_songs=favorites["songs"],
+        favorite_albums=favorites["albums"],
+        favorite_artists=favorites["artists"],
+        syu_server=servers.SYU,
+        tya_server=servers.TYA,
+        pt_server=servers.PT
+    )
 
 
 @app.get("/profile/{username}")
-def get_user_profile(request: Request, username: str):
+async def get_user_profile(request: Request, username: str):
     """
     Ruta para mostrar el perfil público de otro usuario
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
-    
-    try:
-        # Obtener información del usuario
-        user_resp = requests.get(
+    userdata = await obtain_user_data(token)
+
+    # Determinar si es el perfil del usuario autenticado
+    is_own_profile = bool(userdata) and userdata.get('username') == username
+
+    async def load_user():
+        user_resp = await upstream.get(
             f"{servers.SYU}/user/{username}",
             timeout=2,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         user_resp.raise_for_status()
-        user_data = user_resp.json()
-        
-        # Normalizar URL de imagen de perfil del usuario
-        if user_data.get('imagen'):
-            user_data['imagen'] = normalize_image_url(user_data['imagen'], servers.SYU)
-        
-        # Determinar si es el perfil del usuario autenticado
-        is_own_profile = userdata and userdata.get('username') == username
-        
-        # Si es perfil propio, obtener métodos de pago
-        payment_methods = []
-        if is_own_profile:
-            try:
-                payment_resp = requests.get(
-                    f"{servers.SYU}/user/{userdata.get('userId')}/payment-methods",
-                    timeout=2,
-                    headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-                )
-                if payment_resp.ok:
-                    payment_methods = payment_resp.json()
-            except requests.RequestException:
-                payment_methods = []
-        
-        # Obtener favoritos del usuario (solo si es perfil propio)
-        favorite_songs = []
-        favorite_albums = []
-        favorite_artists = []
-        
-        if is_own_profile:
-            try:
-                # Obtener canciones favoritas
-                songs_resp = requests.get(
-                    f"{servers.SYU}/favs/songs",
-                    timeout=2,
-                    headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-                )
-                if songs_resp.ok:
-                    song_ids = songs_resp.json()
-                    if song_ids:
-                        # Obtener datos completos de las canciones
-                        song_ids_str = ','.join(map(str, song_ids))
-                        songs_data_resp = requests.get(
-                            f"{servers.TYA}/song/list?ids={song_ids_str}",
-                            timeout=5,
-                            headers={"Accept": "application/json"}
-                        )
-                        if songs_data_resp.ok:
-                            favorite_songs = songs_data_resp.json()
-                            # Resolver artistas de las canciones
-                            for song in favorite_songs:
-                                try:
-                                    artist_resp = requests.get(
-                                        f"{servers.TYA}/artist/{song['artistId']}",
-                                        timeout=2,
-                                        headers={"Accept": "application/json"}
-                                    )
-                                    if artist_resp.ok:
-                                        song['artist'] = artist_resp.json()
-                                    else:
-                                        song['artist'] = {"artistId": song['artistId'], "artisticName": "Artista Desconocido"}
-                                except requests.RequestException:
-                                    song['artist'] = {"artistId": song['artistId'], "artisticName": "Artista Desconocido"}
-                            # Normalizar URLs de imágenes para canciones
-                            for song in favorite_songs:
-                                if song.get('cover'):
-                                    song['cover'] = normalize_image_url(song['cover'], servers.TYA)
-            except requests.RequestException:
-                favorite_songs = []
-            
-            try:
-                # Obtener álbumes favoritos
-                albums_resp = requests.get(
-                    f"{servers.SYU}/favs/albums",
-                    timeout=2,
-                    headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-                )
-                if albums_resp.ok:
-                    album_ids = albums_resp.json()
-                    if album_ids:
-                        # Obtener datos completos de los álbumes
-                        album_ids_str = ','.join(map(str, album_ids))
-                        albums_data_resp = requests.get(
-                            f"{servers.TYA}/album/list?ids={album_ids_str}",
-                            timeout=5,
-                            headers={"Accept": "application/json"}
-                        )
-                        if albums_data_resp.ok:
-                            favorite_albums = albums_data_resp.json()
-                            # Resolver artistas de los albums
-                            for album in favorite_albums:
-                                try:
-                                    artist_resp = requests.get(
-                                        f"{servers.TYA}/artist/{album['artistId']}",
-                                        timeout=2,
-                                        headers={"Accept": "application/json"}
-                                    )
-                                    if artist_resp.ok:
-                                        album['artist'] = artist_resp.json()
-                                    else:
-                                        album['artist'] = {"artistId": album['artistId'], "artisticName": "Artista Desconocido"}
-                                except requests.RequestException:
-                                    album['artist'] = {"artistId": album['artistId'], "artisticName": "Artista Desconocido"}
-                            # Normalizar URLs de imágenes para álbumes
-                            for album in favorite_albums:
-                                if album.get('cover'):
-                                    album['cover'] = normalize_image_url(album['cover'], servers.TYA)
-            except requests.RequestException:
-                favorite_albums = []
-            
-            try:
-                # Obtener artistas favoritos
-                artists_resp = requests.get(
-                    f"{servers.SYU}/favs/artists",
-                    timeout=2,
-                    headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-                )
-                if artists_resp.ok:
-                    artist_ids = artists_resp.json()
-                    if artist_ids:
-                        # Obtener datos completos de los artistas
-                        artist_ids_str = ','.join(map(str, artist_ids))
-                        artists_data_resp = requests.get(
-                            f"{servers.TYA}/artist/list?ids={artist_ids_str}",
-                            timeout=5,
-                            headers={"Accept": "application/json"}
-                        )
-                        if artists_data_resp.ok:
-                            favorite_artists = artists_data_resp.json()
-                            # Normalizar URLs de imágenes para artistas
-                            for artist in favorite_artists:
-                                if artist.get('artisticImage'):
-                                    artist['artisticImage'] = normalize_image_url(artist['artisticImage'], servers.TYA)
-            except requests.RequestException:
-                favorite_artists = []
-        
-        # Para simplificar, asumimos datos vacíos de biblioteca y listas
-        elementos_biblioteca = []
-        listas_completas = []
-        
-        return osv.get_perfil_view(
-            request,
-            user_data,
-            elementos_biblioteca,
-            listas_completas,
-            is_own_profile=is_own_profile,
-            payment_methods=payment_methods if is_own_profile else [],
-            favorite_songs=favorite_songs,
-            favorite_albums=favorite_albums,
-            favorite_artists=favorite_artists,
-            syu_server=servers.SYU,
-            tya_server=servers.TYA,
-            pt_server=servers.PT
+        return user_resp.json()
+
+    async def load_payment_methods():
+        payment_resp = await upstream.get(
+            f"{servers.SYU}/user/{userdata.get('userId')}/payment-methods",
+            timeout=2,
+            headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
-        
-    except requests.RequestException as e:
-        return osv.get_error_view(request, userdata, "No se pudo cargar el perfil del usuario", str(e))
+        return payment_resp.json() if payment_resp.is_success else []
+
+    # Usuario, y si es perfil propio métodos de pago y favoritos, en paralelo
+    sections = {"user": load_user()}
+    if is_own_profile:
+        sections["payment_methods"] = load_payment_methods()
+        sections["favorites"] = profiles.load_favorites(token, EntityLoader(timeout=2))
+    sections = await gather_with_deadline(sections, profiles.PROFILE_DEADLINE, fallbacks={
+        "payment_methods": [],
+        "favorites": profiles.EMPTY_FAVORITES,
+    })
+    user_data = sections["user"]
+    if not user_data:
+        return osv.get_error_view(request, userdata, "No se pudo cargar el perfil del usuario", "")
+
+    # Normalizar URL de imagen de perfil del usuario
+    if user_data.get('imagen'):
+        user_data['imagen'] = normalize_image_url(user_data['imagen'], servers.SYU)
+    favorites = sections.get("favorites") or profiles.EMPTY_FAVORITES
+
+    # Para simplificar, asumimos datos vacíos de biblioteca y listas
+    elementos_biblioteca = []
+    listas_completas = []
+
+    return osv.get_perfil_view(
+        request,
+        user_data,
+        elementos_biblioteca,
+        listas_completas,
+        is_own_profile=is_own_profile,
+        payment_methods=sections.get("payment_methods") or [],
+        favorite_songs=favorites["songs"],
+        favorite_albums=favorites["albums"],
+        favorite_artists=favorites["artists"],
+        syu_server=servers.SYU,
+        tya_server=servers.TYA,
+        pt_server=servers.PT
+    )
 
 
 # ==================== PAYMENT METHODS ROUTES ====================
 
 @app.get("/payment")
-def get_payment_methods(request: Request):
+async def get_payment_methods(request: Request):
     """
     Obtener métodos de pago del usuario autenticado
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
         # Llamar al microservicio TPP para obtener métodos de pago
-        response = requests.get(
+        response = await upstream.get(
             f"{servers.TPP}/payment",
             timeout=5,
             headers={
@@ -3427,12 +2668,12 @@ def get_payment_methods(request: Request):
             }
         )
         
-        if response.ok:
+        if response.is_success:
             return JSONResponse(content=response.json(), status_code=200)
         else:
             return JSONResponse(content={"error": "No se pudo obtener los métodos de pago"}, status_code=response.status_code)
             
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo métodos de pago: {e}")
         return JSONResponse(content={"error": "Error de conexión con el servicio de pagos"}, status_code=500)
 
@@ -3443,7 +2684,7 @@ async def add_payment_method(request: Request):
     Agregar un nuevo método de pago
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3495,7 +2736,7 @@ async def add_payment_method(request: Request):
         print(f"[DEBUG] Sending to TPP: {masked_data}")
         
         # Enviar al microservicio TPP
-        response = requests.post(
+        response = await upstream.post(
             f"{servers.TPP}/payment",
             json=payment_data,
             timeout=5,
@@ -3509,7 +2750,7 @@ async def add_payment_method(request: Request):
         print(f"[DEBUG] TPP response status: {response.status_code}")
         print(f"[DEBUG] TPP response body: {response.text}")
         
-        if response.ok:
+        if response.is_success:
             return JSONResponse(content=response.json(), status_code=200)
         else:
             error_msg = "No se pudo agregar el método de pago"
@@ -3522,7 +2763,7 @@ async def add_payment_method(request: Request):
                 pass
             return JSONResponse(content={"error": error_msg}, status_code=response.status_code)
             
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error agregando método de pago: {e}")
         return JSONResponse(content={"error": "Error de conexión con el servicio de pagos"}, status_code=500)
     except Exception as e:
@@ -3531,13 +2772,13 @@ async def add_payment_method(request: Request):
 
 
 @app.get("/profile-edit")
-def get_profile_edit_page(request: Request):
+async def get_profile_edit_page(request: Request):
     """
     Ruta para mostrar la página de edición de perfil de usuario
     """
     import time
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -3556,7 +2797,7 @@ async def update_profile(request: Request):
     """
     
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -3565,17 +2806,19 @@ async def update_profile(request: Request):
         # Obtener los datos del formulario
         form_data = await request.json()
 
-        resp = requests.patch(
+        resp = await upstream.patch(
             f"{servers.SYU}/user/{userdata.get('username')}",
             json=form_data,
             timeout=5,
             headers={"Cookie": f"oversound_auth={token}"}
         )
         resp.raise_for_status()
+        # Los datos de la sesión han cambiado: la próxima petición los vuelve a pedir a SYU
+        invalidate_user_data(token)
         
         return JSONResponse(content={"message": "Perfil actualizado correctamente"}, status_code=200)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         try:
             error_data = e.response.json()
             return JSONResponse(content=error_data, status_code=e.response.status_code)
@@ -3592,7 +2835,7 @@ async def add_to_cart(request: Request):
     Proxea la llamada a TPP /cart
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3606,7 +2849,7 @@ async def add_to_cart(request: Request):
         print(f"[DEBUG] Add to cart request body: {body}")
         
         # Enviar a TPP
-        cart_resp = requests.post(
+        cart_resp = await upstream.post(
             f"{servers.TPP}/cart",
             json=body,
             timeout=2,
@@ -3618,7 +2861,7 @@ async def add_to_cart(request: Request):
         
         cart_resp.raise_for_status()
         return JSONResponse(content=cart_resp.json(), status_code=cart_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error añadiendo al carrito: {e}")
         try:
             error_detail = e.response.json() if hasattr(e, 'response') and e.response else {}
@@ -3635,7 +2878,7 @@ async def remove_from_cart(request: Request, product_id: int, type: str = None):
     Proxea la llamada a TPP DELETE /cart/{productId}?type={type}
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3647,14 +2890,14 @@ async def remove_from_cart(request: Request, product_id: int, type: str = None):
             url += f"?type={type}"
         
         # Enviar a TPP
-        cart_resp = requests.delete(
+        cart_resp = await upstream.delete(
             url,
             timeout=2,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         cart_resp.raise_for_status()
         return JSONResponse(content=cart_resp.json(), status_code=cart_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error eliminando del carrito: {e}")
         return JSONResponse(content={"error": "No se pudo eliminar del carrito"}, status_code=500)
 
@@ -3667,7 +2910,7 @@ async def process_purchase(request: Request):
     Body esperado: {cartId, paymentMethodId, shippingAddress}
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3680,7 +2923,7 @@ async def process_purchase(request: Request):
         print(f"[DEBUG] Purchase request body: {body}")
         
         # Enviar a TPP
-        purchase_resp = requests.post(
+        purchase_resp = await upstream.post(
             f"{servers.TPP}/purchase",
             json=body,
             timeout=5,
@@ -3691,8 +2934,10 @@ async def process_purchase(request: Request):
         print(f"[DEBUG] TPP purchase response body: {purchase_resp.text}")
         
         purchase_resp.raise_for_status()
+        # La biblioteca del usuario ha cambiado: se materializa de nuevo en la próxima visita
+        profiles.invalidate_library(userdata.get('userId'))
         return JSONResponse(content=purchase_resp.json(), status_code=purchase_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error procesando compra: {e}")
         try:
             error_detail = e.response.json() if hasattr(e, 'response') and e.response else {}
@@ -3710,20 +2955,20 @@ async def get_payment_methods(request: Request):
     Proxea la llamada a TPP GET /payment
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
-        payment_resp = requests.get(
+        payment_resp = await upstream.get(
             f"{servers.TPP}/payment",
             timeout=2,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         payment_resp.raise_for_status()
         return JSONResponse(content=payment_resp.json(), status_code=payment_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo métodos de pago: {e}")
         return JSONResponse(content={"error": "No se pudo obtener métodos de pago"}, status_code=500)
 
@@ -3735,7 +2980,7 @@ async def add_payment_method(request: Request):
     Proxea la llamada a TPP POST /payment
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3743,7 +2988,7 @@ async def add_payment_method(request: Request):
     try:
         body = await request.json()
         
-        payment_resp = requests.post(
+        payment_resp = await upstream.post(
             f"{servers.TPP}/payment",
             json=body,
             timeout=2,
@@ -3751,7 +2996,7 @@ async def add_payment_method(request: Request):
         )
         payment_resp.raise_for_status()
         return JSONResponse(content=payment_resp.json(), status_code=payment_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error añadiendo método de pago: {e}")
         return JSONResponse(content={"error": "No se pudo añadir el método de pago"}, status_code=500)
 
@@ -3763,7 +3008,7 @@ async def update_payment_method(request: Request, payment_method_id: int):
     Proxea la llamada a TPP PUT /payment/{paymentMethodId}
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3771,7 +3016,7 @@ async def update_payment_method(request: Request, payment_method_id: int):
     try:
         body = await request.json()
         
-        payment_resp = requests.put(
+        payment_resp = await upstream.put(
             f"{servers.TPP}/payment/{payment_method_id}",
             json=body,
             timeout=2,
@@ -3779,7 +3024,7 @@ async def update_payment_method(request: Request, payment_method_id: int):
         )
         payment_resp.raise_for_status()
         return JSONResponse(content=payment_resp.json(), status_code=payment_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error actualizando método de pago: {e}")
         return JSONResponse(content={"error": "No se pudo actualizar el método de pago"}, status_code=500)
 
@@ -3791,20 +3036,20 @@ async def delete_payment_method(request: Request, payment_method_id: int):
     Proxea la llamada a TPP DELETE /payment/{paymentMethodId}
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
-        payment_resp = requests.delete(
+        payment_resp = await upstream.delete(
             f"{servers.TPP}/payment/{payment_method_id}",
             timeout=2,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         payment_resp.raise_for_status()
         return JSONResponse(content=payment_resp.json(), status_code=payment_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error eliminando método de pago: {e}")
         return JSONResponse(content={"error": "No se pudo eliminar el método de pago"}, status_code=500)
 
@@ -3817,7 +3062,7 @@ async def get_favorites(request: Request, content_type: str):
     Proxea la llamada a SYU GET /favs/{contentType}
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3826,14 +3071,14 @@ async def get_favorites(request: Request, content_type: str):
         return JSONResponse(content={"error": "Tipo de contenido inválido"}, status_code=400)
     
     try:
-        fav_resp = requests.get(
+        fav_resp = await upstream.get(
             f"{servers.SYU}/favs/{content_type}",
             timeout=2,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         fav_resp.raise_for_status()
         return JSONResponse(content=fav_resp.json(), status_code=fav_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo favoritos: {e}")
         return JSONResponse(content={"error": "No se pudieron obtener los favoritos"}, status_code=500)
 
@@ -3845,7 +3090,7 @@ async def add_favorite(request: Request, content_type: str, content_id: int):
     Proxea la llamada a SYU POST /favs/{contentType}/{contentId}
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3854,14 +3099,14 @@ async def add_favorite(request: Request, content_type: str, content_id: int):
         return JSONResponse(content={"error": "Tipo de contenido inválido"}, status_code=400)
     
     try:
-        fav_resp = requests.post(
+        fav_resp = await upstream.post(
             f"{servers.SYU}/favs/{content_type}/{content_id}",
             timeout=2,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         fav_resp.raise_for_status()
         return JSONResponse(content=fav_resp.json(), status_code=fav_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error añadiendo a favoritos: {e}")
         return JSONResponse(content={"error": "No se pudo añadir a favoritos"}, status_code=500)
 
@@ -3873,7 +3118,7 @@ async def remove_favorite(request: Request, content_type: str, content_id: int):
     Proxea la llamada a SYU DELETE /favs/{contentType}/{contentId}
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3882,26 +3127,26 @@ async def remove_favorite(request: Request, content_type: str, content_id: int):
         return JSONResponse(content={"error": "Tipo de contenido inválido"}, status_code=400)
     
     try:
-        fav_resp = requests.delete(
+        fav_resp = await upstream.delete(
             f"{servers.SYU}/favs/{content_type}/{content_id}",
             timeout=2,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         fav_resp.raise_for_status()
         return JSONResponse(content=fav_resp.json(), status_code=fav_resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error eliminando de favoritos: {e}")
         return JSONResponse(content={"error": "No se pudo eliminar de favoritos"}, status_code=500)
 
 
 # ===================== ARTIST CREATE ROUTES =====================
 @app.get("/artist/create")
-def artist_create_page(request: Request):
+async def artist_create_page(request: Request):
     """
     Ruta para mostrar la página de crear perfil de artista
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
 
     if not userdata:
         return RedirectResponse("/login")
@@ -3921,7 +3166,7 @@ async def create_artist(request: Request):
     Ruta para procesar la creación de un perfil de artista
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -3937,30 +3182,33 @@ async def create_artist(request: Request):
         body['userId'] = userdata.get('userId')
         
         # Enviar a TYA para crear el artista
-        artist_resp = requests.post(
+        artist_resp = await upstream.post(
             f"{servers.TYA}/artist/upload",
             json=body,
             timeout=15,
             headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
         )
         
-        if artist_resp.ok:
+        if artist_resp.is_success:
             artist_data = artist_resp.json()
             artist_id = artist_data.get('artistId')
+            # El directorio de artistas cacheado ya no está completo
+            refdata.artists_ref.expire()
             
             # Actualizar el usuario en SYU con el artistId
             try:
-                user_update_resp = requests.patch(
+                user_update_resp = await upstream.patch(
                     f"{servers.SYU}/user/{userdata.get('username')}",
                     json={"artistId": artist_id},
                     timeout=5,
                     headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
                 )
                 
-                if not user_update_resp.ok:
+                invalidate_user_data(token)
+                if not user_update_resp.is_success:
                     print(f"Advertencia: No se pudo actualizar el usuario con artistId. Status: {user_update_resp.status_code}")
                     # No fallar la operación, el artista ya fue creado
-            except requests.RequestException as e:
+            except UpstreamError as e:
                 print(f"Advertencia: Error al actualizar usuario con artistId: {e}")
                 # No fallar la operación, el artista ya fue creado
             
@@ -3977,13 +3225,43 @@ async def create_artist(request: Request):
         return JSONResponse(content={"error": "Error al crear el perfil de artista"}, status_code=500)
 
 
+# Plazo para cargar el catálogo, métricas y favoritos de las páginas de artista
+ARTIST_PAGE_DEADLINE = float(os.getenv("ARTIST_PAGE_DEADLINE", 5))
+ARTIST_OWNED_KINDS = {"song": "owner_songs", "album": "owner_albums", "merch": "owner_merch"}
+
+
+async def load_artist_owned(artist_data: dict, loader: EntityLoader) -> dict:
+    """Canciones, álbumes y merchandising del artista ({tipo: lista}), con una llamada /list por tipo en paralelo"""
+    results = await asyncio.gather(*(
+        loader.load_list(kind, artist_data.get(field) or []) for kind, field in ARTIST_OWNED_KINDS.items()
+    ))
+    return dict(zip(ARTIST_OWNED_KINDS, results))
+
+
+def normalize_artist_owned(owned: dict, parse_prices: bool = True):
+    """
+    Normaliza en una sola pasada los productos del artista: duración mm:ss de las canciones
+    y, si 'parse_prices', precios a float ("10,00" -> 10.0)
+    """
+    for kind, items in owned.items():
+        for item in items:
+            if kind == "song":
+                try:
+                    dur = int(item.get('duration', 0))
+                    item['duration_formatted'] = f"{dur // 60}:{dur % 60:02d}"
+                except (ValueError, TypeError):
+                    item['duration_formatted'] = item.get('duration', '0')
+            if parse_prices and item.get('price'):
+                item['price'] = catalog.parse_price(item['price'], catalog.DEFAULT_PRICES[kind])
+
+
 @app.get("/artist/studio")
-def get_artist_studio_page(request: Request):
+async def get_artist_studio_page(request: Request):
     """
     Ruta para mostrar la página de estudio del artista con sus canciones, álbumes y merchandising
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -3996,7 +3274,7 @@ def get_artist_studio_page(request: Request):
         artist_id = userdata.get('artistId')
         
         # Obtener datos del artista
-        artist_resp = requests.get(
+        artist_resp = await upstream.get(
             f"{servers.TYA}/artist/{artist_id}",
             timeout=5,
             headers={"Accept": "application/json"}
@@ -4004,83 +3282,35 @@ def get_artist_studio_page(request: Request):
         artist_resp.raise_for_status()
         artist_data = artist_resp.json()
         
-        # Obtener canciones del artista (solo owner)
-        try:
-            song_ids = artist_data.get('owner_songs', [])
-            if song_ids:
-                song_data = requests.get(
-                    f"{servers.TYA}/song/list?ids={','.join(map(str, song_ids))}",
-                    timeout=5,
-                    headers={"Accept": "application/json"}
-                )
-                song_data.raise_for_status()
-                songs_list = song_data.json()
-                # Formatear duración de cada canción a mm:ss para la vista del studio
-                for s in songs_list:
-                    try:
-                        dur = int(s.get('duration', 0))
-                        minutes = dur // 60
-                        seconds = dur % 60
-                        s['duration_formatted'] = f"{minutes}:{seconds:02d}"
-                    except Exception:
-                        s['duration_formatted'] = s.get('duration', '0')
-
-                artist_data['songs'] = songs_list
-            else:
-                artist_data['songs'] = []
-        except requests.RequestException:
-            artist_data['songs'] = []
-        
-        # Obtener álbumes del artista (solo owner)
-        try:
-            album_ids = artist_data.get('owner_albums', [])
-            if album_ids:
-                albums_data = requests.get(
-                    f"{servers.TYA}/album/list?ids={','.join(map(str, album_ids))}",
-                    timeout=5,
-                    headers={"Accept": "application/json"}
-                )
-                albums_data.raise_for_status()
-                artist_data['albums'] = albums_data.json()
-            else:
-                artist_data['albums'] = []
-        except requests.RequestException:
-            artist_data['albums'] = []
-        
-        # Obtener merchandising del artista (solo owner)
-        try:
-            merch_ids = artist_data.get('owner_merch', [])
-            if merch_ids:
-                merch_data = requests.get(
-                    f"{servers.TYA}/merch/list?ids={','.join(map(str, merch_ids))}",
-                    timeout=5,
-                    headers={"Accept": "application/json"}
-                )
-                merch_data.raise_for_status()
-                artist_data['merch'] = merch_data.json()
-            else:
-                artist_data['merch'] = []
-        except requests.RequestException:
-            artist_data['merch'] = []
+        # Canciones, álbumes y merchandising del artista (solo owner) en un único lote
+        owned = (await gather_with_deadline(
+            {"owned": load_artist_owned(artist_data, EntityLoader(timeout=5))},
+            ARTIST_PAGE_DEADLINE,
+            fallbacks={"owned": {"song": [], "album": [], "merch": []}}
+        ))["owned"]
+        normalize_artist_owned(owned, parse_prices=False)
+        artist_data['songs'] = owned["song"]
+        artist_data['albums'] = owned["album"]
+        artist_data['merch'] = owned["merch"]
         
         return osv.get_artist_studio_view(request, artist_data, userdata, servers.SYU, servers.TYA)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo datos del estudio del artista: {e}")
         return osv.get_error_view(request, userdata, "No se pudo cargar el estudio del artista", str(e))
 
 # ===================== ARTIST PROFILE ROUTES =====================
 @app.get("/artist/{artistId}")
-def get_artist_profile(request: Request, artistId: int):
+async def get_artist_profile(request: Request, artistId: int):
     """
     Ruta para mostrar el perfil de un artista
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     try:
         # Obtener información del artista
-        artist_resp = requests.get(
+        artist_resp = await upstream.get(
             f"{servers.TYA}/artist/{artistId}",
             timeout=15,
             headers={"Accept": "application/json"}
@@ -4090,132 +3320,66 @@ def get_artist_profile(request: Request, artistId: int):
         
         # Determinar si es el propio perfil
         is_own_profile = userdata and userdata.get('artistId') == artistId
-        
-        # Obtener canciones del artista si tiene
-        if artist_data.get('owner_songs'):
-            try:
-                song_ids = ','.join(str(sid) for sid in artist_data['owner_songs'])
-                songs_resp = requests.get(
-                    f"{servers.TYA}/song/list?ids={song_ids}",
-                    timeout=15,
-                    headers={"Accept": "application/json"}
-                )
-                if songs_resp.ok:
-                    songs_list = songs_resp.json()
-                    # Normalizar precios de canciones
-                    for song in songs_list:
-                        if song.get('price'):
-                            try:
-                                if isinstance(song['price'], str):
-                                    song['price'] = float(song['price'].replace(',', '.'))
-                                else:
-                                    song['price'] = float(song['price'])
-                            except (ValueError, TypeError):
-                                song['price'] = 0.99
-                    artist_data['owner_songs'] = songs_list
-            except requests.RequestException as e:
-                print(f"Error obteniendo canciones del artista: {e}")
-                artist_data['owner_songs'] = []
-        
-        # Obtener álbumes del artista si tiene
-        if artist_data.get('owner_albums'):
-            try:
-                album_ids = ','.join(str(aid) for aid in artist_data['owner_albums'])
-                albums_resp = requests.get(
-                    f"{servers.TYA}/album/list?ids={album_ids}",
-                    timeout=15,
-                    headers={"Accept": "application/json"}
-                )
-                if albums_resp.ok:
-                    albums_list = albums_resp.json()
-                    # Normalizar precios de álbumes
-                    for album in albums_list:
-                        if album.get('price'):
-                            try:
-                                if isinstance(album['price'], str):
-                                    album['price'] = float(album['price'].replace(',', '.'))
-                                else:
-                                    album['price'] = float(album['price'])
-                            except (ValueError, TypeError):
-                                album['price'] = 9.99
-                    artist_data['owner_albums'] = albums_list
-            except requests.RequestException as e:
-                print(f"Error obteniendo álbumes del artista: {e}")
-                artist_data['owner_albums'] = []
-        
-        # Obtener merchandising del artista si tiene
-        if artist_data.get('owner_merch'):
-            try:
-                merch_ids = ','.join(str(mid) for mid in artist_data['owner_merch'])
-                merch_resp = requests.get(
-                    f"{servers.TYA}/merch/list?ids={merch_ids}",
-                    timeout=15,
-                    headers={"Accept": "application/json"}
-                )
-                if merch_resp.ok:
-                    merch_list = merch_resp.json()
-                    # Normalizar precios de merchandising
-                    for item in merch_list:
-                        if item.get('price'):
-                            try:
-                                if isinstance(item['price'], str):
-                                    item['price'] = float(item['price'].replace(',', '.'))
-                                else:
-                                    item['price'] = float(item['price'])
-                            except (ValueError, TypeError):
-                                item['price'] = 19.99
-                    artist_data['owner_merch'] = merch_list
-            except requests.RequestException as e:
-                print(f"Error obteniendo merchandising del artista: {e}")
-                artist_data['owner_merch'] = []
-
-        metrics = None
-        try:
-            metrics_resp = requests.get(f"{servers.RYE}/statistics/metrics/artist/{artistId}", timeout=5)
+
+        async def load_metrics():
+            metrics_resp = await upstream.get(f"{servers.RYE}/statistics/metrics/artist/{artistId}", timeout=5)
             metrics_resp.raise_for_status()
             metrics_data = metrics_resp.json()  # Expecting JSON like {"playbacks": 123, "songs": 5, "popularity": 12}
-            metrics = {
+            return {
                 "playbacks": metrics_data.get("playbacks", 0),
                 "songs": metrics_data.get("songs", 0),
                 "popularity": metrics_data.get("popularity", None)
             }
-        except requests.RequestException as e:
-            print(f"Error obteniendo métricas del artista: {e}")
-            metrics = {"playbacks": 0, "songs": 0, "popularity": None}
-        
+
+        async def load_is_favorite():
+            fav_resp = await upstream.get(
+                f"{servers.SYU}/favs/artists",
+                timeout=2,
+                headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
+            )
+            if not fav_resp.is_success:
+                return False
+            fav_data = fav_resp.json()
+            # El API devuelve una lista de IDs directamente o un objeto con 'ids'
+            if isinstance(fav_data, list):
+                favorite_artists = fav_data
+            elif isinstance(fav_data, dict):
+                favorite_artists = fav_data.get('ids', [])
+            else:
+                favorite_artists = []
+            return int(artistId) in [int(aid) for aid in favorite_artists]
+
+        # Catálogo del artista, métricas de RYE y favoritos de SYU en paralelo
+        sections = {
+            "owned": load_artist_owned(artist_data, EntityLoader(timeout=5)),
+            "metrics": load_metrics(),
+        }
         # Verificar si el artista está en favoritos del usuario
-        is_favorite = False
         if userdata and not is_own_profile:
-            try:
-                fav_resp = requests.get(
-                    f"{servers.SYU}/favs/artists",
-                    timeout=2,
-                    headers={"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
-                )
-                if fav_resp.ok:
-                    fav_data = fav_resp.json()
-                    # El API devuelve una lista de IDs directamente o un objeto con 'ids'
-                    if isinstance(fav_data, list):
-                        favorite_artists = fav_data
-                    elif isinstance(fav_data, dict):
-                        favorite_artists = fav_data.get('ids', [])
-                    else:
-                        favorite_artists = []
-                    is_favorite = int(artistId) in [int(aid) for aid in favorite_artists]
-            except requests.RequestException as e:
-                print(f"Error verificando favoritos: {e}")
+            sections["is_favorite"] = load_is_favorite()
+        sections = await gather_with_deadline(sections, ARTIST_PAGE_DEADLINE, fallbacks={
+            "owned": {"song": [], "album": [], "merch": []},
+            "metrics": {"playbacks": 0, "songs": 0, "popularity": None},
+        })
+        owned = sections["owned"]
+        normalize_artist_owned(owned)
+        artist_data['owner_songs'] = owned["song"]
+        artist_data['owner_albums'] = owned["album"]
+        artist_data['owner_merch'] = owned["merch"]
+        metrics = sections["metrics"]
+        is_favorite = bool(sections.get("is_favorite"))
         
         artist_data['is_favorite'] = is_favorite
         
         return osv.get_artist_profile_view(request, artist_data, userdata, is_own_profile, servers.SYU, metrics, servers.TYA, servers.RYE, servers.PT)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo perfil del artista: {e}")
         return osv.get_error_view(request, userdata, "No se pudo cargar el perfil del artista", str(e))
 
 
 @app.get("/artist-edit")
-def get_artist_edit_page(request: Request):
+async def get_artist_edit_page(request: Request):
     """
     Ruta para mostrar la página de edición de perfil de artista (usuario actual)
     """
@@ -4223,7 +3387,7 @@ def get_artist_edit_page(request: Request):
         token = request.cookies.get("oversound_auth")
         print(f"DEBUG: Token from cookie: {token[:20] if token else 'None'}...")
         
-        userdata = obtain_user_data(token)
+        userdata = await obtain_user_data(token)
         print(f"DEBUG: Userdata obtained: {userdata is not None}")
         
         if not userdata:
@@ -4252,7 +3416,7 @@ def get_artist_edit_page(request: Request):
             print(f"DEBUG: Fetching artist data for artistId: {artist_id}")
             
             # Obtener datos actuales del artista
-            artist_resp = requests.get(
+            artist_resp = await upstream.get(
                 f"{servers.TYA}/artist/{artist_id}",
                 timeout=5,
                 headers={"Accept": "application/json"}
@@ -4266,7 +3430,7 @@ def get_artist_edit_page(request: Request):
                 print(f"DEBUG: TYA returned status {artist_resp.status_code}, using fallback data")
                 artist_data = fallback_artist_data
                 
-        except requests.RequestException as e:
+        except UpstreamError as e:
             print(f"DEBUG: Error obteniendo datos del artista: {e}")
             print("DEBUG: Using fallback artist data for editing")
             artist_data = fallback_artist_data
@@ -4283,12 +3447,12 @@ def get_artist_edit_page(request: Request):
 
 
 @app.get("/artist/{artistId}/edit")
-def get_specific_artist_edit_page(request: Request, artistId: int):
+async def get_specific_artist_edit_page(request: Request, artistId: int):
     """
     Ruta para mostrar la página de edición de perfil de un artista específico
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return RedirectResponse("/login")
@@ -4299,7 +3463,7 @@ def get_specific_artist_edit_page(request: Request, artistId: int):
     
     try:
         # Obtener datos actuales del artista
-        artist_resp = requests.get(
+        artist_resp = await upstream.get(
             f"{servers.TYA}/artist/{artistId}",
             timeout=5,
             headers={"Accept": "application/json"}
@@ -4309,7 +3473,7 @@ def get_specific_artist_edit_page(request: Request, artistId: int):
         
         return osv.get_artist_profile_edit_view(request, userdata, artist_data, servers.TYA)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo datos del artista: {e}")
         return osv.get_error_view(request, userdata, "No se pudo cargar los datos del artista", str(e))
 
@@ -4322,7 +3486,7 @@ async def update_artist_profile(request: Request):
     token = request.cookies.get("oversound_auth")
     print(f"DEBUG PATCH: Token from cookie: {token[:20] if token else 'None'}...")
     
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     print(f"DEBUG PATCH: Userdata obtained: {userdata is not None}")
     
     if not userdata:
@@ -4368,7 +3532,7 @@ async def update_artist_profile(request: Request):
         tya_url = f"{servers.TYA}/artist/{artist_id}"
         print(f"DEBUG PATCH: Making PATCH request to: {tya_url}")
         
-        resp = requests.patch(
+        resp = await upstream.patch(
             tya_url,
             json=update_data,
             timeout=5,
@@ -4377,6 +3541,7 @@ async def update_artist_profile(request: Request):
         print(f"DEBUG PATCH: TYA response status: {resp.status_code}")
         
         resp.raise_for_status()
+        refdata.artists_ref.expire()
 
         # Intentar parsear JSON solo si hay contenido; manejar body vacío
         result = None
@@ -4397,7 +3562,7 @@ async def update_artist_profile(request: Request):
             "artistId": artist_id
         }, status_code=200)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"DEBUG PATCH: RequestException: {e}")
         error_msg = str(e)
         try:
@@ -4420,7 +3585,7 @@ async def update_specific_artist_profile(request: Request, artistId: int):
     Ruta para actualizar el perfil de un artista específico
     """
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     
     if not userdata:
         return JSONResponse(content={"error": "No autenticado"}, status_code=401)
@@ -4454,7 +3619,7 @@ async def update_specific_artist_profile(request: Request, artistId: int):
             files = None
         
         # Hacer PATCH al microservicio TYA
-        resp = requests.patch(
+        resp = await upstream.patch(
             f"{servers.TYA}/artist/{artistId}",
             data=update_data,
             files=files,
@@ -4462,13 +3627,14 @@ async def update_specific_artist_profile(request: Request, artistId: int):
             headers={"Cookie": f"oversound_auth={token}"}
         )
         resp.raise_for_status()
+        refdata.artists_ref.expire()
         
         return JSONResponse(content={
             "message": "Perfil de artista actualizado correctamente",
             "artistId": artistId
         }, status_code=200)
         
-    except requests.RequestException as e:
+    except UpstreamError as e:
         error_msg = str(e)
         try:
             error_msg = e.response.json().get('message', str(e))
@@ -4482,46 +3648,31 @@ async def update_specific_artist_profile(request: Request, artistId: int):
 async def get_track(request: Request, trackId: int):
     """
     Ruta proxy para obtener el audio de una canción desde el Proveedor de Tracks (PT)
-    Obtiene el track en base64 desde PT y lo devuelve como audio
+    La primera vez lee el track en base64 desde PT en streaming y lo decodifica por trozos
+    a la caché local en disco; se sirve admitiendo peticiones Range (206) y validación
+    con ETag/Last-Modified
     """
     token = request.cookies.get("oversound_auth")
+    # PT solo entrega tracks con sesión: sin ella tampoco se sirven desde la caché
+    if not await obtain_user_data(token):
+        return JSONResponse(content={"error": "No autenticado"}, status_code=401)
     
     try:
-        # Obtener el track desde el microservicio PT
-        track_resp = requests.get(
-            f"{servers.PT}/track/{trackId}",
-            timeout=10,
-            headers={
-                "Accept": "application/json",
-                "Cookie": f"oversound_auth={token}"
-            }
-        )
-        track_resp.raise_for_status()
-        
-        # La respuesta contiene {"idtrack": int, "track": "base64string"}
-        track_data = track_resp.json()
-        
-        if not track_data.get('track'):
-            return JSONResponse(content={"error": "Track no encontrado"}, status_code=404)
-        
-        # Decodificar el base64
-        import base64
-        audio_bytes = base64.b64decode(track_data['track'])
+        # Los tracks ya reproducidos se sirven desde la caché local sin volver a PT
+        # (solo a tokens que PT ya ha autorizado)
+        track = await tracks.track_cache.get(trackId, token)
         
-        # Devolver el audio como respuesta binaria
-        # El tipo de contenido se determina por las primeras cabeceras del archivo
-        # Por defecto usamos audio/mpeg (MP3)
-        return Response(
-            content=audio_bytes,
-            media_type="audio/mpeg",
-            headers={
-                "Content-Disposition": f"inline; filename=track_{trackId}.mp3",
-                "Accept-Ranges": "bytes",
-                "Cache-Control": "public, max-age=3600"
-            }
+    except tracks.TrackNotFound:
+        return JSONResponse(content={"error": "Track no encontrado"}, status_code=404)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code in (401, 403):
+            return JSONResponse(content={"error": "No autorizado para reproducir este track"}, status_code=e.response.status_code)
+        print(f"Error obteniendo track desde PT: {e}")
+        return JSONResponse(
+            content={"error": f"No se pudo obtener el track: {str(e)}"},
+            status_code=500
         )
-        
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error obteniendo track desde PT: {e}")
         return JSONResponse(
             content={"error": f"No se pudo obtener el track: {str(e)}"},
@@ -4534,6 +3685,9 @@ async def get_track(request: Request, trackId: int):
             status_code=500
         )
 
+    # El tipo de contenido se determina por las primeras cabeceras del archivo
+    return tracks.track_response(track, request.headers, f"track_{trackId}")
+
 
 @app.post('/stats/history/songs')
 async def proxy_stats_songs(request: Request):
@@ -4549,10 +3703,10 @@ async def proxy_stats_songs(request: Request):
         if token:
             headers["Cookie"] = f"oversound_auth={token}"
 
-        resp = requests.post(f"{servers.RYE}/history/songs", json=body, timeout=5, headers=headers)
+        resp = await upstream.post(f"{servers.RYE}/history/songs", json=body, timeout=5, headers=headers)
         resp.raise_for_status()
         return JSONResponse(content=resp.json(), status_code=resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error proxying song stats to RYE: {e}")
         # intentar devolver el body de respuesta si existe
         try:
@@ -4577,10 +3731,10 @@ async def proxy_stats_artists(request: Request):
         if token:
             headers["Cookie"] = f"oversound_auth={token}"
 
-        resp = requests.post(f"{servers.RYE}/history/artists", json=body, timeout=5, headers=headers)
+        resp = await upstream.post(f"{servers.RYE}/history/artists", json=body, timeout=5, headers=headers)
         resp.raise_for_status()
         return JSONResponse(content=resp.json(), status_code=resp.status_code)
-    except requests.RequestException as e:
+    except UpstreamError as e:
         print(f"Error proxying artist stats to RYE: {e}")
         try:
             if 'resp' in locals() and resp is not None:
@@ -4595,17 +3749,17 @@ async def proxy_stats_artists(request: Request):
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_error_view(request, userdata, "Te has columpiado con la URL", str(exc))
 
 @app.exception_handler(500)
-def internal_server_error_handler(request: Request, exc: Exception):
+async def internal_server_error_handler(request: Request, exc: Exception):
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_error_view(request, userdata, "Algo ha salido mal", str(exc))
 
 @app.exception_handler(422)
-def unproc_content_error_handler(request: Request, exce: Exception):
+async def unproc_content_error_handler(request: Request, exce: Exception):
     token = request.cookies.get("oversound_auth")
-    userdata = obtain_user_data(token)
+    userdata = await obtain_user_data(token)
     return osv.get_error_view(request, userdata, "Te has columpiado", str(exce))
\ No newline at end of file
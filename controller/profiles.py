@@ -0,0 +1,134 @@
+"""
+Carga de los datos del perfil de usuario: favoritos y biblioteca (compras).
+
+Las fuentes independientes (favoritos de SYU, compras de TPP) se piden en paralelo y las
+entidades de TYA se resuelven por lotes con un EntityLoader compartido, de modo que las
+llamadas /list de favoritos y de biblioteca hechas en el mismo ciclo van juntas.
+La biblioteca se construye con conjuntos en lugar de recorrer listas para cada elemento.
+
+La biblioteca ya resuelta de cada usuario se guarda en library_cache y solo se reconstruye
+cuando caduca o cuando el usuario completa una compra (invalidate_library). Los valores
+de la caché son compartidos entre peticiones: no deben modificarse.
+"""
+import asyncio
+import os
+import controller.msvc_servers as servers
+from controller.upstream import upstream
+from controller.batching import EntityLoader, to_int_id
+from controller.images import normalize_image_url, GRID_IMAGE_WIDTH
+from controller.cache import TTLCache
+
+# Plazo total para construir la página de perfil
+PROFILE_DEADLINE = float(os.getenv("PROFILE_DEADLINE", 4))
+FAV_KINDS = {"songs": "song", "albums": "album", "artists": "artist"}
+EMPTY_FAVORITES = {"songs": [], "albums": [], "artists": []}
+EMPTY_LIBRARY = {"songs": [], "albums": []}
+# Bibliotecas materializadas por usuario (userId -> {"songs", "albums"})
+LIBRARY_CACHE_TTL = float(os.getenv("LIBRARY_CACHE_TTL", 600))
+LIBRARY_CACHE_SIZE = int(os.getenv("LIBRARY_CACHE_SIZE", 1024))
+
+library_cache = TTLCache(maxsize=LIBRARY_CACHE_SIZE, ttl=LIBRARY_CACHE_TTL)
+
+
+def _auth_headers(token: str) -> dict:
+    return {"Accept": "application/json", "Cookie": f"oversound_auth={token}"}
+
+
+async def _fav_ids(kind: str, token: str) -> list:
+    """IDs de favoritos del usuario en SYU ([] si SYU no responde con éxito)"""
+    resp = await upstream.get(f"{servers.SYU}/favs/{kind}", timeout=2, headers=_auth_headers(token))
+    if not resp.is_success:
+        return []
+    return resp.json() or []
+
+
+def _with_artist(entity: dict, artists: dict) -> dict:
+    """Copia de la entidad con su artista resuelto y la portada normalizada"""
+    entity = dict(entity)
+    entity['artist'] = artists.get(to_int_id(entity.get('artistId'))) or {"artistId": entity.get('artistId'), "artisticName": "Artista Desconocido"}
+    if entity.get('cover'):
+        entity['cover'] = normalize_image_url(entity['cover'], servers.TYA, GRID_IMAGE_WIDTH)
+    return entity
+
+
+async def load_favorites(token: str, loader: EntityLoader) -> dict:
+    """
+    Canciones, álbumes y artistas favoritos del usuario.
+    Los tres /favs de SYU van en paralelo, las tres listas de TYA en un mismo lote y los
+    artistas de canciones y álbumes en otro (los artistas favoritos ya están memorizados).
+    """
+    fav_ids = await asyncio.gather(*(_fav_ids(kind, token) for kind in FAV_KINDS), return_exceptions=True)
+    fav_ids = {kind: ids if isinstance(ids, list) else [] for kind, ids in zip(FAV_KINDS, fav_ids)}
+    songs, albums, artists = await asyncio.gather(*(
+        loader.load_list(entity_kind, fav_ids[kind]) for kind, entity_kind in FAV_KINDS.items()
+    ))
+    owners = await loader.load_many("artist", [item.get('artistId') for item in songs + albums])
+
+    favorite_artists = []
+    for artist in artists:
+        artist = dict(artist)
+        if artist.get('artisticImage'):
+            artist['artisticImage'] = normalize_image_url(artist['artisticImage'], servers.TYA, GRID_IMAGE_WIDTH)
+        favorite_artists.append(artist)
+    return {
+        "songs": [_with_artist(song, owners) for song in songs],
+        "albums": [_with_artist(album, owners) for album in albums],
+        "artists": favorite_artists,
+    }
+
+
+def materialize_library(purchases: list, albums: dict) -> tuple:
+    """
+    Calcula los IDs de la biblioteca a partir de las compras de TPP.
+    'albums' es {albumId: álbum o None} con los álbumes comprados.
+    Devuelve (album_ids, song_ids): los álbumes comprados y las canciones compradas sueltas
+    que no están ya incluidas en alguno de ellos, sin duplicados y en orden de compra.
+    """
+    album_ids = list(dict.fromkeys(
+        album_id for purchase in purchases for album_id in map(to_int_id, purchase.get('albumIds') or []) if album_id is not None
+    ))
+    included_songs = set()
+    for album_id in album_ids:
+        album = albums.get(album_id)
+        if album:
+            # TYA devuelve las canciones de un álbum en 'songs' ('songIds' en versiones antiguas)
+            included_songs.update(map(to_int_id, album.get('songs') or album.get('songIds') or []))
+    song_ids = list(dict.fromkeys(
+        song_id for purchase in purchases for song_id in map(to_int_id, purchase.get('songIds') or [])
+        if song_id is not None and song_id not in included_songs
+    ))
+    return album_ids, song_ids
+
+
+async def load_library(token: str, loader: EntityLoader) -> dict:
+    """Canciones y álbumes comprados por el usuario (TPP /purchase), resueltos por lotes en TYA"""
+    resp = await upstream.get(f"{servers.TPP}/purchase", timeout=2, headers=_auth_headers(token))
+    resp.raise_for_status()
+    purchases = resp.json() or []
+
+    purchased_albums = {
+        album_id for purchase in purchases for album_id in map(to_int_id, purchase.get('albumIds') or []) if album_id is not None
+    }
+    # strict: una biblioteca a medias por un fallo de TYA no debe quedarse en library_cache
+    albums = await loader.load_many("album", purchased_albums, strict=True)
+    album_ids, song_ids = materialize_library(purchases, albums)
+    songs = await loader.load_list("song", song_ids, strict=True)
+    return {
+        "songs": songs,
+        "albums": [albums[album_id] for album_id in album_ids if albums.get(album_id)],
+    }
+
+
+async def get_library(user_id, token: str, loader: EntityLoader) -> dict:
+    """
+    Biblioteca del usuario desde library_cache, materializándola con load_library si no está.
+    Sin userId no hay clave con la que cachearla: se carga directamente.
+    """
+    if user_id is None:
+        return await load_library(token, loader)
+    return await library_cache.get_or_load(user_id, lambda: load_library(token, loader))
+
+
+def invalidate_library(user_id):
+    """Descarta la biblioteca materializada del usuario (tras una compra)"""
+    library_cache.invalidate(user_id)
@@ -0,0 +1,177 @@
+"""
+Datos de referencia de TYA compartidos por todo el proceso: géneros y directorio de artistas.
+
+Se guardan en memoria con semántica stale-while-revalidate: las peticiones siempre
+reciben el último valor disponible y, si ha caducado, se refresca en segundo plano.
+Además, mientras la aplicación está arrancada, una tarea los refresca periódicamente.
+Los mapas derivados (genres_map, artists_map) se construyen una vez por refresco.
+
+Los valores devueltos son compartidos entre peticiones: no deben modificarse.
+"""
+import asyncio
+import os
+import time
+import controller.msvc_servers as servers
+from controller.upstream import upstream, UpstreamError
+from controller.batching import EntityLoader
+
+GENRES_TTL = float(os.getenv("GENRES_TTL", 300))
+ARTISTS_TTL = float(os.getenv("ARTISTS_TTL", 60))
+
+
+class StaleWhileRevalidate():
+
+    def __init__(self, name: str, loader, ttl: float):
+        self.name = name
+        self._loader = loader
+        self.ttl = ttl
+        self._value = None
+        self._loaded_at = None
+        self._refreshing = None
+        self._periodic = None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    async def refresh(self):
+        """Recarga el valor (agrupando refrescos concurrentes). Si falla, se conserva el anterior."""
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        return await asyncio.shield(self._refreshing)
+
+    async def _refresh(self):
+        try:
+            self._value = await self._loader()
+            self._loaded_at = time.monotonic()
+            return self._value
+        finally:
+            self._refreshing = None
+
+    async def get(self):
+        """
+        Devuelve el valor cacheado. Si ha caducado se devuelve igualmente y se refresca en
+        segundo plano; solo se espera a TYA si todavía no hay ningún valor (UpstreamError si falla).
+        """
+        if self._value is None:
+            # Si el refresco en curso era uno en segundo plano (peek) y falló, devuelve None:
+            # se lanza otro para que el error llegue al llamante (acotado por si vuelve a pasar)
+            for _ in range(3):
+                value = await self.refresh()
+                if value is not None:
+                    return value
+            raise ValueError(f"No se pudo cargar '{self.name}'")
+        if self.is_stale and self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._background_refresh())
+        return self._value
+
+    def peek(self):
+        """
+        Como get() pero sin esperar nunca: devuelve el valor cacheado (None si aún no hay
+        ninguno) y, si falta o ha caducado, lanza el refresco en segundo plano.
+        """
+        if self.is_stale and self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._background_refresh())
+        return self._value
+
+    async def _background_refresh(self):
+        """Refresca sin lanzar errores: devuelve el valor cargado o None si falla"""
+        try:
+            return await self._refresh()
+        except UpstreamError as e:
+            print(f"Error refrescando '{self.name}' desde TYA, se mantiene el valor anterior: {e}")
+        except Exception as e:
+            print(f"Error inesperado refrescando '{self.name}', se mantiene el valor anterior: {e}")
+        return None
+
+    def expire(self):
+        """Marca el valor como caducado: la siguiente petición lanza el refresco"""
+        self._loaded_at = None
+
+    def start(self):
+        if self._periodic is None:
+            self._periodic = asyncio.ensure_future(self._refresh_periodically())
+
+    async def stop(self):
+        if self._periodic is not None:
+            self._periodic.cancel()
+            try:
+                await self._periodic
+            except asyncio.CancelledError:
+                pass
+            self._periodic = None
+
+    async def _refresh_periodically(self):
+        while True:
+            if self.is_stale and self._refreshing is None:
+                # Registrado en _refreshing para que get()/peek() se unan en vez de duplicarlo
+                self._refreshing = asyncio.ensure_future(self._background_refresh())
+            if self._refreshing is not None:
+                try:
+                    await asyncio.shield(self._refreshing)
+                except Exception:
+                    # Un refresco lanzado por get() que falla ya lo ha visto su llamante
+                    pass
+            await asyncio.sleep(self.ttl / 2)
+
+
+async def _load_genres() -> dict:
+    genres_resp = await upstream.get(f"{servers.TYA}/genres", timeout=5, headers={"Accept": "application/json"})
+    genres_resp.raise_for_status()
+    genres = genres_resp.json()
+    # genres_map con claves tanto int como string para compatibilidad
+    genres_map = {}
+    for g in genres:
+        if isinstance(g, dict) and g.get('id'):
+            genres_map[g.get('id')] = g.get('name')
+            genres_map[str(g.get('id'))] = g.get('name')
+    return {"genres": genres, "genres_map": genres_map}
+
+
+async def _load_artists() -> dict:
+    # Primero filter para obtener todos los IDs (ordenados por nombre) y luego list para los detalles
+    filter_resp = await upstream.get(
+        f"{servers.TYA}/artist/filter",
+        params={"order": "name", "direction": "asc"},
+        timeout=10,
+        headers={"Accept": "application/json"}
+    )
+    filter_resp.raise_for_status()
+    # strict: si falla algún lote /list se conserva el directorio anterior en vez de truncarlo
+    artists = await EntityLoader(timeout=10).load_list("artist", filter_resp.json() or [], strict=True)
+    artists_map = {a.get('artistId'): a.get('artisticName') for a in artists if a.get('artistId')}
+    return {"artists": artists, "artists_map": artists_map}
+
+
+genres_ref = StaleWhileRevalidate("genres", _load_genres, GENRES_TTL)
+artists_ref = StaleWhileRevalidate("artists", _load_artists, ARTISTS_TTL)
+
+
+async def _get_or_empty(ref: StaleWhileRevalidate, field: str, empty):
+    try:
+        return (await ref.get())[field]
+    except UpstreamError as e:
+        print(f"Error obteniendo '{ref.name}' desde TYA: {e}")
+        return empty
+
+
+async def get_genres() -> list:
+    return await _get_or_empty(genres_ref, "genres", [])
+
+async def get_genres_map() -> dict:
+    return await _get_or_empty(genres_ref, "genres_map", {})
+
+async def get_artists() -> list:
+    return await _get_or_empty(artists_ref, "artists", [])
+
+async def get_artists_map() -> dict:
+    return await _get_or_empty(artists_ref, "artists_map", {})
+
+
+def start():
+    genres_ref.start()
+    artists_ref.start()
+
+async def stop():
+    await genres_ref.stop()
+    await artists_ref.stop()
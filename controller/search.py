@@ -0,0 +1,300 @@
+"""
+Búsqueda federada sobre TYA (canciones, álbumes, artistas y merchandising).
+
+Una consulta lanza las cuatro búsquedas de TYA a la vez y resuelve los resultados con un
+único EntityLoader: las cuatro llamadas /{tipo}/list salen en el mismo lote y los nombres
+de los artistas de canciones, álbumes y merchandising se resuelven con una sola llamada
+/artist/list (reutilizando los artistas que ya devolvió la propia búsqueda).
+
+Para no ir a TYA en cada pulsación, las consultas se responden primero desde un índice
+local de trigramas sobre los títulos y nombres artísticos, construido a partir de la
+instantánea del catálogo (catalog) y del directorio de artistas (refdata) y actualizado
+incrementalmente cuando estos se refrescan. Solo se consulta a TYA si el índice aún no
+está disponible o no conoce el término buscado (p. ej. un producto recién subido).
+
+Las respuestas de TYA se guardan poco tiempo en una caché acotada. Mientras se escribe
+("daf", "daft", "daft p"...), si el resultado de un prefijo más corto está en caché,
+es completo y es pequeño, la consulta más larga se resuelve filtrándolo localmente.
+"""
+import os
+import unicodedata
+import controller.msvc_servers as servers
+from controller.upstream import upstream, UpstreamError
+from controller.batching import EntityLoader, ENTITY_KEYS, to_int_id
+from controller.fanout import gather_with_deadline
+from controller.cache import TTLCache
+from controller.images import externalize_inline_image
+import controller.catalog as catalog
+import controller.refdata as refdata
+
+# Plazo total de una búsqueda federada: los tipos que no respondan a tiempo salen vacíos
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", 5))
+# Resultados por tipo que devuelve /api/search por defecto y máximo que puede pedir el cliente
+SEARCH_LIMIT = 5
+SEARCH_MAX_LIMIT = 20
+# Caché de resultados de TYA por (tipo, consulta normalizada)
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", 30))
+SEARCH_CACHE_SIZE = 512
+# Máximo de resultados de un prefijo para resolver las consultas más largas filtrándolo
+SEARCH_REFINE_MAX = 50
+
+SEARCH_KINDS = ("song", "album", "artist", "merch")
+# Nombre de cada grupo en la respuesta de /api/search
+SEARCH_GROUPS = {"song": "songs", "album": "albums", "artist": "artists", "merch": "merch"}
+# Campo con el texto que se compara con la consulta y campo con la imagen de cada tipo
+TITLE_FIELDS = {"song": "title", "album": "title", "artist": "artisticName", "merch": "title"}
+IMAGE_FIELDS = {"song": "cover", "album": "cover", "artist": "artisticImage", "merch": "cover"}
+
+
+def externalize_covers(items: list, field: str) -> list:
+    """Sustituye las imágenes en línea (data:image) de los resultados por URLs /covers/{hash}"""
+    for item in items:
+        if isinstance(item, dict) and item.get(field):
+            item[field] = externalize_inline_image(item[field])
+    return items
+
+
+def normalize_text(text) -> str:
+    """Texto comparable: sin tildes, en minúsculas y con los espacios colapsados"""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex():
+    """
+    Índice invertido de trigramas por tipo de entidad: {trigrama: set(ids)}.
+    Una consulta se resuelve intersecando los trigramas de la consulta y comprobando
+    después que el texto contiene la consulta completa.
+    Las entidades indexadas son compartidas (vienen del catálogo): no deben modificarse.
+    """
+
+    def __init__(self):
+        self._entities = {kind: {} for kind in SEARCH_KINDS}  # id -> entidad
+        self._texts = {kind: {} for kind in SEARCH_KINDS}  # id -> texto normalizado
+        self._postings = {kind: {} for kind in SEARCH_KINDS}  # trigrama -> set(ids)
+        self._sources = {kind: None for kind in SEARCH_KINDS}  # origen de la última sincronización
+
+    def is_synced(self, kind: str, source) -> bool:
+        return self._sources[kind] is source
+
+    def sync(self, kind: str, entities: dict, source=None):
+        """
+        Pone al día el índice de un tipo con sus entidades actuales ({id: entidad}).
+        Solo se reindexan las entidades nuevas, borradas o cuyo texto ha cambiado.
+        """
+        field = TITLE_FIELDS[kind]
+        texts = self._texts[kind]
+        for entity_id in [i for i in texts if i not in entities]:
+            self._remove(kind, entity_id)
+            del self._entities[kind][entity_id]
+        for entity_id, entity in entities.items():
+            text = normalize_text(entity.get(field))
+            if texts.get(entity_id) != text:
+                self._remove(kind, entity_id)
+                self._add(kind, entity_id, text)
+            self._entities[kind][entity_id] = entity
+        self._sources[kind] = entities if source is None else source
+
+    def _add(self, kind: str, entity_id: int, text: str):
+        self._texts[kind][entity_id] = text
+        for gram in trigrams(text):
+            self._postings[kind].setdefault(gram, set()).add(entity_id)
+
+    def _remove(self, kind: str, entity_id: int):
+        text = self._texts[kind].pop(entity_id, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            ids = self._postings[kind].get(gram)
+            if ids is not None:
+                ids.discard(entity_id)
+                if not ids:
+                    del self._postings[kind][gram]
+
+    def get(self, kind: str, entity_id):
+        return self._entities[kind].get(to_int_id(entity_id))
+
+    def lookup(self, kind: str, query: str):
+        """
+        Entidades cuyo texto contiene la consulta, o None si el índice de ese tipo aún
+        no está construido o la consulta es demasiado corta para buscar por trigramas.
+        """
+        if self._sources[kind] is None:
+            return None
+        query = normalize_text(query)
+        grams = trigrams(query)
+        if not grams:
+            return None
+        postings = self._postings[kind]
+        candidates = None
+        # Empezar por el trigrama menos frecuente para que la intersección sea pequeña
+        for gram in sorted(grams, key=lambda g: len(postings.get(g, ()))):
+            ids = postings.get(gram)
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return []
+        texts = self._texts[kind]
+        found = sorted((i for i in candidates if query in texts[i]), key=lambda i: (texts[i], i))
+        return [self._entities[kind][i] for i in found]
+
+
+search_index = SearchIndex()
+
+# (tipo, consulta normalizada) -> (entidades, completo). Las entidades son compartidas.
+upstream_results = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
+
+def refresh_index():
+    """
+    Sincroniza el índice con la instantánea del catálogo y el directorio de artistas
+    vigentes, sin esperar a TYA (si aún no hay instantánea, el tipo sigue sin índice).
+    """
+    snapshot = catalog.catalog_ref.peek()
+    if snapshot is not None:
+        for kind in catalog.PRODUCT_KINDS:
+            if not search_index.is_synced(kind, snapshot.products[kind]):
+                search_index.sync(kind, snapshot.products[kind])
+                # El catálogo ha cambiado: las respuestas de TYA guardadas pueden estar desfasadas
+                upstream_results.clear()
+    directory = refdata.artists_ref.peek()
+    if directory is not None and not search_index.is_synced("artist", directory["artists"]):
+        artists = {to_int_id(a.get('artistId')): a for a in directory["artists"] if to_int_id(a.get('artistId')) is not None}
+        search_index.sync("artist", artists, directory["artists"])
+
+
+def match_rank(text, query: str) -> int:
+    """
+    Relevancia de un texto para la consulta (menor es mejor): coincidencia exacta,
+    prefijo, prefijo de alguna palabra, contiene la consulta, o nada de lo anterior.
+    """
+    text = normalize_text(text)
+    query = normalize_text(query)
+    if text == query:
+        return 0
+    if text.startswith(query):
+        return 1
+    if any(word.startswith(query) for word in text.split()):
+        return 2
+    if query in text:
+        return 3
+    return 4
+
+
+def rank_results(items: list, kind: str, query: str) -> list:
+    """Ordena por relevancia; a igual relevancia se mantiene el orden de origen"""
+    field = TITLE_FIELDS[kind]
+    return sorted(items, key=lambda item: match_rank(item.get(field), query.strip()))
+
+
+async def search_ids(kind: str, query: str) -> list:
+    """IDs que devuelve la búsqueda /{tipo}/search de TYA (UpstreamError si falla)"""
+    resp = await upstream.get(
+        f"{servers.TYA}/{kind}/search",
+        params={"q": query},
+        timeout=5,
+        headers={"Accept": "application/json"}
+    )
+    # TYA responde 404 cuando no hay coincidencias
+    if resp.status_code == 404:
+        return []
+    resp.raise_for_status()
+    key = ENTITY_KEYS[kind]
+    return [obj.get(key) for obj in resp.json() or [] if isinstance(obj, dict) and obj.get(key)]
+
+
+def refine_cached(kind: str, query: str):
+    """
+    Resuelve la consulta filtrando el resultado en caché de su prefijo más largo, si ese
+    resultado es completo y tiene como mucho SEARCH_REFINE_MAX entidades. None si no hay ninguno.
+    """
+    field = TITLE_FIELDS[kind]
+    for end in range(len(query) - 1, 2, -1):
+        cached = upstream_results.get((kind, query[:end]))
+        if cached is None:
+            continue
+        entities, complete = cached
+        if not complete or len(entities) > SEARCH_REFINE_MAX:
+            return None
+        return [entity for entity in entities if query in normalize_text(entity.get(field))]
+    return None
+
+
+async def _load_upstream(kind: str, query: str, loader: EntityLoader):
+    ids = await search_ids(kind, query)
+    entities = await loader.load_list(kind, ids)
+    # Si /list no devolvió alguna entidad, el resultado no sirve para refinar consultas
+    return entities, len(entities) == len(set(map(to_int_id, ids)))
+
+
+async def _search_upstream(kind: str, query: str, loader: EntityLoader) -> list:
+    normalized = normalize_text(query)
+    entities = refine_cached(kind, normalized)
+    if entities is None:
+        try:
+            entities, _ = await upstream_results.get_or_load(
+                (kind, normalized), lambda: _load_upstream(kind, query, loader)
+            )
+        except UpstreamError as e:
+            print(f"Error buscando {kind}: {e}")
+            return []
+    # Copias: se les añade artistName y las de la caché son compartidas
+    return [dict(entity) for entity in entities]
+
+
+async def _resolve_artist_names(results: dict, loader: EntityLoader):
+    """Añade artistName a canciones, álbumes y merchandising con una sola consulta de artistas"""
+    with_artist = [item for kind in ("song", "album", "merch") for item in results.get(kind, [])]
+    # Los artistas del directorio local no necesitan consulta
+    artists = {}
+    for item in with_artist:
+        artist_id = to_int_id(item.get('artistId'))
+        if artist_id is not None and search_index.get("artist", artist_id) is not None:
+            artists[artist_id] = search_index.get("artist", artist_id)
+    missing = [item.get('artistId') for item in with_artist if to_int_id(item.get('artistId')) not in artists]
+    if missing:
+        artists.update(await loader.load_many("artist", missing))
+    for item in with_artist:
+        artist_data = artists.get(to_int_id(item.get('artistId')))
+        item['artistName'] = artist_data.get('artisticName', 'Artista desconocido') if artist_data else 'Artista desconocido'
+
+
+async def search(query: str, kinds=SEARCH_KINDS, limit: int = None, deadline: float = SEARCH_DEADLINE) -> dict:
+    """
+    Busca en los tipos indicados a la vez y devuelve {tipo: [entidades]} ordenadas por
+    relevancia, con artistName resuelto y como mucho 'limit' resultados por tipo
+    (todos si es None). Los tipos que fallen o superen el plazo quedan vacíos.
+    """
+    refresh_index()
+    local = {kind: search_index.lookup(kind, query) for kind in SEARCH_KINDS}
+    # Si el término aparece en algún tipo del índice, los tipos sin coincidencias están
+    # realmente vacíos; si no aparece en ninguno puede ser algo que el índice aún no tiene
+    known = any(local.values())
+    results = {}
+    for kind in kinds:
+        if local[kind] is not None and (local[kind] or known):
+            # Copias: se les añade artistName y las originales son compartidas
+            results[kind] = [dict(entity) for entity in local[kind]]
+
+    loader = EntityLoader()
+    pending = [kind for kind in kinds if kind not in results]
+    if pending:
+        results.update(await gather_with_deadline(
+            {kind: _search_upstream(kind, query, loader) for kind in pending},
+            deadline,
+            {kind: [] for kind in pending}
+        ))
+    for kind in kinds:
+        ranked = rank_results(results[kind], kind, query)
+        results[kind] = ranked if limit is None else ranked[:limit]
+    if any(kind != "artist" for kind in kinds):
+        await _resolve_artist_names(results, loader)
+    for kind in kinds:
+        externalize_covers(results[kind], IMAGE_FIELDS[kind])
+    return results
@@ -0,0 +1,335 @@
+"""
+Entrega del audio de las canciones obtenido del Proveedor de Tracks (PT).
+
+PT devuelve {"idtrack": int, "track": "base64"}. El cuerpo se lee en streaming y el
+base64 se decodifica por trozos directamente a disco, de modo que la memoria por
+reproducción queda acotada.
+
+Los tracks decodificados se guardan en una caché local en disco direccionada por
+contenido (diskcache.ContentStore), con un presupuesto de bytes y expulsión LRU. Un mismo trackId nunca cambia de contenido (al editar una
+canción PT asigna un track nuevo), así que las entradas no necesitan invalidarse.
+Los ficheros cacheados se sirven mapeados en memoria (mmap), sin volver a PT.
+
+PT exige sesión (oversound_auth con permiso de lectura de tracks) para entregar un track,
+así que la caché solo sirve a tokens que PT ya ha autorizado recientemente; el resto de
+peticiones se descargan de PT con su propio token, que es quien decide si tienen acceso.
+"""
+import asyncio
+import base64
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+from email.utils import parsedate_to_datetime
+from fastapi.responses import Response, StreamingResponse
+import controller.msvc_servers as servers
+from controller.upstream import upstream
+from controller.diskcache import ContentStore, iter_file
+from controller.cache import TTLCache
+
+# Directorio y presupuesto (en bytes) de la caché de tracks decodificados
+TRACK_CACHE_DIR = os.getenv("TRACK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "oversound-tracks"))
+TRACK_CACHE_MAX_BYTES = int(os.getenv("TRACK_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+# Tiempo que se recuerda que PT ha autorizado un token y número máximo de tokens recordados
+TRACK_AUTH_TTL = float(os.getenv("TRACK_AUTH_TTL", 300))
+TRACK_AUTH_CACHE_SIZE = int(os.getenv("TRACK_AUTH_CACHE_SIZE", 10000))
+# Máximo de bytes que se leen buscando el campo "track" antes de darlo por inexistente
+MAX_TRACK_PREAMBLE = 64 * 1024
+
+_TRACK_FIELD = re.compile(rb'"track"\s*:\s*("|null)')
+
+# Extensión de fichero para cada tipo MIME detectado
+AUDIO_EXTENSIONS = {
+    "audio/mpeg": "mp3",
+    "audio/flac": "flac",
+    "audio/ogg": "ogg",
+    "audio/wav": "wav",
+    "audio/mp4": "m4a",
+    "audio/aac": "aac",
+    "audio/webm": "webm",
+}
+
+
+class TrackNotFound(Exception):
+    pass
+
+
+def sniff_audio_type(head: bytes) -> str:
+    """Detecta el tipo MIME del audio a partir de sus primeros bytes (por defecto audio/mpeg)"""
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head[4:8] == b"ftyp":
+        return "audio/mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "audio/webm"
+    # ADTS (AAC sin contenedor): sincronía 0xFFF con layer 00
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0:
+        return "audio/aac"
+    # ID3 o trama MPEG (sincronía 0xFFE)
+    return "audio/mpeg"
+
+
+class DecodedTrack():
+    """Track decodificado: fichero abierto (o mmap) con su tamaño, hash, ETag y tipo MIME"""
+
+    def __init__(self, file, size: int, digest: str, media_type: str, last_modified: str = None):
+        self.file = file
+        self.size = size
+        self.digest = digest
+        self.etag = f'"{digest[:32]}"'
+        self.media_type = media_type
+        self.last_modified = last_modified
+
+    def close(self):
+        self.file.close()
+
+
+async def decode_track(chunks, out, last_modified: str = None) -> DecodedTrack:
+    """
+    Decodifica el campo "track" de la respuesta JSON de PT a partir de sus trozos de bytes
+    (iterador asíncrono) y lo escribe en 'out', sin cargar el cuerpo completo en memoria.
+    Lanza TrackNotFound si la respuesta no trae el track. El llamante cierra 'out' si falla.
+    """
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+    buf = b""
+    in_value = False
+    finished = False
+    async for chunk in chunks:
+        buf += chunk
+        if not in_value:
+            match = _TRACK_FIELD.search(buf)
+            if match is None:
+                if len(buf) > MAX_TRACK_PREAMBLE:
+                    raise TrackNotFound()
+                continue
+            if match.group(1) == b"null":
+                raise TrackNotFound()
+            in_value = True
+            buf = buf[match.end():]
+
+        end = buf.find(b'"')
+        if end != -1:
+            data, buf, finished = buf[:end], b"", True
+        else:
+            # Un escape partido entre trozos se completa con el siguiente
+            cut = len(buf) - 1 if buf.endswith(b"\\") else len(buf)
+            data, buf = buf[:cut], buf[cut:]
+        # JSON puede escapar '/' y partir el base64 en líneas
+        data = data.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+        data = b"".join(data.split())
+        # Solo se decodifican bloques completos de 4 caracteres; el resto espera al siguiente trozo
+        if not finished:
+            usable = len(data) - len(data) % 4
+            buf = data[usable:] + buf
+            data = data[:usable]
+        if data:
+            decoded = base64.b64decode(data)
+            out.write(decoded)
+            digest.update(decoded)
+            size += len(decoded)
+            if len(head) < 64:
+                head += decoded[:64 - len(head)]
+        if finished:
+            break
+
+    if not finished or size == 0:
+        raise TrackNotFound()
+    out.flush()
+    return DecodedTrack(out, size, digest.hexdigest(), sniff_audio_type(head), last_modified)
+
+
+def parse_range(header: str, size: int):
+    """
+    Interpreta una cabecera Range de un único rango ("bytes=inicio-fin", "bytes=inicio-"
+    o "bytes=-sufijo"). Devuelve (inicio, fin) inclusivos, None si la cabecera no se
+    puede usar (se sirve el fichero completo) o lanza ValueError si el rango no es satisfacible.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, sep, end = header[len("bytes="):].strip().partition("-")
+    if not sep or not (start or end) or not (start == "" or start.isdigit()) or not (end == "" or end.isdigit()):
+        return None
+    if not start:
+        suffix = int(end)
+        if suffix == 0:
+            raise ValueError("Rango vacío")
+        return max(0, size - suffix), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise ValueError("Rango no satisfacible")
+    return start, min(int(end), size - 1) if end else size - 1
+
+
+def not_modified(track: DecodedTrack, if_none_match: str = None, if_modified_since: str = None) -> bool:
+    """Indica si el navegador ya tiene esta versión del track (para responder 304)"""
+    if if_none_match:
+        return track.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if if_modified_since and track.last_modified:
+        try:
+            return parsedate_to_datetime(track.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def range_applies(track: DecodedTrack, if_range: str = None) -> bool:
+    """If-Range: el rango solo se respeta si el validador coincide con la versión actual"""
+    if not if_range:
+        return True
+    return if_range.strip() in (track.etag, track.last_modified)
+
+
+def iter_track(track: DecodedTrack, start: int, end: int):
+    """Envía los bytes [start, end] del track por trozos y cierra el fichero al terminar"""
+    return iter_file(track.file, start, end)
+
+
+def track_response(track: DecodedTrack, request_headers, filename: str) -> Response:
+    """
+    Construye la respuesta para el navegador: 304 si ya tiene esta versión, 206 con el
+    rango pedido, 416 si el rango no es válido, o 200 con el track completo.
+    """
+    headers = {
+        "Content-Disposition": f"inline; filename={filename}.{AUDIO_EXTENSIONS[track.media_type]}",
+        "Accept-Ranges": "bytes",
+        # private: el audio solo se entrega con sesión, no debe guardarse en cachés compartidas
+        "Cache-Control": "private, max-age=3600",
+        "ETag": track.etag,
+    }
+    if track.last_modified:
+        headers["Last-Modified"] = track.last_modified
+
+    if not_modified(track, request_headers.get("if-none-match"), request_headers.get("if-modified-since")):
+        track.close()
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if range_applies(track, request_headers.get("if-range")):
+        try:
+            byte_range = parse_range(request_headers.get("range"), track.size)
+        except ValueError:
+            track.close()
+            headers["Content-Range"] = f"bytes */{track.size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        start, end, status_code = 0, track.size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{track.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_track(track, start, end), status_code=status_code,
+                             media_type=track.media_type, headers=headers)
+
+
+class TrackCache():
+    """
+    Caché LRU en disco de tracks decodificados, acotada a 'max_bytes'
+    (ver diskcache.ContentStore).
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.store = ContentStore(directory, max_bytes)
+        self._inflight = {}
+        # Hashes de los tokens a los que PT ha entregado algún track
+        self._authorized = TTLCache(maxsize=TRACK_AUTH_CACHE_SIZE, ttl=TRACK_AUTH_TTL)
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        # No guardar el token en claro en memoria, solo su hash
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def is_authorized(self, token: str) -> bool:
+        """Indica si PT ha autorizado este token recientemente"""
+        return bool(token) and self._authorized.get(self._token_key(token), False)
+
+    def open(self, track_id: int):
+        """Devuelve el track cacheado mapeado en memoria, o None si no está"""
+        entry = self.store.lookup(track_id)
+        if entry is None:
+            return None
+        digest, (media_type, last_modified) = entry
+        try:
+            with open(self.store.path(digest), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            print(f"Error abriendo track {track_id} de la caché: {e}")
+            self.store.remove(track_id)
+            return None
+        return DecodedTrack(mapped, len(mapped), digest, media_type, last_modified)
+
+    async def get(self, track_id: int, token: str = None) -> DecodedTrack:
+        """
+        Devuelve el track (abierto, el llamante debe cerrarlo) desde la caché o, si no está,
+        lo descarga de PT y lo guarda. Las descargas concurrentes del mismo track se agrupan.
+        Si PT no ha autorizado todavía el token, se descarga con él sin usar la caché ni las
+        descargas de otros (PT responde 401/403 si no tiene acceso).
+        """
+        if not self.is_authorized(token):
+            # _fetch devuelve None si el track ha quedado en caché
+            track = await self._fetch(track_id, token)
+            if track is None:
+                track = self.open(track_id)
+            if track is not None:
+                return track
+        track = self.open(track_id)
+        if track is not None:
+            return track
+        task = self._inflight.get(track_id)
+        owner = task is None
+        if owner:
+            task = self._inflight[track_id] = asyncio.ensure_future(self._fetch_shared(track_id, token))
+        # shield: si se cancela una de las peticiones que esperan, la descarga sigue para las demás
+        uncached = await asyncio.shield(task)
+        track = self.open(track_id)
+        if track is not None:
+            return track
+        # El track no cabe en la caché: quien lo descargó lo sirve desde su fichero temporal
+        # (ya desenlazado) y el resto de peticiones lo descargan por su cuenta
+        if owner and uncached is not None:
+            return uncached
+        return await self._fetch(track_id, token)
+
+    async def _fetch_shared(self, track_id: int, token: str = None):
+        try:
+            return await self._fetch(track_id, token)
+        finally:
+            self._inflight.pop(track_id, None)
+
+    async def _fetch(self, track_id: int, token: str = None):
+        """Descarga y decodifica el track; devuelve None si ha quedado en caché o el track abierto si no cabe"""
+        out = self.store.temp_file()
+        try:
+            async with upstream.stream(
+                "GET",
+                f"{servers.PT}/track/{track_id}",
+                timeout=10,
+                headers={
+                    "Accept": "application/json",
+                    "Cookie": f"oversound_auth={token}"
+                }
+            ) as track_resp:
+                track_resp.raise_for_status()
+                if token:
+                    self._authorized.set(self._token_key(token), True)
+                track = await decode_track(track_resp.aiter_bytes(), out, track_resp.headers.get("Last-Modified"))
+        except BaseException:
+            out.close()
+            os.unlink(out.name)
+            raise
+        if self.store.put(track_id, out.name, track.digest, track.size, (track.media_type, track.last_modified)):
+            out.close()
+            return None
+        os.unlink(out.name)
+        return track
+
+track_cache = TrackCache(TRACK_CACHE_DIR, TRACK_CACHE_MAX_BYTES)
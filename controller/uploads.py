@@ -0,0 +1,433 @@
+"""
+Trabajos de subida de canciones en segundo plano.
+
+POST /song/upload solo valida la petición, vuelca el audio a un fichero propio del trabajo
+y responde con el ID del trabajo. Las etapas (duración, subida del track a PT y alta de la
+canción en TYA) se ejecutan después en segundo plano, con un número acotado de trabajos
+simultáneos y reintentos por etapa. El progreso se consulta en /upload/jobs/{id}.
+
+Los trabajos viven en memoria del proceso y se olvidan UPLOAD_JOB_TTL segundos después de
+su última actualización.
+
+Para audios grandes hay además subidas reanudables por trozos: se crea una sesión con el
+tamaño total, se envían trozos con PUT indicando su posición (offset) y, si la conexión
+se corta, se consulta la sesión para continuar desde el último byte recibido. Los trozos
+se escriben en su posición de un fichero en disco; al completarse, el fichero se entrega
+a la subida o edición de la canción (campo audioSession) en lugar del audio en base64.
+La sesión solo se cierra (y su fichero se borra) cuando la subida o edición termina bien:
+si falla, sigue disponible para reintentar sin volver a enviar el audio.
+"""
+import asyncio
+import base64
+import os
+import secrets
+import shutil
+import tempfile
+import time
+import httpx
+import controller.msvc_servers as servers
+import controller.catalog as catalog
+import controller.media as media
+from controller.upstream import upstream
+from controller.cache import TTLCache
+
+UPLOAD_JOB_DIR = os.getenv("UPLOAD_JOB_DIR", os.path.join(tempfile.gettempdir(), "oversound-uploads"))
+# Trabajos que se procesan a la vez (el resto espera en estado "queued")
+UPLOAD_JOB_WORKERS = int(os.getenv("UPLOAD_JOB_WORKERS", 4))
+UPLOAD_JOB_TTL = float(os.getenv("UPLOAD_JOB_TTL", 3600))
+UPLOAD_MAX_JOBS = 10000
+# Intentos por etapa y espera antes del primer reintento (se duplica en cada uno)
+UPLOAD_STAGE_ATTEMPTS = int(os.getenv("UPLOAD_STAGE_ATTEMPTS", 3))
+UPLOAD_RETRY_BACKOFF = float(os.getenv("UPLOAD_RETRY_BACKOFF", 1))
+# Sesiones de subida por trozos: tamaño máximo del audio y tiempo sin actividad antes de descartarlas
+UPLOAD_SESSION_MAX_BYTES = int(os.getenv("UPLOAD_SESSION_MAX_BYTES", 500 * 1024 * 1024))
+UPLOAD_SESSION_TTL = float(os.getenv("UPLOAD_SESSION_TTL", 24 * 3600))
+UPLOAD_MAX_SESSIONS = 10000
+
+# Errores tras los que PT/TYA seguro que no han recibido la petición (reintentar no duplica
+# tracks ni canciones)
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_RETRYABLE_STATUS = (502, 503, 504)
+
+
+class UploadFailed(Exception):
+    pass
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class SessionConflict(Exception):
+    """El trozo no empieza donde termina lo ya recibido (o hay otro PUT en curso)"""
+    pass
+
+
+def song_fields(body: dict) -> dict:
+    """Valida y convierte los datos de la canción (ValueError/TypeError si no son válidos)"""
+    release_date = body.get('releaseDate') or None
+    album_id = body.get('albumId')
+    return {
+        'title': body.get('title'),
+        'price': float(body.get('price')),
+        'description': body.get('description') or None,
+        'releaseDate': f"{release_date}T00:00:00Z" if release_date else None,
+        'albumId': int(album_id) if album_id not in (None, '') else None,
+        'genres': [int(g) for g in body.get('genres') or []],
+        'collaborators': [int(c) for c in body.get('collaborators') or []],
+    }
+
+
+class UploadJob():
+
+    def __init__(self, owner, token: str, fields: dict, audio_path: str, cover: str, session=None):
+        self.id = secrets.token_urlsafe(16)
+        self.owner = owner
+        self.token = token
+        self.fields = fields
+        self.audio_path = audio_path
+        self.cover = cover
+        # Sesión de subida por trozos prestada con claim() (el audio es su fichero), o None
+        self.session = session
+        # queued -> processing -> done | failed
+        self.status = "queued"
+        # Etapa en curso: duration, track, song
+        self.stage = None
+        self.attempts = {}
+        self.song_id = None
+        self.message = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def to_dict(self) -> dict:
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "attempts": dict(self.attempts),
+            "songId": self.song_id,
+            "message": self.message,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+        }
+
+
+async def send_track(audio_path: str, token: str) -> httpx.Response:
+    """Sube a PT el audio de un fichero, codificando el base64 a medida que se envía"""
+    size = os.path.getsize(audio_path)
+    with open(audio_path, "rb") as audio:
+        return await upstream.post(
+            f"{servers.PT}/track/upload",
+            content=media.iter_json_base64(audio, "track"),
+            timeout=10,
+            headers={
+                "Content-Type": "application/json",
+                "Content-Length": str(media.json_base64_length(size, "track")),
+                "Cookie": f"oversound_auth={token}"
+            }
+        )
+
+
+class UploadQueue():
+
+    def __init__(self, directory: str, workers: int, ttl: float):
+        self.directory = directory
+        self._jobs = TTLCache(maxsize=UPLOAD_MAX_JOBS, ttl=ttl)
+        self._slots = asyncio.Semaphore(workers)
+        self._tasks = set()
+        self._prepared = False
+
+    def _prepare(self):
+        # Los ficheros de trabajos de una ejecución anterior ya no tienen trabajo asociado
+        if not self._prepared:
+            os.makedirs(self.directory, exist_ok=True)
+            for name in os.listdir(self.directory):
+                if name.startswith("upload-"):
+                    try:
+                        os.unlink(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+            self._prepared = True
+
+    def temp_file(self):
+        self._prepare()
+        return tempfile.NamedTemporaryFile(dir=self.directory, prefix="upload-", delete=False)
+
+    async def spool_file(self, source) -> str:
+        """Copia un fichero subido (p. ej. el temporal del multipart) a un fichero del trabajo"""
+        out = self.temp_file()
+        try:
+            await asyncio.to_thread(source.seek, 0)
+            await asyncio.to_thread(shutil.copyfileobj, source, out, media.BASE64_CHUNK_SIZE)
+        except BaseException:
+            out.close()
+            os.unlink(out.name)
+            raise
+        out.close()
+        return out.name
+
+    async def spool_base64(self, data: str) -> str:
+        """Decodifica (en el pool de media) un audio en base64 a un fichero del trabajo"""
+        out = self.temp_file()
+        try:
+            await media.media_pool.run(lambda: out.write(base64.b64decode(data)))
+        except BaseException:
+            out.close()
+            os.unlink(out.name)
+            raise
+        out.close()
+        return out.name
+
+    def submit(self, job: UploadJob) -> UploadJob:
+        self._jobs.set(job.id, job)
+        task = asyncio.ensure_future(self._run(job))
+        # Mantener una referencia para que la tarea no se recoja mientras se ejecuta
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str, owner):
+        """Devuelve el trabajo si existe y pertenece a 'owner', o None"""
+        job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def _touch(self, job: UploadJob):
+        job.updated_at = time.time()
+        # Renovar la caducidad con cada cambio de estado
+        self._jobs.set(job.id, job)
+
+    async def _run(self, job: UploadJob):
+        try:
+            async with self._slots:
+                job.status = "processing"
+                self._touch(job)
+                job.song_id = await self._process(job)
+                job.status = "done"
+                job.message = "Canción subida exitosamente"
+                catalog.expire()
+        except UploadFailed as e:
+            job.status = "failed"
+            job.message = str(e)
+        except Exception as e:
+            print(f"Error en el trabajo de subida {job.id}: {e}")
+            job.status = "failed"
+            job.message = "Error al subir la canción"
+        finally:
+            self._touch(job)
+            # La sesión de usuario ya no hace falta
+            job.token = None
+            if job.session is not None:
+                # El audio de una sesión por trozos solo se descarta si la subida ha terminado bien
+                if job.status == "done":
+                    upload_sessions.finish(job.session)
+                else:
+                    upload_sessions.release(job.session)
+            else:
+                try:
+                    os.unlink(job.audio_path)
+                except OSError:
+                    pass
+
+    async def _process(self, job: UploadJob):
+        duration = await self._stage(job, "duration", lambda: self._duration(job))
+        track_id = await self._stage(job, "track", lambda: self._upload_track(job))
+        return await self._stage(job, "song", lambda: self._create_song(job, duration, track_id))
+
+    async def _stage(self, job: UploadJob, stage: str, attempt):
+        """Ejecuta una etapa reintentándola con espera exponencial ante errores transitorios"""
+        job.stage = stage
+        for number in range(1, UPLOAD_STAGE_ATTEMPTS + 1):
+            job.attempts[stage] = number
+            self._touch(job)
+            try:
+                return await attempt()
+            except _RetryableError as e:
+                if number == UPLOAD_STAGE_ATTEMPTS:
+                    raise UploadFailed(str(e))
+                print(f"Trabajo de subida {job.id}: etapa '{stage}' falló (intento {number}), reintentando: {e}")
+                await asyncio.sleep(UPLOAD_RETRY_BACKOFF * 2 ** (number - 1))
+
+    async def _duration(self, job: UploadJob) -> int:
+        try:
+            return await media.media_pool.run(media.audio_duration, job.audio_path)
+        except media.MediaPoolBusy:
+            raise _RetryableError("El servidor está procesando muchas subidas")
+
+    async def _upload_track(self, job: UploadJob) -> int:
+        try:
+            pt_resp = await send_track(job.audio_path, job.token)
+        except _NOT_SENT_ERRORS as e:
+            raise _RetryableError(f"Error subiendo a PT: {e}")
+        except httpx.HTTPError as e:
+            # PT puede haber guardado el track: reintentar dejaría tracks huérfanos
+            raise UploadFailed(f"Error subiendo a PT: {e}")
+        if pt_resp.status_code in _RETRYABLE_STATUS:
+            raise _RetryableError(f"Error subiendo a PT: {pt_resp.text}")
+        if not pt_resp.is_success:
+            raise UploadFailed(f"Error subiendo a PT: {pt_resp.text}")
+        try:
+            return pt_resp.json()['idtrack']
+        except (ValueError, KeyError, TypeError):
+            raise UploadFailed("Respuesta no válida de PT")
+
+    async def _create_song(self, job: UploadJob, duration: int, track_id: int) -> int:
+        body_tya = {**job.fields, 'duration': duration, 'trackId': track_id, 'cover': job.cover}
+        try:
+            song_resp = await upstream.post(
+                f"{servers.TYA}/song/upload",
+                json=body_tya,
+                timeout=20,
+                headers={"Accept": "application/json", "Cookie": f"oversound_auth={job.token}"}
+            )
+        except _NOT_SENT_ERRORS as e:
+            raise _RetryableError(f"Error en TYA: {e}")
+        except httpx.HTTPError as e:
+            # TYA puede haber creado la canción: reintentar podría duplicarla
+            raise UploadFailed(f"Error en TYA: {e}")
+        if song_resp.status_code in _RETRYABLE_STATUS:
+            raise _RetryableError(f"Error en TYA: {song_resp.text}")
+        if not song_resp.is_success:
+            raise UploadFailed(f"Error en TYA: {song_resp.text}")
+        try:
+            return song_resp.json().get('songId')
+        except (ValueError, AttributeError):
+            raise UploadFailed("Respuesta no válida de TYA")
+
+    async def stop(self):
+        """Cancela los trabajos pendientes al apagar la aplicación"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+upload_queue = UploadQueue(UPLOAD_JOB_DIR, UPLOAD_JOB_WORKERS, UPLOAD_JOB_TTL)
+
+
+class UploadSession():
+
+    def __init__(self, owner, size: int, path: str):
+        self.id = secrets.token_urlsafe(16)
+        self.owner = owner
+        self.size = size
+        self.path = path
+        # Bytes recibidos de forma contigua desde el principio
+        self.offset = 0
+        self.lock = asyncio.Lock()
+        # Fichero prestado a una edición en curso (ver UploadSessions.claim)
+        self.in_use = False
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.size
+
+    def to_dict(self) -> dict:
+        return {"sessionId": self.id, "size": self.size, "offset": self.offset, "complete": self.complete}
+
+
+class UploadSessions():
+
+    def __init__(self, directory: str, ttl: float, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._sessions = TTLCache(maxsize=UPLOAD_MAX_SESSIONS, ttl=ttl)
+        self._prepared = False
+
+    def _prepare(self):
+        # Las sesiones de una ejecución anterior no están en memoria: sus ficheros sobran
+        if not self._prepared:
+            os.makedirs(self.directory, exist_ok=True)
+            for name in os.listdir(self.directory):
+                if name.startswith("session-"):
+                    try:
+                        os.unlink(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+            self._prepared = True
+
+    def _sweep(self):
+        """Borra los ficheros de sesiones caducadas (sin actividad durante el TTL)"""
+        deadline = time.time() - self._sessions.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.startswith("session-") and os.path.getmtime(path) < deadline:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def create(self, owner, size: int) -> UploadSession:
+        """Crea una sesión para un audio de 'size' bytes (ValueError si el tamaño no es válido)"""
+        if size <= 0 or size > self.max_bytes:
+            raise ValueError(f"Tamaño no válido: {size}")
+        self._prepare()
+        self._sweep()
+        fd, path = tempfile.mkstemp(dir=self.directory, prefix="session-")
+        os.close(fd)
+        session = UploadSession(owner, size, path)
+        self._sessions.set(session.id, session)
+        return session
+
+    def get(self, session_id: str, owner):
+        """Devuelve la sesión si existe y pertenece a 'owner', o None"""
+        session = self._sessions.get(session_id)
+        if session is None or session.owner != owner:
+            return None
+        return session
+
+    async def write(self, session: UploadSession, offset: int, chunks) -> UploadSession:
+        """
+        Escribe en la posición 'offset' los bytes del iterador asíncrono 'chunks'.
+        El trozo debe empezar donde termina lo recibido (SessionConflict si no) y no puede
+        pasarse del tamaño declarado (ValueError). Si la conexión se corta a mitad, lo
+        recibido hasta entonces queda guardado y la subida se reanuda desde ahí.
+        """
+        if session.lock.locked() or session.in_use:
+            raise SessionConflict()
+        async with session.lock:
+            if offset != session.offset:
+                raise SessionConflict()
+            with open(session.path, "r+b") as out:
+                await asyncio.to_thread(out.seek, offset)
+                try:
+                    async for chunk in chunks:
+                        if session.offset + len(chunk) > session.size:
+                            raise ValueError("El trozo supera el tamaño declarado")
+                        await asyncio.to_thread(out.write, chunk)
+                        session.offset += len(chunk)
+                finally:
+                    await asyncio.to_thread(out.flush)
+                    # Renovar la caducidad de la sesión con cada trozo recibido
+                    self._sessions.set(session.id, session)
+        return session
+
+    def claim(self, session_id: str, owner):
+        """
+        Presta el fichero de una sesión completa sin cerrarla: quien lo recibe llama a
+        finish() cuando el audio se ha entregado o a release() si falla, y la sesión sigue
+        disponible para reintentar sin volver a subir el audio. None si la sesión no
+        existe, es de otro usuario, está incompleta o ya está prestada.
+        """
+        session = self.get(session_id, owner)
+        if session is None or not session.complete or session.lock.locked() or session.in_use:
+            return None
+        session.in_use = True
+        return session
+
+    def release(self, session: UploadSession):
+        """Devuelve una sesión prestada con claim() (y renueva su caducidad)"""
+        session.in_use = False
+        self._sessions.set(session.id, session)
+
+    def finish(self, session: UploadSession):
+        """Cierra una sesión prestada con claim() y borra su fichero"""
+        self._sessions.invalidate(session.id)
+        try:
+            os.unlink(session.path)
+        except OSError:
+            pass
+
+
+upload_sessions = UploadSessions(UPLOAD_JOB_DIR, UPLOAD_SESSION_TTL, UPLOAD_SESSION_MAX_BYTES)
@@ -0,0 +1,96 @@
+"""
+Cliente HTTP asíncrono compartido para las llamadas a los microservicios.
+
+Se mantiene un httpx.AsyncClient por servicio (SYU, TYA, TPP, PT, RYE), cada uno
+con su propio pool de conexiones keep-alive configurado en
+controller/msvc_servers.py. Los clientes se abren en el lifespan de la
+aplicación y se cierran al apagarla, de modo que todas las rutas reutilizan
+las mismas conexiones sin bloquear el event loop.
+"""
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+import httpx
+import controller.msvc_servers as servers
+
+try:
+    import h2  # noqa: F401  (solo necesario para HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Equivalente a requests.RequestException: errores de transporte o de estado HTTP
+# y respuestas cuyo cuerpo no es JSON válido.
+UpstreamError = (httpx.HTTPError, ValueError)
+
+# Configuración usada para URLs que no pertenecen a ningún servicio conocido
+DEFAULT_POOL = {"max_connections": 20, "max_keepalive": 10, "keepalive_expiry": 30.0, "timeout": 10.0, "http2": False}
+
+
+class UpstreamClients():
+
+    def __init__(self, pools: dict):
+        self._pools = pools
+        self._clients = {}
+
+    def _build(self, config: dict) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["max_keepalive"],
+                keepalive_expiry=config["keepalive_expiry"],
+            ),
+            timeout=httpx.Timeout(config["timeout"]),
+            http2=config["http2"] and HTTP2_AVAILABLE,
+            # El cliente es compartido entre usuarios: nunca guardar cookies de las respuestas,
+            # la sesión se reenvía explícitamente en la cabecera Cookie de cada petición.
+            cookies=httpx.Cookies(CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))),
+        )
+
+    async def start(self):
+        for base_url, config in self._pools.items():
+            if base_url not in self._clients:
+                self._clients[base_url] = self._build(config)
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """
+        Devuelve el cliente del servicio al que pertenece la URL.
+        Si el lifespan aún no lo ha creado (p. ej. en scripts), se crea bajo demanda.
+        """
+        for base_url, config in self._pools.items():
+            if url == base_url or url.startswith(base_url + "/"):
+                break
+        else:
+            base_url, config = None, DEFAULT_POOL
+        client = self._clients.get(base_url)
+        if client is None:
+            client = self._clients[base_url] = self._build(config)
+        return client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return await self.client_for(url).request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    def stream(self, method: str, url: str, **kwargs):
+        """Petición en streaming (usar con 'async with'), para cuerpos grandes."""
+        return self.client_for(url).stream(method, url, **kwargs)
+
+
+upstream = UpstreamClients(servers.POOLS)
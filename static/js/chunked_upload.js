@@ -0,0 +1,64 @@
+/**
+ * Subida reanudable de ficheros por trozos (/upload/sessions).
+ *
+ * Crea una sesión con el tamaño del fichero y envía trozos con PUT indicando su posición.
+ * Si un trozo falla (corte de red), consulta cuántos bytes tiene ya el servidor y continúa
+ * desde ahí, sin volver a enviar lo ya recibido. Devuelve el ID de la sesión, que se envía
+ * como 'audioSession' al subir o editar la canción.
+ */
+const CHUNK_SIZE = 4 * 1024 * 1024;
+const MAX_CHUNK_RETRIES = 5;
+
+async function uploadFileInChunks(file, onProgress) {
+    const createResp = await fetch('/upload/sessions', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ size: file.size }),
+        credentials: 'same-origin'
+    });
+    const session = await createResp.json();
+    if (!createResp.ok) {
+        throw new Error(session.error || 'No se pudo iniciar la subida');
+    }
+
+    const sessionUrl = `/upload/sessions/${session.sessionId}`;
+    let offset = session.offset;
+    let retries = 0;
+
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + CHUNK_SIZE);
+        try {
+            const resp = await fetch(`${sessionUrl}?offset=${offset}`, {
+                method: 'PUT',
+                headers: { 'Content-Type': 'application/octet-stream' },
+                body: chunk,
+                credentials: 'same-origin'
+            });
+            const state = await resp.json();
+            if (resp.ok || resp.status === 409) {
+                // 409: el servidor tiene otro offset (p. ej. un trozo anterior sí llegó)
+                offset = state.offset;
+                retries = 0;
+                if (onProgress) onProgress(offset, file.size);
+                continue;
+            }
+            throw new Error(state.error || 'Error subiendo el audio');
+        } catch (err) {
+            retries++;
+            if (retries > MAX_CHUNK_RETRIES) {
+                throw err;
+            }
+            // Esperar y preguntar al servidor cuánto ha recibido antes de reanudar
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            try {
+                const stateResp = await fetch(sessionUrl, { credentials: 'same-origin' });
+                if (stateResp.ok) {
+                    offset = (await stateResp.json()).offset;
+                }
+            } catch (ignored) {
+                // Sin conexión todavía: se reintenta desde el último offset conocido
+            }
+        }
+    }
+    return session.sessionId;
+}
@@ -79,11 +79,6 @@ document.addEventListener('DOMContentLoaded', function(){
         }
 
         try {
-            let audioBase64 = null;
-            if (audioFile) {
-                audioBase64 = await fileToBase64(audioFile);
-            }
-
             let coverBase64 = null;
             let coverExtension = null;
             if (coverFile) {
@@ -125,8 +120,13 @@ document.addEventListener('DOMContentLoaded', function(){
                 collaborators: selectedCollabs
             };
 
-            if (audioBase64) {
-                data.audioFile = audioBase64;
+            // El audio nuevo se sube por trozos (reanudable) y solo se envía la sesión
+            if (audioFile) {
+                messageDiv.className = 'message success';
+                messageDiv.style.display = 'block';
+                data.audioSession = await uploadFileInChunks(audioFile, (sent, total) => {
+                    messageDiv.textContent = `Subiendo audio... ${Math.floor(sent * 100 / total)}%`;
+                });
             }
 
             if (coverBase64) {
@@ -201,6 +201,11 @@ function initSearch() {
             return imagePath;
         }
         
+        // Si ya apunta a las imágenes servidas por el frontend, devolverla tal cual
+        if (imagePath.startsWith('/covers/') || imagePath.startsWith('/tya-static/')) {
+            return imagePath;
+        }
+        
         // Si es una ruta relativa (ej: /song/24.png), construir URL completa
         if (imagePath.startsWith('/')) {
             return getServerConfig() + '/static' + imagePath;
@@ -269,31 +274,24 @@ function initSearch() {
     });
 
     /**
-     * Realiza la búsqueda en todos los endpoints
+     * Realiza la búsqueda federada (canciones, álbumes, artistas y merchandising)
      */
     async function performSearch(query) {
         try {
-            // Llamadas en paralelo a los endpoints del backend (proxy)
-            const [songsRes, albumsRes, artistsRes, merchRes] = await Promise.allSettled([
-                fetch(`/api/search/song?q=${encodeURIComponent(query)}`),
-                fetch(`/api/search/album?q=${encodeURIComponent(query)}`),
-                fetch(`/api/search/artist?q=${encodeURIComponent(query)}`),
-                fetch(`/api/search/merch?q=${encodeURIComponent(query)}`)
-            ]);
-
-            // Extraer datos de las respuestas exitosas (ya vienen completos desde el backend)
-            const songs = songsRes.status === 'fulfilled' && songsRes.value.ok 
-                ? await songsRes.value.json() 
-                : [];
-            const albums = albumsRes.status === 'fulfilled' && albumsRes.value.ok 
-                ? await albumsRes.value.json() 
-                : [];
-            const artists = artistsRes.status === 'fulfilled' && artistsRes.value.ok 
-                ? await artistsRes.value.json() 
-                : [];
-            const merch = merchRes.status === 'fulfilled' && merchRes.value.ok 
-                ? await merchRes.value.json() 
-                : [];
+            // Una sola llamada: el backend busca en los cuatro tipos a la vez
+            const response = await fetch(`/api/search?q=${encodeURIComponent(query)}`);
+            const results = response.ok ? await response.json() : {};
+
+            // La respuesta puede llegar después de que el usuario siga escribiendo
+            if (query !== currentQuery) {
+                return;
+            }
+
+            // Los resultados ya vienen completos, ordenados y limitados por tipo
+            const songs = results.songs || [];
+            const albums = results.albums || [];
+            const artists = results.artists || [];
+            const merch = results.merch || [];
 
             // Si no hay resultados en ninguno
             if (songs.length === 0 && albums.length === 0 && 
@@ -1,10 +1,17 @@
 // Shop Page JavaScript - Custom Dropdowns & Pagination
 
-// Estado de la paginación para cada sección
+// Estado de la paginación para cada sección (el servidor solo envía la página actual)
 const paginationState = {
-    songs: { currentPage: 1, itemsPerPage: 9 },
-    albums: { currentPage: 1, itemsPerPage: 9 },
-    merch: { currentPage: 1, itemsPerPage: 9 }
+    songs: { currentPage: 1, itemsPerPage: 9, total: 0 },
+    albums: { currentPage: 1, itemsPerPage: 9, total: 0 },
+    merch: { currentPage: 1, itemsPerPage: 9, total: 0 }
+};
+
+// Tipo de producto, ruta de detalle, clave de ID, imagen y precio por defecto de cada sección
+const sectionConfig = {
+    songs: { type: 'song', idKey: 'songId', defaultCover: '/static/img/utils/default-song.svg', defaultPrice: '0.99', alt: 'Canción' },
+    albums: { type: 'album', idKey: 'albumId', defaultCover: '/static/img/utils/default-album.svg', defaultPrice: '9.99', alt: 'Álbum' },
+    merch: { type: 'merch', idKey: 'merchId', defaultCover: '/static/img/utils/default-merch.svg', defaultPrice: '19.99', alt: 'Producto' }
 };
 
 // Inicialización cuando el DOM está listo
@@ -20,34 +27,155 @@ document.addEventListener('DOMContentLoaded', () => {
 
 // ============ PAGINATION ============
 function initPagination() {
-    // Inicializar paginación para cada sección
+    // Leer de cada grid la página que ha renderizado el servidor y el total de productos
     ['songs', 'albums', 'merch'].forEach(section => {
+        const grid = document.getElementById(`${section}-grid`);
+        if (!grid) return;
+        const state = paginationState[section];
+        state.currentPage = parseInt(grid.dataset.page) || 1;
+        state.itemsPerPage = parseInt(grid.dataset.pageSize) || state.itemsPerPage;
+        state.total = parseInt(grid.dataset.total) || 0;
+        grid.querySelectorAll('.product-card').forEach(card => card.classList.add('visible'));
         updatePagination(section);
     });
 }
 
+async function goToPage(section, page) {
+    const grid = document.getElementById(`${section}-grid`);
+    const state = paginationState[section];
+    if (!grid) return;
+
+    // Pedir solo la página de esta sección con los mismos filtros que la URL actual
+    const params = new URLSearchParams(window.location.search);
+    params.set('section', section);
+    params.set('page', page);
+    params.set('page_size', state.itemsPerPage);
+
+    const loading = document.getElementById('loading-indicator');
+    if (loading) loading.style.display = 'flex';
+    try {
+        const response = await fetch(`/api/shop?${params.toString()}`, { headers: { 'Accept': 'application/json' } });
+        if (!response.ok) {
+            showNotification('❌ Error cargando productos');
+            return;
+        }
+        const result = (await response.json())[section];
+        state.currentPage = result.page;
+        state.total = result.total;
+        grid.innerHTML = '';
+        result.items.forEach((item, index) => grid.appendChild(createProductCard(section, item, index)));
+        if (isAuthenticated) {
+            grid.querySelectorAll('.btn-add-cart').forEach(button => {
+                button.addEventListener('click', handleAddToCart);
+            });
+        }
+        updatePagination(section);
+        scrollToSection(section);
+    } catch (error) {
+        console.error('Error:', error);
+        showNotification('❌ Error de conexión');
+    } finally {
+        if (loading) loading.style.display = 'none';
+    }
+}
+
+function createBadge(className, text) {
+    const badge = document.createElement('span');
+    badge.className = `product-badge ${className}`;
+    badge.textContent = text;
+    return badge;
+}
+
+// Construye una card con la misma estructura que la plantilla shop.html
+function createProductCard(section, item, index) {
+    const config = sectionConfig[section];
+    const card = document.createElement('div');
+    card.className = 'product-card visible';
+    card.dataset.type = config.type;
+    card.dataset.index = index;
+
+    const image = document.createElement('div');
+    image.className = 'product-image';
+    const img = document.createElement('img');
+    img.src = item.cover || config.defaultCover;
+    img.alt = item.title || config.alt;
+    img.loading = 'lazy';
+    const overlay = document.createElement('div');
+    overlay.className = 'product-overlay';
+    const link = document.createElement('a');
+    link.href = `/${config.type}/${item[config.idKey]}`;
+    link.className = 'btn-view';
+    link.textContent = 'Ver Detalles';
+    overlay.appendChild(link);
+    image.append(img, overlay);
+
+    const info = document.createElement('div');
+    info.className = 'product-info';
+    const name = document.createElement('h3');
+    name.className = 'product-name';
+    name.textContent = item.title || 'Sin título';
+    const artist = document.createElement('p');
+    artist.className = 'product-artist';
+    artist.textContent = item.artistId ? item.artistName : 'Artista desconocido';
+    info.append(name, artist);
+
+    if (item.description) {
+        const description = document.createElement('p');
+        description.className = 'product-description';
+        description.title = item.description;
+        description.textContent = item.description;
+        info.appendChild(description);
+    }
+
+    const meta = document.createElement('div');
+    meta.className = 'product-meta-container';
+    if (section === 'albums' && item.songs && item.songs.length) {
+        meta.appendChild(createBadge('badge-songs', `${item.songs.length} canciones`));
+    }
+    if (section === 'merch') {
+        meta.appendChild(createBadge('badge-merch', '🛒 Merchandising'));
+    } else {
+        (item.genreNames || []).forEach(genre => meta.appendChild(createBadge('badge-genre', genre)));
+    }
+    const duration = parseInt(item.duration) || 0;
+    if (section === 'songs' && duration > 0) {
+        meta.appendChild(createBadge('badge-duration', `${Math.floor(duration / 60)}:${String(duration % 60).padStart(2, '0')}`));
+    }
+    info.appendChild(meta);
+
+    const footer = document.createElement('div');
+    footer.className = 'product-footer';
+    const price = document.createElement('span');
+    price.className = 'product-price';
+    price.textContent = `€${item.price ? parseFloat(item.price).toFixed(2) : config.defaultPrice}`;
+    const cartButton = document.createElement('button');
+    cartButton.className = 'btn-add-cart';
+    cartButton.dataset.productId = item[config.idKey];
+    cartButton.dataset.productType = config.type;
+    cartButton.innerHTML = '<svg width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"><circle cx="9" cy="21" r="1"></circle><circle cx="20" cy="21" r="1"></circle><path d="M1 1h4l2.68 13.39a2 2 0 0 0 2 1.61h9.72a2 2 0 0 0 2-1.61L23 6H6"></path></svg>';
+    footer.append(price, cartButton);
+    info.appendChild(footer);
+
+    card.append(image, info);
+    return card;
+}
+
 function updatePagination(section) {
     const grid = document.getElementById(`${section}-grid`);
     if (!grid) return;
 
-    const cards = Array.from(grid.querySelectorAll('.product-card'));
     const state = paginationState[section];
-    const totalPages = Math.ceil(cards.length / state.itemsPerPage);
+    const total = state.total;
+    const totalPages = Math.ceil(total / state.itemsPerPage);
 
-    console.log(`[${section}] Total cards: ${cards.length}, Items per page: ${state.itemsPerPage}, Total pages: ${totalPages}`);
+    console.log(`[${section}] Total products: ${total}, Items per page: ${state.itemsPerPage}, Total pages: ${totalPages}`);
 
-    // Ocultar todas las cards primero
-    cards.forEach(card => card.classList.remove('visible'));
-
-    // Mostrar solo las cards de la página actual
+    // Actualizar info de página
     const start = (state.currentPage - 1) * state.itemsPerPage;
     const end = start + state.itemsPerPage;
-    cards.slice(start, end).forEach(card => card.classList.add('visible'));
-
-    // Actualizar info de página
     const pageInfo = document.getElementById(`${section}-page-info`);
-    if (pageInfo && cards.length > 0) {
-        pageInfo.textContent = `Mostrando ${Math.min(start + 1, cards.length)}-${Math.min(end, cards.length)} de ${cards.length}`;
+    if (pageInfo && total > 0) {
+        pageInfo.textContent = `Mostrando ${Math.min(start + 1, total)}-${Math.min(end, total)} de ${total}`;
     }
 
     // Crear botones de paginación cuando hay más de una página
@@ -60,11 +188,7 @@ function updatePagination(section) {
             const prevBtn = document.createElement('button');
             prevBtn.className = 'pagination-btn';
             prevBtn.textContent = '← Anterior';
-            prevBtn.onclick = () => {
-                state.currentPage--;
-                updatePagination(section);
-                scrollToSection(section);
-            };
+            prevBtn.onclick = () => goToPage(section, state.currentPage - 1);
             paginationContainer.appendChild(prevBtn);
         }
 
@@ -74,11 +198,7 @@ function updatePagination(section) {
                 const pageBtn = document.createElement('button');
                 pageBtn.className = `pagination-btn ${i === state.currentPage ? 'active' : ''}`;
                 pageBtn.textContent = i;
-                pageBtn.onclick = () => {
-                    state.currentPage = i;
-                    updatePagination(section);
-                    scrollToSection(section);
-                };
+                pageBtn.onclick = () => goToPage(section, i);
                 paginationContainer.appendChild(pageBtn);
             } else if (i === state.currentPage - 2 || i === state.currentPage + 2) {
                 const dots = document.createElement('span');
@@ -93,11 +213,7 @@ function updatePagination(section) {
             const nextBtn = document.createElement('button');
             nextBtn.className = 'pagination-btn';
             nextBtn.textContent = 'Siguiente →';
-            nextBtn.onclick = () => {
-                state.currentPage++;
-                updatePagination(section);
-                scrollToSection(section);
-            };
+            nextBtn.onclick = () => goToPage(section, state.currentPage + 1);
             paginationContainer.appendChild(nextBtn);
         }
     } else if (paginationContainer) {
@@ -308,7 +424,7 @@ function applyFilters() {
     // Guardar posición del scroll antes de recargar
     saveScrollPosition();
 
-    // Recargar la página con los nuevos parámetros (filtrado desde backend TYA)
+    // Recargar la página con los nuevos parámetros (filtrado en el servidor, vuelve a la página 1)
     window.location.href = `/shop?${params.toString()}`;
 }
 
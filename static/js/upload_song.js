@@ -21,6 +21,43 @@ document.addEventListener('DOMContentLoaded', function(){
     handleFileChange('audioFile', 'audioInfo', 'audio');
     handleFileChange('coverFile', 'coverInfo', 'image');
 
+    // Textos de progreso para cada etapa del trabajo de subida
+    const STAGE_MESSAGES = {
+        duration: 'Analizando el audio...',
+        track: 'Subiendo el audio...',
+        song: 'Publicando la canción...'
+    };
+
+    /**
+     * Consulta el estado del trabajo de subida hasta que termine y devuelve
+     * {success, message, songId}
+     */
+    async function waitForUploadJob(statusUrl, messageDiv){
+        while(true){
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            let job;
+            try {
+                const resp = await fetch(statusUrl, { credentials: 'same-origin' });
+                if(!resp.ok){
+                    return { success: false, message: 'No se pudo consultar el estado de la subida.' };
+                }
+                job = await resp.json();
+            } catch(err){
+                // Un fallo puntual de red no cancela la subida: se vuelve a consultar
+                continue;
+            }
+            if(job.status === 'done'){
+                return { success: true, message: job.message, songId: job.songId };
+            }
+            if(job.status === 'failed'){
+                return { success: false, message: job.message };
+            }
+            const attempt = job.attempts && job.attempts[job.stage];
+            messageDiv.textContent = (STAGE_MESSAGES[job.stage] || 'Subida en cola...') +
+                (attempt > 1 ? ` (reintento ${attempt - 1})` : '');
+        }
+    }
+
     form.addEventListener('submit', async function(e){
         e.preventDefault();
         const uploadBtn = document.getElementById('upload-btn');
@@ -28,17 +65,7 @@ document.addEventListener('DOMContentLoaded', function(){
         uploadBtn.disabled = true;
         messageDiv.style.display = 'none';
 
-        // Función para convertir archivo a base64
-        function fileToBase64(file) {
-            return new Promise((resolve, reject) => {
-                const reader = new FileReader();
-                reader.readAsDataURL(file);
-                reader.onload = () => resolve(reader.result.split(',')[1]); // Remover el prefijo data:...
-                reader.onerror = error => reject(error);
-            });
-        }
-
-        // Obtener archivos y convertir a base64
+        // Obtener archivos (el audio se sube por trozos y la portada en multipart, sin pasarlos a base64)
         const audioFile = document.getElementById('audioFile').files[0];
         const coverFile = document.getElementById('coverFile').files[0];
 
@@ -59,9 +86,6 @@ document.addEventListener('DOMContentLoaded', function(){
         }
 
         try {
-            const audioBase64 = await fileToBase64(audioFile);
-            const coverBase64 = await fileToBase64(coverFile);
-
             // Procesar géneros seleccionados (multi-select)
             const selectedGenres = Array.from(document.getElementById('genres').selectedOptions)
                 .map(opt => parseInt(opt.value))
@@ -80,30 +104,41 @@ document.addEventListener('DOMContentLoaded', function(){
                 .map(opt => parseInt(opt.value))
                 .filter(id => !isNaN(id));
 
-            // Crear objeto JSON
-            const data = {
-                title: document.getElementById('title').value.trim(),
-                price: parseFloat(document.getElementById('price').value),
-                description: document.getElementById('description').value.trim() || null,
-                releaseDate: document.getElementById('releaseDate').value || null,
-                albumId: document.getElementById('albumId').value ? parseInt(document.getElementById('albumId').value) : null,
-                genres: selectedGenres,
-                collaborators: selectedCollabs,
-                audioFile: audioBase64,
-                coverFile: coverBase64,
-                coverExtension: coverFile.name.split('.').pop().toLowerCase()
-            };
+            // Crear formulario multipart
+            const data = new FormData();
+            data.append('title', document.getElementById('title').value.trim());
+            data.append('price', parseFloat(document.getElementById('price').value));
+            data.append('description', document.getElementById('description').value.trim());
+            data.append('releaseDate', document.getElementById('releaseDate').value);
+            data.append('albumId', document.getElementById('albumId').value);
+            selectedGenres.forEach(id => data.append('genres', id));
+            selectedCollabs.forEach(id => data.append('collaborators', id));
+            // El audio se sube antes por trozos (reanudable) y aquí solo se referencia la sesión
+            messageDiv.className = 'message success';
+            messageDiv.style.display = 'block';
+            const audioSession = await uploadFileInChunks(audioFile, (sent, total) => {
+                messageDiv.textContent = `Subiendo audio... ${Math.floor(sent * 100 / total)}%`;
+            });
+            data.append('audioSession', audioSession);
+            data.append('coverFile', coverFile);
+            data.append('coverExtension', coverFile.name.split('.').pop().toLowerCase());
 
+            // Sin Content-Type: el navegador añade el boundary del multipart
             const resp = await fetch('/song/upload', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify(data),
+                body: data,
                 credentials: 'same-origin'
             });
             
-            const responseData = await resp.json();
+            let responseData = await resp.json();
+
+            // La subida se procesa en segundo plano: consultar el trabajo hasta que termine
+            if(responseData.success && responseData.jobId){
+                messageDiv.className = 'message success';
+                messageDiv.textContent = responseData.message;
+                messageDiv.style.display = 'block';
+                responseData = await waitForUploadJob(responseData.statusUrl, messageDiv);
+            }
             
             if(responseData.success){
                 messageDiv.className = 'message success';
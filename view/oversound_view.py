@@ -52,11 +52,15 @@ class View():
         return templates.TemplateResponse("error.html", {"request": request, "data": data})
 
     # Renderizar la template shop.html
-    def get_shop_view(self, request: Request, userdata: dict, songs, genres, artistas, albums, merch, artists_map=None, genres_map=None, tya_server=None):
+    def get_shop_view(self, request: Request, userdata: dict, songs, genres, artistas, albums, merch, artists_map=None, genres_map=None, tya_server=None, pagination=None, facets=None):
         if artists_map is None:
             artists_map = {}
         if genres_map is None:
             genres_map = {}
+        if pagination is None:
+            pagination = {}
+        if facets is None:
+            facets = {"genres": {}, "artists": {}}
         data = {"userdata": userdata}
         return templates.TemplateResponse("shop.html", {
             "request": request, 
@@ -68,7 +72,9 @@ class View():
             "artists": artistas,
             "artists_map": artists_map, 
             "genres_map": genres_map,
-            "tya_server": tya_server
+            "tya_server": tya_server,
+            "pagination": pagination,
+            "facets": facets
         })
 
     # Esta función se va a usar para renderizar la template music/upload_song.html (versión más reciente/completa de 'get_upload_song_view')